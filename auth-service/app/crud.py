@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from typing import List
 from . import models, schemas, auth
 
 def get_user(db: Session, user_id: int):
@@ -13,24 +14,27 @@ def get_user_by_username(db: Session, username: str):
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.User).offset(skip).limit(limit).all()
 
+def get_user_profiles(db: Session, user_ids: List[int]):
+    """Публичные профили списка пользователей одним запросом"""
+    return db.query(models.User.id, models.User.username, models.User.full_name)\
+        .filter(models.User.id.in_(user_ids))\
+        .all()
+
 def create_user(db: Session, user: schemas.UserCreate):
     hashed_password = auth.get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         username=user.username,
         full_name=user.full_name,
-        hashed_password=hashed_password
+        hashed_password=hashed_password,
+        # Явное значение, иначе после INSERT колонка с onupdate дочитывается отдельным SELECT
+        updated_at=None
     )
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
-    db_user = get_user(db, user_id)
-    if not db_user:
-        return None
-    
+def update_user(db: Session, db_user: models.User, user_update: schemas.UserUpdate):
     update_data = user_update.model_dump(exclude_unset=True)
     
     if "password" in update_data:
@@ -40,14 +44,9 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
         setattr(db_user, field, value)
     
     db.commit()
-    db.refresh(db_user)
     return db_user
 
-def delete_user(db: Session, user_id: int):
-    db_user = get_user(db, user_id)
-    if not db_user:
-        return None
-    
+def delete_user(db: Session, db_user: models.User):
     db.delete(db_user)
     db.commit()
     return db_user
\ No newline at end of file
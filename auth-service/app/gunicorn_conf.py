@@ -0,0 +1,37 @@
+"""Конфигурация gunicorn для запуска сервиса несколькими процессами:
+
+    gunicorn -c python:app.gunicorn_conf app.main:app
+
+Каждый воркер — отдельный процесс uvicorn со своим пулом соединений, кэшами
+и фоновыми задачами (shared-nothing). Приложение загружается в каждом
+воркере после fork, поэтому соединения с БД не наследуются от мастера.
+
+kill -HUP <pid мастера> — плавная перезагрузка: новые воркеры запускаются,
+старые дообрабатывают текущие запросы и завершаются.
+"""
+import multiprocessing
+import os
+
+# По умолчанию по воркеру на ядро. Значение пишется обратно в окружение,
+# чтобы воркеры делили между собой пул соединений и лимиты (database.py, rate_limit.py)
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Остановка: воркер перестаёт принимать соединения, дожидается текущих запросов
+# и выполняет shutdown приложения (outbox, очередь писем) не дольше graceful_timeout
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+# Периодический перезапуск воркеров против утечек памяти (0 — выключено)
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+
+# Heartbeat воркеров в памяти, а не на overlay-диске контейнера
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.getenv("ACCESS_LOG") or None
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -1,91 +1,87 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from contextlib import asynccontextmanager
 from datetime import timedelta
+import asyncio
 import logging
-import time
 import os
 
-from . import models, schemas, crud, auth, database
+from . import models, schemas, crud, auth, database, instrumentation, http_cache, rate_limit, lifecycle, migrate, logging_config, profiling
 from .dependencies import get_db
 from .auth import get_current_user, get_current_active_user
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования: JSON через очередь и фоновый поток записи
+logging_config.setup("auth-service")
 logger = logging.getLogger(__name__)
 
+# Старт: ожидание БД без блокировки event loop; схема и начальные данные — только
+# с MIGRATE_ON_STARTUP (запуск одним процессом), иначе их создаёт python -m app.migrate
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Запуск сервиса аутентификации...")
+    await lifecycle.wait_for_db(database.engine)
+    if lifecycle.MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate.migrate)
+    lifecycle.state.ready = True
+    yield
+    lifecycle.state.ready = False
+
 app = FastAPI(
     title="Auth Service API",
     description="API для аутентификации и управления пользователями",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan
 )
 
-# Настройка CORS
+# Подсчёт SQL-запросов на каждый HTTP-запрос
+instrumentation.install(database.engine)
+app.add_middleware(instrumentation.QueryCountMiddleware)
+
+# Сжатие ответов gzip/brotli
+app.add_middleware(http_cache.CompressionMiddleware)
+
+# Ограничение частоты запросов и перегрузки: лишние запросы сразу получают 429/503
+app.add_middleware(
+    rate_limit.RateLimitMiddleware,
+    service="auth",
+    # Подпись токена проверяется здесь же, поэтому корзина — на пользователя
+    verify_subject=auth.token_subject,
+    rules=[
+        # Подбор паролей и bcrypt: мало попыток с одного адреса и мало одновременных проверок
+        rate_limit.Rule("token", "POST", r"^/token$", rate=5 / 60, burst=10, concurrency=8, key="ip"),
+        rate_limit.Rule("register", "POST", r"^/register$", rate=2 / 60, burst=5, concurrency=8, key="ip"),
+    ]
+)
+
+# Профиль запроса по X-Profile и журнал медленных запросов; без PROFILING_TOKEN
+# и SLOW_REQUEST_THRESHOLD_MS middleware не подключается и запросы не замедляет
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Сэмплер стеков для администратора: /debug/profiling/*
+app.include_router(profiling.router)
+
+# Сквозной X-Request-ID: принимается от клиента или соседнего сервиса, попадает в логи и ответ
+app.add_middleware(logging_config.RequestIdMiddleware)
+
+# Настройка CORS. Добавляется последним, т.е. снаружи остальных middleware:
+# отказы 429/503/409 без CORS-заголовков браузер не покажет клиенту
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Без этого браузер не отдаёт скрипту ETag для перепроверки кэша клиента
+    expose_headers=["ETag", "X-Request-ID"],
 )
 
-# Функция для ожидания БД
-def wait_for_db():
-    """Ожидание готовности базы данных"""
-    max_retries = 10
-    retry_delay = 3
-    
-    for i in range(max_retries):
-        try:
-            # Пробуем подключиться к БД с использованием text()
-            db = database.SessionLocal()
-            db.execute(text("SELECT 1"))  # Используем text()
-            db.close()
-            logger.info("База данных готова")
-            return True
-        except Exception as e:
-            logger.warning(f"Попытка {i+1}/{max_retries}: БД не готова. Ошибка: {e}")
-            if i < max_retries - 1:
-                time.sleep(retry_delay)
-    
-    logger.error("Не удалось подключиться к БД после всех попыток")
-    return False
-
-# Создание таблиц при запуске
-@app.on_event("startup")
-async def startup():
-    logger.info("Запуск сервиса аутентификации...")
-    
-    # Ждем готовность БД
-    if wait_for_db():
-        try:
-            models.Base.metadata.create_all(bind=database.engine)
-            logger.info("Таблицы базы данных созданы успешно")
-            
-            # Создаем тестового пользователя если нужно
-            db = database.SessionLocal()
-            try:
-                if not crud.get_user_by_email(db, "admin@example.com"):
-                    test_user = schemas.UserCreate(
-                        email="admin@example.com",
-                        username="admin",
-                        full_name="Admin User",
-                        password="admin123"
-                    )
-                    crud.create_user(db=db, user=test_user)
-                    logger.info("Тестовый пользователь создан")
-            finally:
-                db.close()
-        except Exception as e:
-            logger.error(f"Ошибка при создании таблиц: {e}")
-    else:
-        logger.error("Не удалось инициализировать БД")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 @app.get("/")
@@ -100,18 +96,18 @@ def read_root():
 @app.post("/register", response_model=schemas.User)
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """Регистрация нового пользователя"""
-    logger.info(f"Попытка регистрации пользователя: {user.email}")
+    logger.info("Попытка регистрации пользователя: %s", user.email)
     
     db_user = crud.get_user_by_email(db, email=user.email)
     if db_user:
-        logger.warning(f"Пользователь с email {user.email} уже существует")
+        logger.warning("Пользователь с email %s уже существует", user.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     new_user = crud.create_user(db=db, user=user)
-    logger.info(f"Пользователь {new_user.email} успешно зарегистрирован")
+    logger.info("Пользователь %s успешно зарегистрирован", new_user.email)
     return new_user
 
 @app.post("/token", response_model=schemas.Token)
@@ -120,11 +116,11 @@ def login_for_access_token(
     db: Session = Depends(get_db)
 ):
     """Аутентификация и получение токена"""
-    logger.info(f"Попытка входа пользователя: {form_data.username}")
+    logger.info("Попытка входа пользователя: %s", form_data.username)
     
     user = auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
-        logger.warning(f"Неудачная попытка входа для пользователя: {form_data.username}")
+        logger.warning("Неудачная попытка входа для пользователя: %s", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -136,15 +132,26 @@ def login_for_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
     
-    logger.info(f"Пользователь {user.email} успешно вошел в систему")
+    logger.info("Пользователь %s успешно вошел в систему", user.email)
     return {"access_token": access_token, "token_type": "bearer"}
 
+def user_with_validators(request: Request, response: Response, db_user: models.User):
+    """Пользователь с ETag/Last-Modified; 304, если клиент уже видел эту версию"""
+    last_modified = db_user.updated_at or db_user.created_at
+    etag = http_cache.make_etag(db_user.id, last_modified, db_user.email, db_user.username, db_user.full_name, db_user.is_active)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    http_cache.set_validators(response, etag, last_modified)
+    return db_user
+
 @app.get("/users/me", response_model=schemas.User)
 def read_users_me(
+    request: Request,
+    response: Response,
     current_user: schemas.User = Depends(get_current_active_user)
 ):
     """Получение информации о текущем пользователе"""
-    return current_user
+    return user_with_validators(request, response, current_user)
 
 @app.put("/users/me", response_model=schemas.User)
 def update_user_me(
@@ -153,16 +160,15 @@ def update_user_me(
     current_user: schemas.User = Depends(get_current_active_user)
 ):
     """Обновление информации текущего пользователя"""
-    logger.info(f"Обновление профиля пользователя {currentUser.email}")
+    logger.info("Обновление профиля пользователя %s", current_user.email)
     
-    updated_user = crud.update_user(db, current_user.id, user_update)
-    if not updated_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return updated_user
+    # Пользователь уже загружен зависимостью get_current_user в той же сессии
+    return crud.update_user(db, current_user, user_update)
 
 @app.get("/users/", response_model=list[schemas.User])
 def read_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -170,11 +176,35 @@ def read_users(
 ):
     """Получение списка пользователей"""
     users = crud.get_users(db, skip=skip, limit=limit)
+    # ETag из полей выбранной страницы, без отдельного агрегатного запроса по всей таблице
+    etag = http_cache.make_etag(*(
+        part for user in users
+        for part in (user.id, user.updated_at or user.created_at, user.email, user.username, user.full_name, user.is_active)
+    ))
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag)
+    http_cache.set_validators(response, etag)
     return users
 
+# Верхняя граница числа id в одном запросе профилей
+MAX_PROFILE_BATCH = 100
+
+@app.get("/users/batch", response_model=list[schemas.UserProfile])
+def read_user_profiles(
+    ids: list[int] = Query(...),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """Профили пользователей по списку id; event-service запрашивает их с токеном пользователя"""
+    if len(ids) > MAX_PROFILE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PROFILE_BATCH} ids per request")
+    return crud.get_user_profiles(db, ids)
+
 @app.get("/users/{user_id}", response_model=schemas.User)
 def read_user(
     user_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
@@ -182,26 +212,27 @@ def read_user(
     db_user = crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return user_with_validators(request, response, db_user)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Метрики SQL-запросов по обработчикам и очереди логов (формат Prometheus)"""
+    return instrumentation.render_metrics() + logging_config.render_metrics()
 
 @app.get("/health")
 def health_check():
-    """Проверка здоровья сервиса"""
-    try:
-        # Проверяем подключение к БД с использованием text()
-        db = database.SessionLocal()
-        db.execute(text("SELECT 1")) 
-        db.close()
-        return {
-            "status": "healthy",
-            "service": "auth-service",
-            "database": "connected"
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Service unhealthy: {str(e)}"
-        )
+    """Проверка живости процесса (без обращения к БД)"""
+    return {"status": "healthy", "service": "auth-service"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: старт завершён и БД отвечает"""
+    if not lifecycle.state.ready:
+        raise HTTPException(status_code=503, detail="Service is starting")
+    error = await lifecycle.check_db(database.engine)
+    if error:
+        raise HTTPException(status_code=503, detail=f"Service not ready: {error}")
+    return {"status": "ready", "service": "auth-service", "database": "connected"}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,48 @@
+"""Одноразовая подготовка БД: схема и тестовый пользователь.
+
+Выполняется отдельным шагом перед запуском воркеров, а не при старте
+каждого процесса (хеширование пароля bcrypt заметно замедляло старт):
+
+    python -m app.migrate
+"""
+import asyncio
+import logging
+
+from . import models, schemas, crud
+from .database import SessionLocal, engine
+from .lifecycle import wait_for_db
+
+logger = logging.getLogger(__name__)
+
+
+def seed():
+    """Создание тестового пользователя, если его ещё нет"""
+    db = SessionLocal()
+    try:
+        if not crud.get_user_by_email(db, "admin@example.com"):
+            test_user = schemas.UserCreate(
+                email="admin@example.com",
+                username="admin",
+                full_name="Admin User",
+                password="admin123"
+            )
+            crud.create_user(db=db, user=test_user)
+            logger.info("Тестовый пользователь создан")
+    finally:
+        db.close()
+
+
+def migrate():
+    models.Base.metadata.create_all(bind=engine)
+    logger.info("Таблицы базы данных созданы")
+    seed()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(wait_for_db(engine))
+    migrate()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from .database import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Серверные значения по умолчанию возвращаются через RETURNING, без повторного SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -0,0 +1,442 @@
+"""Профилирование сервиса по запросу администратора.
+
+- Сэмплер стеков процесса: включается и выключается на лету
+  (POST /debug/profiling/sampler/start|stop), результат — свёрнутые стеки
+  (collapsed stacks) для flamegraph.pl, speedscope и подобных.
+- Профиль одного запроса: с заголовками X-Profile: collapsed и
+  X-Profiling-Token вместо ответа возвращаются свёрнутые стеки, снятые
+  во время его выполнения, только из потоков, выполнявших этот запрос.
+- Журнал медленных запросов: запрос дольше SLOW_REQUEST_THRESHOLD_MS
+  попадает в лог вместе со своими стеками на этот момент.
+
+Всё выключено по умолчанию: без PROFILING_TOKEN эндпоинты отвечают 404, и без
+него и SLOW_REQUEST_THRESHOLD_MS middleware не подключается. Снимки делаются
+через sys._current_frames() из отдельного потока, без трассировки вызовов,
+поэтому работающий сэмплер почти не замедляет запросы. Каждый воркер gunicorn
+профилирует только себя (номер процесса — в ответах).
+"""
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+
+import anyio.to_thread
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from .logging_config import current_request_id
+
+logger = logging.getLogger(__name__)
+
+# Секрет администратора для эндпоинтов и заголовка X-Profile; пустой — профилирование выключено
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+# Порог журнала медленных запросов (0 — журнал выключен)
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", 0))
+# Интервал снимков сэмплера процесса и профиля одного запроса
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 10))
+REQUEST_PROFILE_INTERVAL_MS = float(os.getenv("REQUEST_PROFILE_INTERVAL_MS", 1))
+# Сэмплер процесса останавливается сам не позже чем через столько секунд
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))
+
+ENABLED = bool(PROFILING_TOKEN) or SLOW_REQUEST_THRESHOLD_MS > 0
+
+# Код сервиса: стеки без его кадров в профиль запроса и журнал медленных запросов не попадают
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Кадры, в которых поток ждёт работы, а не выполняет её
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# Потоки самого профилирования в снимки не включаются
+_own_threads = set()
+
+# Метка запроса, за которым следит middleware
+_request_marker: ContextVar[Optional[object]] = ContextVar("profiled_request", default=None)
+
+# Потоки пула, выполняющие сейчас синхронный код отслеживаемого запроса: {ident потока: метка}
+_request_threads: Dict[int, object] = {}
+
+_frame_names: Dict[object, str] = {}
+
+
+def _frame_name(code) -> str:
+    name = _frame_names.get(code)
+    if name is None:
+        path = code.co_filename
+        if path.startswith(APP_DIR):
+            path = "app" + path[len(APP_DIR):]
+        else:
+            path = os.path.basename(path)
+        name = _frame_names[code] = f"{path}:{code.co_name}"
+    return name
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _collapse(frame, thread_name: str, app_only: bool, include_idle: bool = False) -> Optional[str]:
+    """Стек потока строкой "поток;внешний;...;внутренний"; None, если поток простаивает"""
+    if not include_idle and _is_idle(frame):
+        return None
+    names = []
+    in_app = False
+    while frame is not None:
+        code = frame.f_code
+        in_app = in_app or code.co_filename.startswith(APP_DIR)
+        names.append(_frame_name(code))
+        frame = frame.f_back
+    if app_only and not in_app:
+        return None
+    names.append(thread_name.replace(" ", "_"))
+    return ";".join(reversed(names))
+
+
+def _in_request_thread(func: Callable, marker: object) -> Callable:
+    def run(*args):
+        ident = threading.get_ident()
+        _request_threads[ident] = marker
+        try:
+            return func(*args)
+        finally:
+            _request_threads.pop(ident, None)
+    return run
+
+
+def install_thread_tracking():
+    """Учёт потоков пула, в которых выполняется синхронный код запроса.
+
+    Синхронные обработчики, зависимости и фоновые задачи Starlette и FastAPI
+    попадают в пул через anyio.to_thread.run_sync. Обёртка берёт метку запроса
+    в цикле событий при передаче функции и записывает ident потока на время её
+    выполнения. Ставится только при подключённом middleware.
+    """
+    run_sync = anyio.to_thread.run_sync
+    if getattr(run_sync, "tracks_requests", False):
+        return
+
+    async def tracked_run_sync(func, *args, **kwargs):
+        marker = _request_marker.get()
+        if marker is not None:
+            func = _in_request_thread(func, marker)
+        return await run_sync(func, *args, **kwargs)
+
+    tracked_run_sync.tracks_requests = True
+    anyio.to_thread.run_sync = tracked_run_sync
+
+
+class RequestThreads:
+    """Принадлежность потока одному запросу.
+
+    Поток пула — по записи install_thread_tracking. Поток цикла событий
+    выполняет код запроса внутри кадра его middleware (entry), поэтому его
+    стек проверяется на этот кадр.
+    """
+
+    def __init__(self, marker: object, entry):
+        self.marker = marker
+        self.entry = entry
+
+    def __call__(self, ident: int, frame) -> bool:
+        if _request_threads.get(ident) is self.marker:
+            return True
+        while frame is not None:
+            if frame is self.entry:
+                return True
+            frame = frame.f_back
+        return False
+
+
+def snapshot(
+    app_only: bool,
+    include_idle: bool = False,
+    belongs: Optional[Callable[[int, object], bool]] = None
+) -> Dict[str, str]:
+    """Текущие стеки работающих потоков процесса: {имя потока: стек}; belongs отбирает потоки"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = {}
+    for ident, frame in sys._current_frames().items():
+        if ident in _own_threads:
+            continue
+        if belongs is not None and not belongs(ident, frame):
+            continue
+        name = names.get(ident, str(ident))
+        stack = _collapse(frame, name, app_only, include_idle)
+        if stack is not None:
+            stacks[name] = stack
+    return stacks
+
+
+class StackSampler:
+    """Периодические снимки стеков в отдельном потоке; счётчик одинаковых стеков — формат flamegraph"""
+
+    def __init__(
+        self,
+        interval: float,
+        app_only: bool = False,
+        include_idle: bool = False,
+        belongs: Optional[Callable[[int, object], bool]] = None
+    ):
+        self.interval = interval
+        self.app_only = app_only
+        self.include_idle = include_idle
+        self.belongs = belongs
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, duration: Optional[float]):
+        ident = threading.get_ident()
+        _own_threads.add(ident)
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self._stop.wait(self.interval):
+                for stack in snapshot(self.app_only, self.include_idle, self.belongs).values():
+                    self.counts[stack] += 1
+                self.samples += 1
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+        finally:
+            _own_threads.discard(ident)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class SlowRequestWatchdog:
+    """Поток, который находит запросы дольше порога и пишет в лог их стеки на этот момент"""
+
+    def __init__(self, threshold: float, keep: int = 50):
+        self.threshold = threshold
+        self.recent: deque = deque(maxlen=keep)
+        self._active: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, scope, belongs: RequestThreads) -> dict:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="slow-requests", daemon=True)
+                    self._thread.start()
+        request = {
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "request_id": current_request_id(),
+            "started": time.monotonic(),
+            "reported": False,
+            "belongs": belongs,
+        }
+        with self._lock:
+            self._active[id(request)] = request
+        return request
+
+    def end(self, request: dict, status: Optional[int]):
+        with self._lock:
+            self._active.pop(id(request), None)
+        elapsed_ms = (time.monotonic() - request["started"]) * 1000
+        if elapsed_ms >= self.threshold * 1000:
+            logger.warning(
+                "Медленный запрос %s %s: %.0f мс, статус %s",
+                request["method"], request["path"], elapsed_ms, status
+            )
+
+    def _run(self):
+        _own_threads.add(threading.get_ident())
+        while True:
+            time.sleep(self.threshold / 2)
+            now = time.monotonic()
+            with self._lock:
+                slow = [r for r in self._active.values() if not r["reported"] and now - r["started"] >= self.threshold]
+            for request in slow:
+                request["reported"] = True
+                stacks = snapshot(app_only=False, belongs=request["belongs"])
+                entry = {
+                    "method": request["method"],
+                    "path": request["path"],
+                    "request_id": request["request_id"],
+                    "elapsed_ms": round((now - request["started"]) * 1000),
+                    "stacks": stacks,
+                }
+                self.recent.append(entry)
+                logger.warning(
+                    "Запрос %s %s выполняется дольше %.0f мс, стеки: %s",
+                    request["method"], request["path"], self.threshold * 1000, stacks
+                )
+
+
+sampler: Optional[StackSampler] = None
+watchdog = SlowRequestWatchdog(SLOW_REQUEST_THRESHOLD_MS / 1000) if SLOW_REQUEST_THRESHOLD_MS > 0 else None
+
+
+def _token_ok(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware: профиль запроса по заголовку X-Profile и журнал медленных запросов"""
+
+    def __init__(self, app):
+        self.app = app
+        install_thread_tracking()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if _header(scope, b"x-profile") == "collapsed" and _token_ok(_header(scope, b"x-profiling-token")):
+            await self._profile(scope, receive, send)
+            return
+        if watchdog is None:
+            await self.app(scope, receive, send)
+            return
+
+        marker = object()
+        token = _request_marker.set(marker)
+        request = watchdog.begin(scope, RequestThreads(marker, sys._getframe()))
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            watchdog.end(request, status)
+            _request_marker.reset(token)
+
+    async def _profile(self, scope, receive, send):
+        """Запрос выполняется как обычно, но клиент вместо ответа получает его профиль"""
+        status = None
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        # Снимаются только потоки, выполняющие этот запрос: параллельные запросы в профиль не попадают
+        marker = object()
+        token = _request_marker.set(marker)
+        request_sampler = StackSampler(
+            REQUEST_PROFILE_INTERVAL_MS / 1000, belongs=RequestThreads(marker, sys._getframe())
+        )
+        request_sampler.start(PROFILE_MAX_SECONDS)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            request_sampler.stop()
+            _request_marker.reset(token)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        body = request_sampler.collapsed().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-disposition", b'attachment; filename="profile.folded"'),
+                (b"x-profile-status", str(status).encode()),
+                (b"x-profile-elapsed-ms", f"{elapsed_ms:.1f}".encode()),
+                (b"x-profile-samples", str(request_sampler.samples).encode()),
+                (b"x-profile-worker", str(os.getpid()).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def require_token(x_profiling_token: Optional[str] = Header(None)):
+    """Доступ только с токеном администратора; при выключенном профилировании эндпоинтов как бы нет"""
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _token_ok(x_profiling_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+router = APIRouter(prefix="/debug/profiling", tags=["Профилирование"], dependencies=[Depends(require_token)])
+
+
+def _status() -> dict:
+    return {
+        "worker": os.getpid(),
+        "running": sampler is not None and sampler.running,
+        "samples": sampler.samples if sampler else 0,
+        "started_at": sampler.started_at if sampler else None,
+        "slow_request_threshold_ms": SLOW_REQUEST_THRESHOLD_MS,
+    }
+
+
+@router.get("/sampler")
+def sampler_status():
+    """Состояние сэмплера этого воркера"""
+    return _status()
+
+
+@router.post("/sampler/start")
+def start_sampler(
+    interval_ms: float = Query(PROFILE_SAMPLE_INTERVAL_MS, ge=1, le=1000),
+    duration_s: float = Query(60, gt=0, le=PROFILE_MAX_SECONDS),
+    include_idle: bool = False
+):
+    """Запуск сэмплера процесса; предыдущие результаты сбрасываются"""
+    global sampler
+    if sampler is not None and sampler.running:
+        raise HTTPException(status_code=409, detail="Sampler is already running")
+    sampler = StackSampler(interval_ms / 1000, include_idle=include_idle)
+    sampler.start(duration_s)
+    logger.info("Сэмплер стеков запущен: интервал %s мс, не дольше %s с", interval_ms, duration_s)
+    return _status()
+
+
+@router.post("/sampler/stop", response_class=PlainTextResponse)
+def stop_sampler():
+    """Остановка сэмплера; свёрнутые стеки (формат flamegraph) с момента запуска"""
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Sampler was not started")
+    sampler.stop()
+    logger.info("Сэмплер стеков остановлен: %s снимков", sampler.samples)
+    return PlainTextResponse(sampler.collapsed(), headers={"X-Profile-Worker": str(os.getpid())})
+
+
+@router.get("/slow-requests")
+def slow_requests():
+    """Последние медленные запросы этого воркера со стеками"""
+    return list(watchdog.recent) if watchdog else []
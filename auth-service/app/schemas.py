@@ -25,6 +25,15 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserProfile(BaseModel):
+    """Публичные поля пользователя для других сервисов, без email"""
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
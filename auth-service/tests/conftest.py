@@ -0,0 +1,40 @@
+"""Фикстуры тестов auth-service: приложение в этом процессе на временной SQLite.
+
+    cd auth-service && python -m pytest tests
+
+Другая БД задаётся через TEST_DATABASE_URL.
+"""
+import os
+import sys
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="auth-service-tests-")
+os.environ.update({
+    "DATABASE_URL": os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_directory, 'auth')}.db"),
+    "MIGRATE_ON_STARTUP": "true",
+    "RATE_LIMIT_ENABLED": "false",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def user(client):
+    """Новый пользователь: данные регистрации и заголовок с его токеном"""
+    suffix = uuid.uuid4().hex[:8]
+    data = {"email": f"user{suffix}@example.com", "username": f"user{suffix}", "password": "secret"}
+    assert client.post("/register", json=data).status_code == 200
+    token = client.post("/token", data={"username": data["email"], "password": "secret"}).json()["access_token"]
+    return {**data, "headers": {"Authorization": f"Bearer {token}"}}
@@ -0,0 +1,22 @@
+"""Бюджет SQL-запросов пишущих эндпоинтов (instrumentation.assert_query_budget)."""
+import uuid
+
+from app import instrumentation
+
+
+def within_budget(budget, call, expected=200):
+    with instrumentation.assert_query_budget(budget):
+        response = call()
+    assert response.status_code == expected, response.text
+    return response
+
+
+def test_register(client):
+    suffix = uuid.uuid4().hex[:8]
+    user = {"email": f"budget{suffix}@example.com", "username": f"budget{suffix}", "password": "secret"}
+    # Проверка занятости email и INSERT ... RETURNING
+    within_budget(2, lambda: client.post("/register", json=user))
+
+
+def test_update_me(client, user):
+    within_budget(2, lambda: client.put("/users/me", json={"full_name": "Budget"}, headers=user["headers"]))
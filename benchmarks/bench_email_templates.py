@@ -0,0 +1,110 @@
+"""Микробенчмарк рендеринга писем notification-service.
+
+Сравнивает прежнюю сборку писем (f-строки + MIME на каждое письмо) с реестром
+скомпилированных шаблонов и пакетным рендерингом.
+
+    python benchmarks/bench_email_templates.py --messages 20000
+"""
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from types import SimpleNamespace
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "notification-service"))
+
+from app.templates import registry, PreparedEmail, prepare_batch  # noqa: E402
+
+
+def legacy_render(notification):
+    subjects = {
+        "event_created": "Ваше мероприятие создано",
+        "event_registration": "Регистрация на мероприятие",
+        "event_updated": "Мероприятие обновлено",
+        "event_cancelled": "Мероприятие отменено",
+        "test": "Тестовое уведомление"
+    }
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subjects.get(notification.notification_type, "Уведомление от Event Management Platform")
+    message["From"] = "noreply@events.com"
+    message["To"] = f"user{notification.user_id}@example.com"
+    text = f"""
+    Уведомление от Event Management Platform
+
+    {notification.message}
+
+    Тип: {notification.notification_type}
+    Дата: {notification.created_at}
+
+    ---
+    Это автоматическое сообщение, пожалуйста, не отвечайте на него.
+    """
+    html = f"""
+    <html>
+      <body>
+        <h2>Уведомление от Event Management Platform</h2>
+        <p>{notification.message}</p>
+        <p><strong>Тип:</strong> {notification.notification_type}</p>
+        <p><strong>Дата:</strong> {notification.created_at}</p>
+        <hr>
+        <p><em>Это автоматическое сообщение, пожалуйста, не отвечайте на него.</em></p>
+      </body>
+    </html>
+    """
+    message.attach(MIMEText(text, "plain"))
+    message.attach(MIMEText(html, "html"))
+    return message.as_string()
+
+
+def registry_render(notification):
+    email = PreparedEmail(registry.render(notification))
+    return email.for_recipient("noreply@events.com", f"user{notification.user_id}@example.com")
+
+
+def batch_render(notifications):
+    prepared = prepare_batch(registry.render_batch(notifications))
+    for notification, email in zip(notifications, prepared):
+        email.for_recipient("noreply@events.com", f"user{notification.user_id}@example.com")
+
+
+def make_notifications(count, fan_out):
+    created_at = datetime.utcnow()
+    notifications = []
+    for i in range(count):
+        # При рассылке все получатели получают одинаковый текст
+        text = "Мероприятие 'Конференция <PyCon>' отменено" if fan_out else f"Вы зарегистрировались на мероприятие #{i}"
+        notifications.append(SimpleNamespace(
+            user_id=i,
+            notification_type="event_cancelled" if fan_out else "event_registration",
+            message=text,
+            created_at=created_at,
+        ))
+    return notifications
+
+
+def measure(label, func, count):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {count / elapsed:>12,.0f} писем/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    for fan_out in (False, True):
+        notifications = make_notifications(args.messages, fan_out)
+        print(f"\n{'рассылка' if fan_out else 'персональные'} ({args.messages} писем)")
+        measure("f-строки + MIME (было)", lambda: [legacy_render(n) for n in notifications], args.messages)
+        measure("скомпилированные шаблоны", lambda: [registry_render(n) for n in notifications], args.messages)
+        measure("пакетный рендеринг", lambda: batch_render(notifications), args.messages)
+        measure("только рендеринг (без MIME)", lambda: registry.render_batch(notifications), args.messages)
+
+
+if __name__ == "__main__":
+    main()
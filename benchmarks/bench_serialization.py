@@ -0,0 +1,107 @@
+"""Микробенчмарк сериализации списков event-service.
+
+Сравнивает путь FastAPI для response_model=List[schemas.Event] (ORM-объекты,
+валидация from_attributes, jsonable_encoder, json.dumps) с быстрым путём
+fastjson.rows_response (кортежи колонок, orjson). Проверяет, что тела ответов
+совпадают, и печатает стоимость в микросекундах на строку.
+
+    python benchmarks/bench_serialization.py --rows 1000 --repeat 20
+"""
+from datetime import datetime, timedelta
+from typing import List
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from common import load_service
+
+
+def seed(main, rows):
+    models = main.models
+    db = main.database.SessionLocal()
+    start = datetime(2030, 1, 1, 10, 0)
+    db.add_all([
+        models.Event(
+            title=f"Мероприятие {i}",
+            description="Описание мероприятия. " * 20,
+            category=list(models.EventCategory)[i % len(models.EventCategory)],
+            location=f"Москва, площадка {i % 50}",
+            start_date=start + timedelta(hours=i),
+            end_date=start + timedelta(hours=i + 2),
+            organizer_id=i % 100 + 1,
+            max_participants=100,
+            current_participants=i % 100,
+            updated_at=None
+        )
+        for i in range(rows)
+    ])
+    db.commit()
+    db.close()
+
+
+def timed(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сериализация списков: response_model против кортежей и orjson")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    service = load_service("event-service", env={"DATABASE_URL": f"sqlite:///{path}"})
+    service.models.Base.metadata.create_all(bind=service.database.engine)
+    seed(service, args.rows)
+
+    models, schemas, crud = service.models, service.schemas, service.crud
+    rows_response = service.rows_response
+    field = create_response_field(name="Response", type_=List[schemas.Event])
+    db = service.database.SessionLocal()
+
+    def fetch_orm():
+        db.expunge_all()
+        return db.query(models.Event).all()
+
+    def fetch_rows():
+        return db.query(*crud.EVENT_COLUMNS).all()
+
+    def framework(objects):
+        content = asyncio.run(serialize_response(field=field, response_content=objects))
+        return JSONResponse(content).body
+
+    def fast(rows):
+        return rows_response(rows).body
+
+    objects, rows = fetch_orm(), fetch_rows()
+    if json.loads(framework(objects)) != json.loads(fast(rows)):
+        raise SystemExit("Тела ответов различаются")
+
+    results = [
+        ("response_model", "сериализация", timed(args.repeat, lambda: framework(objects))[0]),
+        ("orjson rows", "сериализация", timed(args.repeat, lambda: fast(rows))[0]),
+        ("response_model", "запрос + сериализация", timed(args.repeat, lambda: framework(fetch_orm()))[0]),
+        ("orjson rows", "запрос + сериализация", timed(args.repeat, lambda: fast(fetch_rows()))[0]),
+    ]
+    db.close()
+
+    print(f"Строк: {args.rows}, лучший из {args.repeat} прогонов")
+    print(f"{'путь':<16}{'этап':<24}{'всего, мс':>12}{'на строку, мкс':>18}")
+    for name, stage, seconds in results:
+        print(f"{name:<16}{stage:<24}{seconds * 1000:>12.2f}{seconds / args.rows * 1e6:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
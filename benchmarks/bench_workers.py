@@ -0,0 +1,175 @@
+"""Масштабирование event-service по числу воркеров gunicorn.
+
+Для каждого значения --workers сервис запускается через
+gunicorn -c python:app.gunicorn_conf на временной SQLite-базе, нагрузка
+подаётся из отдельных процессов (чтобы генератор не упирался в одно ядро),
+затем сервис останавливается SIGTERM и замеряется время плавной остановки.
+Печатается RPS, ускорение относительно первого прогона и эффективность
+на воркер; на машине с N ядрами ожидается почти линейный рост до N воркеров.
+
+    python benchmarks/bench_workers.py --workers 1,2,4 --duration 10
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import format_ms, latency_summary, load_service, service_path
+
+
+def seed(dsn: str, events: int):
+    migrate = load_service("event-service", "app.migrate", env={"DATABASE_URL": dsn})
+    migrate.migrate()
+    models = sys.modules["app.models"]
+    db = sys.modules["app.database"].SessionLocal()
+    start = datetime(2030, 1, 1, 10, 0)
+    db.add_all([
+        models.Event(
+            title=f"Мероприятие {i}",
+            description="Описание " * 10,
+            category="conference",
+            location="Москва",
+            start_date=start + timedelta(hours=i),
+            max_participants=100,
+            current_participants=i % 100,
+            organizer_id=1 + i % 50,
+            is_published=True,
+        )
+        for i in range(events)
+    ])
+    db.commit()
+    db.close()
+
+
+def start_server(dsn: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=dsn,
+        WEB_CONCURRENCY=str(workers),
+        BIND=f"127.0.0.1:{port}",
+        MIGRATE_ON_STARTUP="false",
+        RATE_LIMIT_ENABLED="false",
+        LOG_LEVEL="warning",
+        # Фоновые задачи не должны мешать замеру
+        FEED_REFRESH_INTERVAL="3600",
+        EVENT_CHANGES_POLL_INTERVAL="3600",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "python:app.gunicorn_conf", "app.main:app"],
+        cwd=service_path("event-service"),
+        env=env,
+    )
+
+
+def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError("Сервис не стал готов")
+
+
+async def _load(url: str, path: str, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=10) as client:
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def load_process(args):
+    return asyncio.run(_load(*args))
+
+
+def run(args, dsn: str, workers: int) -> dict:
+    port = args.port
+    url = f"http://127.0.0.1:{port}"
+    server = start_server(dsn, workers, port)
+    try:
+        wait_ready(url)
+        # Прогрев всех воркеров
+        asyncio.run(_load(url, args.path, args.concurrency, 1))
+        with multiprocessing.Pool(args.clients) as pool:
+            started = time.perf_counter()
+            results = pool.map(load_process, [(url, args.path, args.concurrency, args.duration)] * args.clients)
+            elapsed = time.perf_counter() - started
+    finally:
+        stop_started = time.perf_counter()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+        stopped = time.perf_counter() - stop_started
+    latencies = [value for values, _ in results for value in values]
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "rps": len(latencies) / elapsed,
+        "latency": latency_summary(latencies),
+        "shutdown": stopped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабирование event-service по числу воркеров")
+    parser.add_argument("--workers", default=None, help="через запятую, по умолчанию 1,2,4.. до числа ядер")
+    parser.add_argument("--duration", type=float, default=10, help="секунд на прогон")
+    parser.add_argument("--clients", type=int, default=max(1, multiprocessing.cpu_count() // 2),
+                        help="процессов-генераторов нагрузки")
+    parser.add_argument("--concurrency", type=int, default=32, help="одновременных запросов на генератор")
+    parser.add_argument("--path", default="/events/?limit=20")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8911)
+    args = parser.parse_args()
+
+    if args.workers:
+        counts = [int(value) for value in args.workers.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= multiprocessing.cpu_count():
+            counts.append(counts[-1] * 2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        dsn = f"sqlite:///{os.path.join(directory, 'event.db')}"
+        seed(dsn, args.events)
+        print(f"ядер: {multiprocessing.cpu_count()}, генераторов: {args.clients} x {args.concurrency}, GET {args.path}")
+        print(f"{'воркеры':>8} {'RPS':>9} {'ускорение':>10} {'на воркер':>10} {'p50 мс':>8} {'p99 мс':>8} {'ошибки':>7} {'стоп, с':>8}")
+        base = None
+        for workers in counts:
+            result = run(args, dsn, workers)
+            base = base or result["rps"]
+            speedup = result["rps"] / base
+            print(
+                f"{workers:>8} {result['rps']:>9.0f} {speedup:>9.2f}x {speedup / workers * counts[0]:>9.0%}"
+                f" {format_ms(result['latency']['p50']):>8} {format_ms(result['latency']['p99']):>8}"
+                f" {result['errors']:>7} {result['shutdown']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Проверка профилирования по запросу (модуль profiling; на примере notification-service).
+
+Сервис поднимается в этом процессе дважды: без настроек и с PROFILING_TOKEN
+и SLOW_REQUEST_THRESHOLD_MS. Подсчёт непрочитанных искусственно замедляется.
+Проверяется, что:
+- без настроек middleware не подключено, эндпоинты отвечают 404, заголовок X-Profile игнорируется;
+- без верного токена профилирование недоступно;
+- профиль запроса и результат сэмплера — свёрнутые стеки со строками "стек число",
+  в которых виден медленный код;
+- в профиль запроса не попадает параллельный запрос в другом потоке;
+- медленный запрос попадает в журнал со стеком.
+
+    python benchmarks/check_profiling.py [--db URL]
+
+Код выхода 1, если хотя бы одна проверка не прошла.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from common import load_service
+
+failures = []
+
+TOKEN = "check-profiling"
+SLOW_SECONDS = 0.3
+COLLAPSED_LINE = re.compile(r"^\S.* \d+$")
+
+
+def expect(name: str, ok: bool, detail: str = ""):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def is_collapsed(text: str) -> bool:
+    lines = text.splitlines()
+    return bool(lines) and all(COLLAPSED_LINE.match(line) for line in lines)
+
+
+def load(db_url: str, env: dict):
+    main = load_service("notification-service", env={"DATABASE_URL": db_url, "RATE_LIMIT_ENABLED": "false", **env})
+    original = main.crud.get_unread_count
+
+    def slow_unread_count(db, user_id):
+        time.sleep(SLOW_SECONDS)
+        return original(db, user_id)
+
+    main.crud.get_unread_count = slow_unread_count
+    other = main.crud.get_notifications
+
+    def other_slow_notifications(db, **filters):
+        time.sleep(SLOW_SECONDS)
+        return other(db, **filters)
+
+    main.crud.get_notifications = other_slow_notifications
+    return main
+
+
+def run(db_url: str):
+    main = load(db_url, {})
+    with TestClient(main.app) as client:
+        middleware = [item.cls.__name__ for item in main.app.user_middleware]
+        expect("выключено: middleware не подключено", "ProfilingMiddleware" not in middleware, f"{middleware}")
+        response = client.get("/debug/profiling/sampler", headers={"X-Profiling-Token": TOKEN})
+        expect("выключено: эндпоинты отвечают 404", response.status_code == 404, f"{response.status_code}")
+        response = client.get("/users/1/unread-count", headers={"X-Profile": "collapsed", "X-Profiling-Token": TOKEN})
+        expect("выключено: X-Profile игнорируется", response.json() == {"user_id": 1, "unread_count": 0}, response.text[:80])
+
+    main = load(db_url, {"PROFILING_TOKEN": TOKEN, "SLOW_REQUEST_THRESHOLD_MS": str(SLOW_SECONDS * 1000 / 3)})
+    admin = {"X-Profiling-Token": TOKEN}
+    with TestClient(main.app) as client:
+        response = client.post("/debug/profiling/sampler/start", headers={"X-Profiling-Token": "wrong"})
+        expect("неверный токен: 403", response.status_code == 403, f"{response.status_code}")
+        response = client.get("/users/1/unread-count", headers={"X-Profile": "collapsed"})
+        expect("X-Profile без токена: обычный ответ", response.json() == {"user_id": 1, "unread_count": 0}, response.text[:80])
+
+        response = client.get("/users/1/unread-count", headers={"X-Profile": "collapsed", **admin})
+        profile = response.text
+        expect("профиль запроса: свёрнутые стеки", is_collapsed(profile) and response.headers.get("x-profile-status") == "200",
+               f"{response.headers.get('x-profile-samples')} снимков")
+        expect("профиль запроса: медленный код в стеке", "slow_unread_count" in profile and "app/main.py" in profile)
+
+        # Параллельный запрос выполняется всё время профилирования, но в профиль не попадает
+        other = threading.Thread(target=client.get, args=("/notifications/",))
+        other.start()
+        time.sleep(SLOW_SECONDS / 6)
+        profile = client.get("/users/1/unread-count", headers={"X-Profile": "collapsed", **admin}).text
+        other.join()
+        expect("профиль запроса: только свои потоки",
+               "slow_unread_count" in profile and "other_slow_notifications" not in profile)
+
+        client.post("/debug/profiling/sampler/start", headers=admin, params={"interval_ms": 5})
+        response = client.post("/debug/profiling/sampler/start", headers=admin)
+        expect("повторный запуск сэмплера: 409", response.status_code == 409, f"{response.status_code}")
+        client.get("/users/2/unread-count")
+        status = client.get("/debug/profiling/sampler", headers=admin).json()
+        response = client.post("/debug/profiling/sampler/stop", headers=admin)
+        expect("сэмплер: снимки во время работы", status["running"] and status["samples"] > 0, f"{status}")
+        expect("сэмплер: свёрнутые стеки с медленным кодом",
+               is_collapsed(response.text) and "slow_unread_count" in response.text)
+
+        # Сторож медленных запросов просыпается раз в половину порога
+        time.sleep(SLOW_SECONDS / 3)
+        slow = client.get("/debug/profiling/slow-requests", headers=admin).json()
+        paths = [entry["path"] for entry in slow]
+        expect("медленные запросы в журнале", "/users/2/unread-count" in paths, f"{paths}")
+        expect("журнал: стек медленного запроса",
+               any("slow_unread_count" in stack for entry in slow for stack in entry["stacks"].values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка профилирования по запросу")
+    parser.add_argument("--db")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(args.db or f"sqlite:///{os.path.join(directory, 'notification')}.db")
+
+    if failures:
+        print(f"\nНе прошли проверки: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Проверка планировщика напоминаний (event-service) и дедупликации уведомлений (notification-service).
+
+Оба сервиса поднимаются в этом процессе; event-service отправляет уведомления
+в notification-service через его TestClient. Проверяется, что:
+- напоминание получают подтверждённые участники мероприятий, вошедших в окно,
+  включая мероприятия с одинаковым start_date; очередь ожидания, отменённые и
+  ещё не вошедшие в окно мероприятия — нет;
+- при недоступном notification-service отметка окна не сдвигается, рассылка повторяется;
+- после перезапуска планировщика и после отката отметки (сбой до её сдвига)
+  повторных уведомлений и писем нет.
+
+По умолчанию используются временные SQLite-файлы:
+
+    python benchmarks/check_reminders.py [--event-db URL] [--notification-db URL]
+
+Код выхода 1, если хотя бы одна проверка не прошла.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from common import load_service
+
+failures = []
+
+WINDOW = 60
+USERS = 6
+
+
+def expect(name: str, ok: bool, detail: str = ""):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def run(event_url: str, notification_url: str):
+    notification_main = load_service("notification-service", env={
+        "DATABASE_URL": notification_url,
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    emailed = []
+    # Письма не отправляются, а считаются
+    notification_main.dispatcher.submit_many = lambda notifications, locale=None: emailed.extend(notifications)
+    notification_models, notification_database = notification_main.models, notification_main.database
+
+    main = load_service("event-service", env={
+        "DATABASE_URL": event_url,
+        "RATE_LIMIT_ENABLED": "false",
+        "REMINDER_WINDOWS": str(WINDOW),
+        "NOTIFICATION_SERVICE_URL": "http://notification-service",
+    })
+    database, models, notifications, reminders = main.database, main.models, main.notifications, main.reminders
+    security = HTTPBearer()
+
+    def resolve(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        user_id = int(credentials.credentials)
+        if not 1 <= user_id <= USERS + 1:
+            raise HTTPException(status_code=401)
+        return {"email": f"user{user_id}@example.com", "user_id": user_id, "username": f"user{user_id}"}
+
+    main.app.dependency_overrides[main.verify_token] = resolve
+    organizer = {"Authorization": f"Bearer {USERS + 1}"}
+
+    def user(user_id):
+        return {"Authorization": f"Bearer {user_id}"}
+
+    def reminders_sent():
+        with notification_database.SessionLocal() as db:
+            return sorted(db.execute(
+                select(notification_models.Notification.event_id, notification_models.Notification.user_id)
+                .where(notification_models.Notification.notification_type == "event_reminder")
+            ).all())
+
+    def set_watermark(start_date, event_id=0):
+        with database.SessionLocal() as db:
+            db.merge(models.ReminderWatermark(window_minutes=WINDOW, start_date=start_date, event_id=event_id))
+            db.commit()
+
+    with TestClient(notification_main.app) as notification_client:
+        main.migrate.migrate()
+        # Без lifespan: фоновая задача напоминаний не запускается, проходы выполняются явно
+        client = TestClient(main.app)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+
+        def create(title, starts_in, max_participants=None):
+            return client.post("/events/", headers=organizer, json={
+                "title": title, "category": "other", "max_participants": max_participants,
+                "start_date": (now + starts_in).replace(tzinfo=None).isoformat(),
+            }).json()["id"]
+
+        soon = create("Скоро", timedelta(minutes=30), max_participants=4)
+        tied = create("Скоро, то же время", timedelta(minutes=30))
+        later = create("Позже", timedelta(hours=3))
+        cancelled = create("Отменено", timedelta(minutes=20))
+        for u in range(1, 6):
+            client.post(f"/events/{soon}/register", headers=user(u))
+        for u in (1, 2):
+            client.post(f"/events/{tied}/register", headers=user(u))
+        client.post(f"/events/{later}/register", headers=user(1))
+        client.post(f"/events/{cancelled}/register", headers=user(3))
+        client.post(f"/events/{cancelled}/cancel", headers=organizer)
+        expected = sorted([(soon, u) for u in range(1, 5)] + [(tied, 1), (tied, 2)])
+
+        # Отметка часовой давности: с тех пор в окно вошли soon, tied и cancelled
+        set_watermark(now)
+
+        notifications.NOTIFICATION_SERVICE_URL = "http://127.0.0.1:1"
+        reminders.scheduler.run_due()
+        with database.SessionLocal() as db:
+            mark = db.get(models.ReminderWatermark, WINDOW)
+        expect("сбой доставки: отметка не сдвинута", not reminders_sent() and mark.event_id == 0,
+               f"отметка на мероприятии {mark.event_id}")
+
+        notifications.NOTIFICATION_SERVICE_URL = "http://notification-service"
+        notifications._session = notification_client
+        reminders.scheduler.run_due()
+        sent = reminders_sent()
+        expect("напоминания участникам вошедших в окно мероприятий", sent == expected, f"{sent}")
+        expect("письма с напоминаниями", len(emailed) == len(expected), f"{len(emailed)} писем")
+        with database.SessionLocal() as db:
+            mark = db.get(models.ReminderWatermark, WINDOW)
+        expect("отметка сдвинута на последнее мероприятие", mark.event_id == max(soon, tied), f"{mark.event_id}")
+
+        reminders.ReminderScheduler([WINDOW]).run_due()
+        expect("перезапуск: повторов нет", reminders_sent() == expected, f"{len(reminders_sent())} уведомлений")
+
+        # Сбой между рассылкой и сдвигом отметки: проход повторяется целиком
+        set_watermark(now)
+        reminders.ReminderScheduler([WINDOW]).run_due()
+        sent = reminders_sent()
+        expect("повтор после сбоя: дубликатов нет", sent == expected and len(emailed) == len(expected),
+               f"{len(sent)} уведомлений, {len(emailed)} писем")
+
+        with notification_database.SessionLocal() as db:
+            keys = db.scalar(select(func.count(notification_models.Notification.dedupe_key.distinct())))
+        expect("ключи дедупликации уникальны", keys == len(expected), f"{keys}")
+
+        response = notification_client.post("/notifications/bulk", json={
+            "user_ids": [1, 2], "event_id": soon, "notification_type": "event_reminder",
+            "message": "Повтор", "dedupe_key": f"reminder:{soon}:{WINDOW}",
+        })
+        expect("повтор пачки с тем же ключом пропускается", response.json() == {"created": 0}, f"{response.json()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка напоминаний о мероприятиях")
+    parser.add_argument("--event-db")
+    parser.add_argument("--notification-db")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        def sqlite(name):
+            return f"sqlite:///{os.path.join(directory, name)}.db"
+
+        run(args.event_db or sqlite("event"), args.notification_db or sqlite("notification"))
+
+    if failures:
+        print(f"\nНе прошли проверки: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
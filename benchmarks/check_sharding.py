@@ -0,0 +1,221 @@
+"""Проверка шардирования registrations (event-service) и notifications (notification-service).
+
+Сервисы поднимаются в этом процессе с несколькими БД-шардами. Проверяется, что:
+- регистрации лежат в шарде своего мероприятия, уведомления — в шарде пользователя,
+  а в основной БД их нет;
+- запросы по ключу (участники, выгрузка, непрочитанные) читают свой шард;
+- scatter-gather (мероприятия пользователя, общий список уведомлений) собирает все шарды;
+- отмена регистрации, прочтение и удаление уведомления по id находят нужный шард;
+- лента получает скорость регистраций из шардов.
+
+По умолчанию используются временные SQLite-файлы. Для Postgres нужны
+отдельные базы (или экземпляры) под основную БД и каждый шард:
+
+    python benchmarks/check_sharding.py \\
+        --event-db postgresql://.../event_db \\
+        --registration-shards postgresql://.../reg_0,postgresql://.../reg_1 \\
+        --notification-db postgresql://.../notification_db \\
+        --notification-shards postgresql://.../ntf_0,postgresql://.../ntf_1
+
+Код выхода 1, если хотя бы одна проверка не прошла.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from common import load_service
+
+failures = []
+
+EVENTS = 6
+USERS = 5
+NOTIFIED_USERS = 40
+
+
+def expect(name: str, ok: bool, detail: str = ""):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def shard_values(router, column):
+    """Различные значения column в каждом шарде"""
+    def values(shard):
+        return set(shard.scalars(select(column)))
+    return router.scatter(None, values)
+
+
+def check_events(primary_url: str, shard_urls: str):
+    main = load_service("event-service", env={
+        "DATABASE_URL": primary_url,
+        "REGISTRATION_SHARD_URLS": shard_urls,
+        "RATE_LIMIT_ENABLED": "false",
+        # Уведомления о регистрации не отправляются: сервис уведомлений не нужен
+        "NOTIFICATION_SERVICE_URL": "http://127.0.0.1:1",
+    })
+    database, models, feed = main.database, main.models, main.feed
+    router = database.registration_shards
+    security = HTTPBearer()
+
+    def resolve(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        user_id = int(credentials.credentials)
+        if not 1 <= user_id <= USERS + 1:
+            raise HTTPException(status_code=401)
+        return {"email": f"user{user_id}@example.com", "user_id": user_id, "username": f"user{user_id}"}
+
+    main.app.dependency_overrides[main.verify_token] = resolve
+    organizer = {"Authorization": f"Bearer {USERS + 1}"}
+
+    def user(user_id):
+        return {"Authorization": f"Bearer {user_id}"}
+
+    with TestClient(main.app) as client:
+        event_ids = [
+            client.post("/events/", headers=organizer, json={
+                "title": f"Шард {i}", "category": "other",
+                "start_date": "2030-01-01T10:00:00", "max_participants": 100,
+            }).json()["id"]
+            for i in range(EVENTS)
+        ]
+        # Пользователь u зарегистрирован на мероприятия с чётным (u + индекс)
+        expected = {u: [event_id for i, event_id in enumerate(event_ids) if (u + i) % 2 == 0] for u in range(1, USERS + 1)}
+        statuses = [
+            client.post(f"/events/{event_id}/register", headers=user(u)).status_code
+            for u, ids in expected.items() for event_id in ids
+        ]
+        expect("регистрации созданы", all(status == 200 for status in statuses), f"статусы {sorted(set(statuses))}")
+
+        placed = shard_values(router, models.Registration.event_id)
+        misplaced = [
+            event_id for shard, ids in enumerate(placed) for event_id in ids if router.shard_of(event_id) != shard
+        ]
+        expect("регистрации в шарде мероприятия", not misplaced, f"по шардам {[sorted(ids) for ids in placed]}")
+        with database.SessionLocal() as db:
+            in_primary = db.scalar(select(func.count()).select_from(models.Registration))
+        expect("в основной БД регистраций нет", in_primary == 0, f"{in_primary} строк")
+
+        for u, ids in expected.items():
+            got = sorted(event["id"] for event in client.get("/users/me/registered-events", headers=user(u)).json())
+            if got != sorted(ids):
+                expect(f"мероприятия пользователя {u} (scatter-gather)", False, f"{got} вместо {sorted(ids)}")
+                break
+        else:
+            expect("мероприятия пользователей (scatter-gather)", True)
+
+        summary = client.get("/users/me/registered-events/summary", headers=user(1)).json()
+        expect("сводка мероприятий пользователя", summary["total"] == len(expected[1]), f"total {summary['total']}")
+
+        event_id = event_ids[0]
+        registrants = sorted(u for u, ids in expected.items() if event_id in ids)
+        participants = sorted(row["user_id"] for row in client.get(f"/events/{event_id}/participants").json())
+        expect("участники из шарда мероприятия", participants == registrants, f"{participants}")
+        export = client.get(f"/events/{event_id}/participants/export", headers=organizer).text.strip().splitlines()
+        expect("выгрузка участников из шарда", len(export) == len(registrants) + 1, f"{len(export) - 1} строк")
+
+        repeat = client.post(f"/events/{event_id}/register", headers=user(registrants[0])).status_code
+        expect("повторная регистрация отклонена", repeat == 400, f"статус {repeat}")
+
+        status = client.delete(f"/events/{event_id}/unregister", headers=user(registrants[0])).status_code
+        event = client.get(f"/events/{event_id}", headers={"X-Consistency": "strong"}).json()
+        participants = [row["user_id"] for row in client.get(f"/events/{event_id}/participants").json()]
+        expect(
+            "отмена регистрации",
+            status == 200 and event["current_participants"] == len(registrants) - 1 and registrants[0] not in participants,
+            f"статус {status}, участников {event['current_participants']}"
+        )
+
+        feed.refresh()
+        recent = {row["id"]: row["registrations_recent"] for row in client.get("/events/trending?limit=100").json()}
+        counts = {i: sum(1 for ids in expected.values() if i in ids) for i in event_ids}
+        counts[event_id] -= 1
+        expect("скорость регистраций в ленте из шардов", recent == counts, f"{recent}")
+
+
+def check_notifications(primary_url: str, shard_urls: str):
+    main = load_service("notification-service", env={
+        "DATABASE_URL": primary_url,
+        "NOTIFICATION_SHARD_URLS": shard_urls,
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    database, models = main.database, main.models
+    router = database.notification_shards
+    user_ids = list(range(1, NOTIFIED_USERS + 1))
+
+    with TestClient(main.app) as client:
+        response = client.post("/notifications/bulk", json={
+            "user_ids": user_ids, "event_id": 1, "notification_type": "system", "message": "Проверка",
+        })
+        expect("массовое создание по шардам", response.status_code == 200 and response.json()["created"] == len(user_ids),
+               f"{response.json()}")
+        created = client.post("/notifications/", json={
+            "user_id": 7, "event_id": 1, "notification_type": "system", "message": "Проверка",
+        }).json()
+
+        placed = shard_values(router, models.Notification.user_id)
+        misplaced = [u for shard, ids in enumerate(placed) for u in ids if router.shard_of(u) != shard]
+        expect("уведомления в шарде пользователя", not misplaced, f"пользователей по шардам {[len(ids) for ids in placed]}")
+        with database.SessionLocal() as db:
+            in_primary = db.scalar(select(func.count()).select_from(models.Notification))
+        expect("в основной БД уведомлений нет", in_primary == 0, f"{in_primary} строк")
+
+        ids = [row["id"] for row in client.get("/notifications/", params={"limit": 1000}).json()]
+        expect("общий список (scatter-gather)", len(ids) == len(user_ids) + 1 and len(set(ids)) == len(ids),
+               f"{len(ids)} строк, {len(set(ids))} разных id")
+        page = client.get("/notifications/", params={"skip": 10, "limit": 5}).json()
+        expect("страница общего списка", len(page) == 5, f"{len(page)} строк")
+
+        mine = client.get("/notifications/", params={"user_id": 7}).json()
+        expect("список пользователя", len(mine) == 2, f"{len(mine)} строк")
+        unread = client.get("/users/7/unread-count").json()["unread_count"]
+        expect("непрочитанные пользователя", unread == 2, f"{unread}")
+
+        read = client.put(f"/notifications/{created['id']}/read")
+        unread = client.get("/users/7/unread-count").json()["unread_count"]
+        expect("прочтение по id", read.status_code == 200 and unread == 1, f"статус {read.status_code}, непрочитанных {unread}")
+        got = client.get(f"/notifications/{created['id']}").json()
+        expect("чтение по id", got.get("id") == created["id"] and got.get("is_read") is True, f"{got}")
+        deleted = client.delete(f"/notifications/{created['id']}").status_code
+        missing = client.get(f"/notifications/{created['id']}").status_code
+        expect("удаление по id", deleted == 200 and missing == 404, f"статусы {deleted}, {missing}")
+
+        # Повторные миграции не возвращают последовательности id назад
+        main.migrate.migrate()
+        again = client.post("/notifications/", json={
+            "user_id": 7, "event_id": 1, "notification_type": "system", "message": "Проверка",
+        }).json()
+        expect("повторные миграции: новый id не выдан повторно", again["id"] > created["id"] and again["id"] not in ids,
+               f"id {again['id']}, прежний {created['id']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка шардирования регистраций и уведомлений")
+    parser.add_argument("--shards", type=int, default=3, help="число SQLite-шардов, если URL не заданы")
+    parser.add_argument("--event-db")
+    parser.add_argument("--registration-shards", help="URL через запятую")
+    parser.add_argument("--notification-db")
+    parser.add_argument("--notification-shards", help="URL через запятую")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        def sqlite(name):
+            return f"sqlite:///{os.path.join(directory, name)}.db"
+
+        def shards(prefix):
+            return ",".join(sqlite(f"{prefix}_{i}") for i in range(args.shards))
+
+        check_events(args.event_db or sqlite("event"), args.registration_shards or shards("registrations"))
+        check_notifications(args.notification_db or sqlite("notification"), args.notification_shards or shards("notifications"))
+
+    if failures:
+        print(f"\nНе прошли проверки: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Проверка, что общие модули сервисов совпадают побайтно.
+
+Каждый образ собирается из каталога своего сервиса (COPY ./app ./app), поэтому
+общая инфраструктура (кэширование HTTP, лимиты, логи, профилирование, шарды и т.д.)
+лежит копией в app/ каждого сервиса. Исправление вносится во все копии сразу:
+
+    python benchmarks/check_shared_modules.py --sync event-service
+
+копирует модули из указанного сервиса в остальные. Без аргументов выводит
+расхождения; код выхода 1, если копии отличаются или какой-то копии нет.
+"""
+import argparse
+import difflib
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модуль -> сервисы, в которых лежит его копия
+SHARED_MODULES = {
+    "http_cache.py": ("auth-service", "event-service", "notification-service"),
+    "instrumentation.py": ("auth-service", "event-service", "notification-service"),
+    "rate_limit.py": ("auth-service", "event-service", "notification-service"),
+    "lifecycle.py": ("auth-service", "event-service", "notification-service"),
+    "logging_config.py": ("auth-service", "event-service", "notification-service"),
+    "profiling.py": ("auth-service", "event-service", "notification-service"),
+    "gunicorn_conf.py": ("auth-service", "event-service", "notification-service"),
+    # Реплика и шарды есть только у сервисов с большими таблицами
+    "sharding.py": ("event-service", "notification-service"),
+    "read_routing.py": ("event-service", "notification-service"),
+    "fastjson.py": ("event-service", "notification-service"),
+}
+
+
+def path_of(service: str, module: str) -> str:
+    return os.path.join(ROOT, service, "app", module)
+
+
+def read(path: str):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def check() -> list:
+    failures = []
+    for module, services in SHARED_MODULES.items():
+        reference, *others = services
+        expected = read(path_of(reference, module))
+        if expected is None:
+            failures.append(f"{reference}/app/{module}")
+            print(f"FAIL {module}: нет в {reference}")
+            continue
+        differing = []
+        for service in others:
+            actual = read(path_of(service, module))
+            if actual != expected:
+                differing.append(service)
+                failures.append(f"{service}/app/{module}")
+                if actual is None:
+                    continue
+                diff = difflib.unified_diff(
+                    expected.decode().splitlines(), actual.decode().splitlines(),
+                    f"{reference}/app/{module}", f"{service}/app/{module}", lineterm="", n=1,
+                )
+                for line in list(diff)[:20]:
+                    print(f"    {line}")
+        if differing:
+            print(f"FAIL {module}: отличается от {reference} в {', '.join(differing)}")
+        else:
+            print(f"ok   {module}: одинаков в {', '.join(services)}")
+    return failures
+
+
+def sync(source: str):
+    for module, services in SHARED_MODULES.items():
+        if source not in services:
+            continue
+        for service in services:
+            if service != source:
+                shutil.copyfile(path_of(source, module), path_of(service, module))
+                print(f"{source}/app/{module} -> {service}/app/{module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка копий общих модулей сервисов")
+    parser.add_argument("--sync", metavar="SERVICE", help="скопировать общие модули из этого сервиса в остальные")
+    args = parser.parse_args()
+
+    if args.sync:
+        sync(args.sync)
+    failures = check()
+    if failures:
+        print(f"\nКопии расходятся: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Общие помощники бенчмарков: перцентили и вывод сводок."""
+from typing import Dict, Iterable, List, Optional
+import importlib
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def service_path(service: str) -> str:
+    return os.path.join(ROOT, service)
+
+
+def use_service(service: str):
+    """Делает пакет app указанного сервиса импортируемым"""
+    path = service_path(service)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def load_service(service: str, module: str = "app.main", env: Optional[Dict[str, str]] = None):
+    """Импорт модуля сервиса в этот процесс.
+
+    У всех сервисов пакет называется app, поэтому перед импортом
+    ранее загруженный пакет убирается из sys.modules; уже импортированные
+    модули продолжают работать через свои ссылки.
+    """
+    for name in list(sys.modules):
+        if name == "app" or name.startswith("app."):
+            del sys.modules[name]
+    # Сервис в этом процессе один: схема создаётся при старте приложения
+    env = {"MIGRATE_ON_STARTUP": "true", **(env or {})}
+    previous_env = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    path = service_path(service)
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module(module)
+    finally:
+        sys.path.remove(path)
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies: Iterable[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max в миллисекундах по задержкам в секундах"""
+    values = sorted(latencies)
+    summary = {name: percentile(values, q) for name, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+    summary["max"] = values[-1] if values else None
+    return {name: (value * 1000 if value is not None else None) for name, value in summary.items()}
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
@@ -0,0 +1,163 @@
+"""Нагрузочный прогон email-пути notification-service.
+
+Отправляет POST /notifications/ с заданной частотой, опрашивает
+/email-queue/stats и выводит пропускную способность доставки, глубину
+очереди и перцентили задержек.
+
+Против docker-compose (smtp-sink уже запущен):
+
+    python benchmarks/email_load.py --url http://localhost:8002 --rate 200 --duration 30
+
+Против локально запущенного сервиса со встроенным SMTP sink
+(сервис запускается с EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025 EMAIL_USE_TLS=false):
+
+    python benchmarks/email_load.py --with-sink --sink-latency-ms 20 --sink-failure-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from common import latency_summary, format_ms, use_service
+
+
+async def sample_queue(client: httpx.AsyncClient, url: str, samples: list, stop: asyncio.Event, interval: float):
+    while not stop.is_set():
+        try:
+            response = await client.get(f"{url}/email-queue/stats")
+            samples.append(response.json())
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def fire(client: httpx.AsyncClient, url: str, index: int, latencies: list, errors: list):
+    payload = {
+        "user_id": random.randint(1, 100000),
+        "notification_type": "event_registration",
+        "message": f"Нагрузочный тест, уведомление #{index}",
+    }
+    started = time.perf_counter()
+    try:
+        response = await client.post(f"{url}/notifications/", json=payload)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+    except httpx.HTTPError as e:
+        errors.append(type(e).__name__)
+    latencies.append(time.perf_counter() - started)
+
+
+async def run(args):
+    sink = None
+    if args.with_sink:
+        use_service("notification-service")
+        from app.smtp_sink import SMTPSink
+
+        sink = SMTPSink(
+            host="127.0.0.1",
+            port=args.sink_port,
+            latency_ms=args.sink_latency_ms,
+            failure_rate=args.sink_failure_rate,
+        )
+        await sink.start()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        before = (await client.get(f"{args.url}/email-queue/stats")).json()
+
+        samples, latencies, errors = [], [], []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_queue(client, args.url, samples, stop, args.sample_interval))
+
+        # Открытая модель нагрузки: запросы уходят по расписанию, не дожидаясь ответов
+        total = int(args.rate * args.duration)
+        started = time.perf_counter()
+        tasks = []
+        for index in range(total):
+            delay = started + index / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(client, args.url, index, latencies, errors)))
+        await asyncio.gather(*tasks)
+        sent_at = time.perf_counter()
+
+        # Ожидание, пока очередь писем опустеет
+        after = before
+        while time.perf_counter() - sent_at < args.drain_timeout:
+            after = (await client.get(f"{args.url}/email-queue/stats")).json()
+            if after["queue_depth"] == 0 and after["in_flight"] == 0:
+                break
+            await asyncio.sleep(args.sample_interval)
+        drained_at = time.perf_counter()
+
+        stop.set()
+        await sampler
+
+    if sink:
+        await sink.stop()
+
+    delivered = after["sent"] - before["sent"]
+    failed = after["failed"] - before["failed"]
+    depths = [sample["queue_depth"] for sample in samples] or [0]
+    report = {
+        "requests": total,
+        "request_errors": len(errors),
+        "achieved_rps": total / (sent_at - started),
+        "request_latency_ms": latency_summary(latencies),
+        "delivered": delivered,
+        "delivery_failed": failed,
+        "delivery_throughput": delivered / (drained_at - started),
+        "drain_seconds": drained_at - sent_at,
+        "queue_depth": {"max": max(depths), "avg": sum(depths) / len(depths)},
+        "delivery_latency_ms": after["latency_ms"],
+        "sink": sink.stats() if sink else None,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    print(f"Запросов: {total} ({report['achieved_rps']:.0f} RPS), ошибок: {len(errors)}")
+    request_latency = report["request_latency_ms"]
+    print(
+        "Задержка POST, мс: "
+        + " ".join(f"{name}={format_ms(request_latency[name])}" for name in ("p50", "p95", "p99", "max"))
+    )
+    print(f"Доставлено писем: {delivered}, отказов: {failed}")
+    print(f"Пропускная способность доставки: {report['delivery_throughput']:.1f} писем/с")
+    print(f"Очередь опустела через {report['drain_seconds']:.1f} с после нагрузки")
+    print(f"Глубина очереди: max={report['queue_depth']['max']} avg={report['queue_depth']['avg']:.1f}")
+    delivery_latency = report["delivery_latency_ms"]
+    print(
+        "Задержка доставки (очередь → SMTP), мс: "
+        + " ".join(f"{name}={format_ms(delivery_latency[name])}" for name in ("p50", "p95", "p99"))
+    )
+    if sink:
+        print(f"SMTP sink: {sink.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон email-пути notification-service")
+    parser.add_argument("--url", default="http://localhost:8002")
+    parser.add_argument("--rate", type=float, default=100.0, help="запросов в секунду")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд нагрузки")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--with-sink", action="store_true", help="запустить SMTP sink в этом процессе")
+    parser.add_argument("--sink-port", type=int, default=1025)
+    parser.add_argument("--sink-latency-ms", type=float, default=0.0)
+    parser.add_argument("--sink-failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Нагрузочный бенчмарк трёх сервисов.
+
+Режимы:
+  http — против запущенных сервисов (docker-compose up), по их URL;
+  asgi — сервисы импортируются в этот процесс и вызываются через
+         httpx.ASGITransport, без сети.
+
+SQL-запросы считаются в режиме asgi, а в режиме http — по заголовку
+X-DB-Query-Count, если сервисы запущены с DEBUG=true.
+
+Данные готовятся заранее через benchmarks/datagen.py с тем же --scale.
+
+    python benchmarks/run.py --mode asgi --scale 100000 --duration 20 --save-baseline baseline.json
+    python benchmarks/run.py --mode http --compare baseline.json
+"""
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+
+import httpx
+
+from common import latency_summary, format_ms, load_service
+from datagen import DEFAULT_DSN, BENCH_PASSWORD
+from scenarios import SCENARIOS
+
+SERVICES = ("auth", "event", "notification")
+
+
+class Stack:
+    """Доступ к трём сервисам и сбор метрик запросов"""
+
+    def __init__(self, args):
+        self.args = args
+        self.users = args.users or max(10, args.scale // 10)
+        self.events = args.events or max(10, args.scale // 100)
+        self.password = BENCH_PASSWORD
+        self.clients = {}
+        self.apps = {}
+        self.modules = {}
+        self.engines = {}
+        self.lifespans = []
+        self.tokens = []
+        self.token_users = {}
+        self.query_count = 0
+        self.header_queries = False
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    async def start(self):
+        timeout = httpx.Timeout(self.args.timeout)
+        if self.args.mode == "http":
+            for service in SERVICES:
+                self.clients[service] = httpx.AsyncClient(
+                    base_url=getattr(self.args, f"{service}_url"),
+                    timeout=timeout,
+                    limits=httpx.Limits(max_connections=self.args.concurrency * 2),
+                )
+            return
+
+        from sqlalchemy import event as sa_event
+
+        for service in SERVICES:
+            dsn = getattr(self.args, f"{service}_db")
+            # Все виртуальные пользователи идут с одного адреса: лимиты частоты исказили бы замер
+            main = load_service(f"{service}-service", env={"DATABASE_URL": dsn, "RATE_LIMIT_ENABLED": "false"})
+            self.modules[service] = main
+            self.apps[service] = main.app
+            engine = main.database.engine
+            self.engines[service] = engine
+            sa_event.listen(engine, "before_cursor_execute", self._count_query)
+            lifespan = main.app.router.lifespan_context(main.app)
+            await lifespan.__aenter__()
+            self.lifespans.append(lifespan)
+            self.clients[service] = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=main.app),
+                base_url=f"http://{service}-service",
+                timeout=timeout,
+            )
+        self._override_event_auth()
+
+    def _override_event_auth(self):
+        # В процессе нет сети до auth-service: токены проверяются по словарю,
+        # заполненному при входе через встроенный auth-service
+        from fastapi import Depends, HTTPException
+        from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+        security = HTTPBearer()
+        main = self.modules["event"]
+
+        def resolve_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+            user = self.token_users.get(credentials.credentials)
+            if user is None:
+                raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+            return user
+
+        main.app.dependency_overrides[main.verify_token] = resolve_token
+
+    async def stop(self):
+        for client in self.clients.values():
+            await client.aclose()
+        for lifespan in reversed(self.lifespans):
+            await lifespan.__aexit__(None, None, None)
+
+    def _count_query(self, *args):
+        self.query_count += 1
+
+    def reset_metrics(self):
+        self.query_count = 0
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    async def request(self, service, method, url, expected=(200,), record=True, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.clients[service].request(method, url, **kwargs)
+        except httpx.HTTPError:
+            if record:
+                self.errors += 1
+                self.latencies.append(time.perf_counter() - started)
+            raise
+        if record:
+            self.latencies.append(time.perf_counter() - started)
+            # В режиме http число запросов к БД берётся из заголовков (сервисы с DEBUG=true)
+            if self.args.mode == "http" and "x-db-query-count" in response.headers:
+                self.header_queries = True
+                self.query_count += int(response.headers["x-db-query-count"])
+            self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+            if response.status_code not in expected:
+                self.errors += 1
+        return response
+
+    async def ensure_tokens(self):
+        if self.tokens:
+            return
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def login(user):
+            async with semaphore:
+                response = await self.request(
+                    "auth", "POST", "/token", record=False,
+                    data={"username": f"bench{user}@example.com", "password": self.password},
+                )
+                token = response.json()["access_token"]
+                if self.args.mode == "asgi":
+                    me = await self.request(
+                        "auth", "GET", "/users/me", record=False,
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                    data = me.json()
+                    self.token_users[token] = {
+                        "email": data["email"], "user_id": data["id"], "username": data["username"],
+                    }
+                return token
+
+        count = min(self.args.token_pool, self.users)
+        print(f"  вход {count} пользователей для пула токенов...")
+        self.tokens = await asyncio.gather(*(login(user) for user in range(1, count + 1)))
+
+    def auth_headers(self, index: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[index % len(self.tokens)]}"}
+
+
+async def run_scenario(stack: Stack, scenario, args) -> dict:
+    await scenario.setup(stack)
+
+    async def worker(index, deadline, rng):
+        iteration = 0
+        while time.perf_counter() < deadline:
+            try:
+                await scenario.run_once(stack, rng, index, iteration)
+            except httpx.HTTPError:
+                pass
+            iteration += 1
+
+    if args.warmup:
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(worker(i, deadline, random.Random(i)) for i in range(args.concurrency)))
+
+    stack.reset_metrics()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        worker(i, deadline, random.Random(args.seed + i)) for i in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    requests = len(stack.latencies)
+    counted = args.mode == "asgi" or stack.header_queries
+    result = {
+        "requests": requests,
+        "errors": stack.errors,
+        "statuses": {str(code): count for code, count in sorted(stack.statuses.items())},
+        "rps": requests / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(stack.latencies),
+        "db_queries": stack.query_count if counted else None,
+        "db_queries_per_request": (stack.query_count / requests) if counted and requests else None,
+    }
+    await scenario.teardown(stack)
+    return result
+
+
+def print_results(results: dict):
+    print()
+    print(f"{'сценарий':<22} {'запросов':>9} {'ошибок':>7} {'RPS':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL/запр':>9}")
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        per_request = result["db_queries_per_request"]
+        print(
+            f"{name:<22} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+            f"{format_ms(latency['p50']):>8} {format_ms(latency['p95']):>8} {format_ms(latency['p99']):>8} "
+            f"{'-' if per_request is None else f'{per_request:.2f}':>9}"
+        )
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["scenarios"]
+    ok = True
+    print(f"\nСравнение с {baseline_path} (допуск {tolerance:.0%}):")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name}: нет в базовой линии")
+            continue
+        # Для RPS регрессия — падение, для задержки и числа запросов к БД — рост
+        checks = [
+            ("RPS", base["rps"], result["rps"], -1),
+            ("p95", base["latency_ms"]["p95"], result["latency_ms"]["p95"], 1),
+            ("SQL/запр", base.get("db_queries_per_request"), result.get("db_queries_per_request"), 1),
+        ]
+        for metric, before, after, direction in checks:
+            if before is None or after is None:
+                continue
+            if direction > 0:
+                regressed = after > before * (1 + tolerance)
+            else:
+                regressed = after < before * (1 - tolerance)
+            marker = "РЕГРЕССИЯ" if regressed else "ok"
+            print(f"  {name:<22} {metric:<9} {before:>10.2f} -> {after:>10.2f}  {marker}")
+            ok = ok and not regressed
+    return ok
+
+
+async def main_async(args) -> int:
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(unknown)}; доступны: {', '.join(SCENARIOS)}")
+
+    stack = Stack(args)
+    await stack.start()
+    results = {}
+    try:
+        for name in names:
+            scenario = SCENARIOS[name]()
+            print(f"{name}: {scenario.description} ({args.duration:.0f} с, {args.concurrency} воркеров)")
+            results[name] = await run_scenario(stack, scenario, args)
+    finally:
+        await stack.stop()
+
+    print_results(results)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "mode": args.mode,
+            "scale": args.scale,
+            "users": stack.users,
+            "events": stack.events,
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "scenarios": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nРезультаты сохранены в {path}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк auth/event/notification сервисов")
+    parser.add_argument("--mode", choices=("http", "asgi"), default="http")
+    parser.add_argument("--scenarios", help=f"через запятую, по умолчанию все: {', '.join(SCENARIOS)}")
+    parser.add_argument("--scale", type=int, default=10000, help="тот же масштаб, что у datagen.py")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--events", type=int)
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на сценарий")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--token-pool", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--auth-url", default="http://localhost:8000")
+    parser.add_argument("--event-url", default="http://localhost:8001")
+    parser.add_argument("--notification-url", default="http://localhost:8002")
+    parser.add_argument("--auth-db", default=DEFAULT_DSN.format(db="auth_db"))
+    parser.add_argument("--event-db", default=DEFAULT_DSN.format(db="event_db"))
+    parser.add_argument("--notification-db", default=DEFAULT_DSN.format(db="notification_db"))
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--save-baseline", help="сохранить результаты как базовую линию")
+    parser.add_argument("--compare", help="сравнить с базовой линией и завершиться с кодом 1 при регрессии")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
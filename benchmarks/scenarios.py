@@ -0,0 +1,112 @@
+"""Сценарии нагрузки для benchmarks/run.py.
+
+Каждый сценарий описывает одну «операцию» пользователя; раннер выполняет
+операции в замкнутом цикле несколькими воркерами и измеряет каждый HTTP-запрос.
+"""
+import random
+
+CATEGORIES = ["conference", "workshop", "seminar", "meetup", "party", "sports", "other"]
+CITIES = ["Москва", "Казань", "Онлайн"]
+
+
+class Scenario:
+    name = ""
+    description = ""
+
+    async def setup(self, ctx):
+        pass
+
+    async def run_once(self, ctx, rng: random.Random, worker: int, iteration: int):
+        raise NotImplementedError
+
+    async def teardown(self, ctx):
+        pass
+
+
+class BrowseEvents(Scenario):
+    name = "browse_events"
+    description = "лента мероприятий с фильтрами по категории, городу и датам"
+
+    async def run_once(self, ctx, rng, worker, iteration):
+        params = {"limit": 20}
+        roll = rng.random()
+        if roll < 0.4:
+            params["category"] = rng.choice(CATEGORIES)
+        elif roll < 0.6:
+            params["location"] = rng.choice(CITIES)
+        elif roll < 0.7:
+            params["date_from"] = "2024-01-01T00:00:00"
+        await ctx.request("event", "GET", "/events/", params=params)
+
+
+class DeepPagination(Scenario):
+    name = "deep_pagination"
+    description = "листание далёких страниц ленты (большой OFFSET)"
+
+    async def run_once(self, ctx, rng, worker, iteration):
+        skip = rng.randint(0, max(0, ctx.events - 100))
+        await ctx.request("event", "GET", "/events/", params={"skip": skip, "limit": 100})
+
+
+class RegistrationBurst(Scenario):
+    name = "registration_burst"
+    description = "всплеск регистраций разных пользователей на одно мероприятие"
+
+    async def setup(self, ctx):
+        await ctx.ensure_tokens()
+        response = await ctx.request(
+            "event", "POST", "/events/",
+            json={
+                "title": "Бенчмарк: горячее мероприятие",
+                "category": "conference",
+                "start_date": "2030-01-01T10:00:00",
+            },
+            headers=ctx.auth_headers(0),
+            record=False,
+        )
+        self.event_id = response.json()["id"]
+
+    async def run_once(self, ctx, rng, worker, iteration):
+        headers = ctx.auth_headers(worker * 7919 + iteration)
+        await ctx.request(
+            "event", "POST", f"/events/{self.event_id}/register",
+            headers=headers, expected=(200, 400),
+        )
+        await ctx.request(
+            "event", "DELETE", f"/events/{self.event_id}/unregister",
+            headers=headers, expected=(200, 404),
+        )
+
+    async def teardown(self, ctx):
+        await ctx.request(
+            "event", "DELETE", f"/events/{self.event_id}",
+            headers=ctx.auth_headers(0), record=False, expected=(200, 404),
+        )
+
+
+class LoginStorm(Scenario):
+    name = "login_storm"
+    description = "массовый вход пользователей (bcrypt)"
+
+    async def run_once(self, ctx, rng, worker, iteration):
+        user = rng.randint(1, ctx.users)
+        await ctx.request(
+            "auth", "POST", "/token",
+            data={"username": f"bench{user}@example.com", "password": ctx.password},
+        )
+
+
+class NotificationPolling(Scenario):
+    name = "notification_polling"
+    description = "опрос уведомлений и счётчика непрочитанных, как делает клиент"
+
+    async def run_once(self, ctx, rng, worker, iteration):
+        user = rng.randint(1, ctx.users)
+        await ctx.request("notification", "GET", "/notifications/", params={"user_id": user, "limit": 20})
+        await ctx.request("notification", "GET", f"/users/{user}/unread-count")
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (BrowseEvents, DeepPagination, RegistrationBurst, LoginStorm, NotificationPolling)
+}
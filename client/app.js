@@ -13,6 +13,146 @@ let eventsPerPage = 6;
 let currentEvents = [];
 let notificationCheckInterval = null;
 
+// POST с ключом идемпотентности: при сетевой ошибке запрос повторяется с тем же ключом,
+// и сервер отдаёт сохранённый ответ вместо повторного создания
+async function postIdempotent(url, options = {}, attempts = 3) {
+    const key = crypto.randomUUID();
+    const headers = { ...(options.headers || {}), 'Idempotency-Key': key };
+    
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(url, { ...options, method: 'POST', headers });
+            if (response.ok) {
+                noteWrite();
+            }
+            // 409: первый запрос с этим ключом ещё выполняется
+            if (response.status !== 409 || attempt >= attempts) {
+                return response;
+            }
+        } catch (error) {
+            if (attempt >= attempts) {
+                throw error;
+            }
+        }
+        await new Promise(resolve => setTimeout(resolve, 500 * attempt));
+    }
+}
+
+// Чтение своих изменений: несколько секунд после записи GET-запросы просят сервер
+// читать из основной БД, а не из реплики, которая может отставать
+const READ_YOUR_WRITES_MS = 5000;
+let lastWriteAt = 0;
+
+function noteWrite() {
+    lastWriteAt = Date.now();
+}
+
+function readHeaders(headers = {}) {
+    if (Date.now() - lastWriteAt < READ_YOUR_WRITES_MS) {
+        return { ...headers, 'X-Consistency': 'strong' };
+    }
+    return headers;
+}
+
+// Слой данных для GET-запросов: одинаковые одновременные запросы объединяются в один,
+// ответы кэшируются по URL и отдаются сразу, а устаревшие перепроверяются по ETag
+// (If-None-Match) — неизменившиеся данные сервер возвращает ответом 304 без тела
+const CACHE_FRESH_MS = 15000;
+const CACHE_MAX_ENTRIES = 50;
+const responseCache = new Map();
+const inFlightRequests = new Map();
+
+class HttpError extends Error {
+    constructor(status) {
+        super(`HTTP ${status}`);
+        this.status = status;
+    }
+}
+
+function cacheKey(url, headers) {
+    return `${headers['Authorization'] || ''} ${url}`;
+}
+
+function revalidate(url, headers, key) {
+    // Запрос, начатый до своей записи, может вернуть прежние данные: к нему не присоединяемся
+    const pending = inFlightRequests.get(key);
+    if (pending && pending.startedAt >= lastWriteAt) {
+        return pending;
+    }
+    
+    const cached = responseCache.get(key);
+    const requestHeaders = readHeaders({ ...headers });
+    if (cached && cached.etag) {
+        requestHeaders['If-None-Match'] = cached.etag;
+    }
+    
+    const startedAt = Date.now();
+    const request = fetch(url, { headers: requestHeaders, cache: 'no-store' })
+        .then(async response => {
+            if (response.status === 304 && cached) {
+                cached.fetchedAt = startedAt;
+                return { data: cached.data, changed: false };
+            }
+            if (!response.ok) {
+                throw new HttpError(response.status);
+            }
+            const data = await response.json();
+            responseCache.delete(key);
+            responseCache.set(key, { data, etag: response.headers.get('ETag'), fetchedAt: startedAt });
+            if (responseCache.size > CACHE_MAX_ENTRIES) {
+                responseCache.delete(responseCache.keys().next().value);
+            }
+            return { data, changed: true };
+        })
+        .finally(() => {
+            if (inFlightRequests.get(key) === request) {
+                inFlightRequests.delete(key);
+            }
+        });
+    request.startedAt = startedAt;
+    inFlightRequests.set(key, request);
+    return request;
+}
+
+// JSON по GET-запросу. Свежий ответ (моложе maxAge) берётся из кэша без запроса.
+// С onUpdate устаревший ответ отдаётся сразу, а после перепроверки, если данные
+// изменились, onUpdate получает новые. Ответы, полученные до своей записи,
+// без перепроверки не используются
+async function fetchJSON(url, { headers = {}, maxAge = CACHE_FRESH_MS, onUpdate = null } = {}) {
+    const key = cacheKey(url, headers);
+    const cached = responseCache.get(key);
+    const valid = cached && cached.fetchedAt >= lastWriteAt;
+    
+    if (valid && Date.now() - cached.fetchedAt < maxAge) {
+        return cached.data;
+    }
+    if (valid && onUpdate) {
+        revalidate(url, headers, key)
+            .then(result => {
+                if (result.changed) {
+                    onUpdate(result.data);
+                }
+            })
+            .catch(error => console.error('Revalidate error:', error));
+        return cached.data;
+    }
+    return (await revalidate(url, headers, key)).data;
+}
+
+// Фоновая загрузка в кэш, когда браузер свободен
+function prefetchJSON(url, options = {}) {
+    const run = () => fetchJSON(url, options).catch(() => {});
+    if (window.requestIdleCallback) {
+        requestIdleCallback(run);
+    } else {
+        setTimeout(run, 0);
+    }
+}
+
+function authHeaders() {
+    return { 'Authorization': `Bearer ${authToken}` };
+}
+
 // Инициализация при загрузке
 document.addEventListener('DOMContentLoaded', function() {
     checkAuthStatus();
@@ -32,6 +172,13 @@ document.addEventListener('DOMContentLoaded', function() {
         startNotificationPolling();
     }
     
+    // Скрытая вкладка сервер не опрашивает; при возврате на неё счётчик обновляется сразу
+    document.addEventListener('visibilitychange', function() {
+        if (!document.hidden && currentUser) {
+            loadUnreadNotificationsCount();
+        }
+    });
+    
     // Закрытие выпадающего меню при клике вне его
     document.addEventListener('click', function(event) {
         const dropdown = document.getElementById('userDropdownContent');
@@ -53,27 +200,20 @@ async function checkAuthStatus() {
     }
     
     try {
-        const response = await fetch(`${API_CONFIG.AUTH_SERVICE}/users/me`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
+        currentUser = await fetchJSON(`${API_CONFIG.AUTH_SERVICE}/users/me`, { headers: authHeaders() });
+        updateAuthUI(true);
+        startNotificationPolling();
         
-        if (response.ok) {
-            currentUser = await response.json();
-            updateAuthUI(true);
-            startNotificationPolling();
-            
-            // Загружаем уведомления если на странице уведомлений
-            if (document.getElementById('notifications').style.display !== 'none') {
-                loadNotifications();
-            }
-        } else {
-            localStorage.removeItem('authToken');
-            updateAuthUI(false);
+        // Загружаем уведомления если на странице уведомлений
+        if (document.getElementById('notifications').style.display !== 'none') {
+            loadNotifications();
         }
     } catch (error) {
-        console.error('Auth check error:', error);
+        if (error instanceof HttpError) {
+            localStorage.removeItem('authToken');
+        } else {
+            console.error('Auth check error:', error);
+        }
         updateAuthUI(false);
     }
 }
@@ -200,6 +340,7 @@ function logout() {
         localStorage.removeItem('lastNotificationCount');
         authToken = null;
         currentUser = null;
+        responseCache.clear();
         updateAuthUI(false);
         hideAllNotificationBadges();
         showSection('home');
@@ -207,27 +348,43 @@ function logout() {
     }
 }
 
+// URL страницы списка мероприятий с текущими фильтрами
+function eventsUrl(page) {
+    const category = document.getElementById('categoryFilter')?.value;
+    const location = document.getElementById('locationFilter')?.value;
+    const dateFrom = document.getElementById('dateFromFilter')?.value;
+    const dateTo = document.getElementById('dateToFilter')?.value;
+    
+    let url = `${API_CONFIG.EVENT_SERVICE}/events/?skip=${(page - 1) * eventsPerPage}&limit=${eventsPerPage}`;
+    
+    if (category) url += `&category=${category}`;
+    if (location) url += `&location=${encodeURIComponent(location)}`;
+    if (dateFrom) url += `&date_from=${dateFrom}`;
+    if (dateTo) url += `&date_to=${dateTo}`;
+    return url;
+}
+
+// URL последней запрошенной страницы: обновление из кэша не перерисовывает другую страницу
+let shownEventsUrl = null;
+
 // Загрузка мероприятий
 async function loadEvents(page = 1) {
     try {
-        const category = document.getElementById('categoryFilter')?.value;
-        const location = document.getElementById('locationFilter')?.value;
-        const dateFrom = document.getElementById('dateFromFilter')?.value;
-        const dateTo = document.getElementById('dateToFilter')?.value;
+        const url = eventsUrl(page);
+        shownEventsUrl = url;
         
-        let url = `${API_CONFIG.EVENT_SERVICE}/events/?skip=${(page - 1) * eventsPerPage}&limit=${eventsPerPage}`;
-        
-        if (category) url += `&category=${category}`;
-        if (location) url += `&location=${encodeURIComponent(location)}`;
-        if (dateFrom) url += `&date_from=${dateFrom}`;
-        if (dateTo) url += `&date_to=${dateTo}`;
-        
-        const response = await fetch(url);
-        
-        if (response.ok) {
-            currentEvents = await response.json();
+        const show = events => {
+            if (url !== shownEventsUrl) return;
+            currentEvents = events;
             renderEvents(currentEvents);
             renderPagination(page);
+        };
+        const events = await fetchJSON(url, { onUpdate: show });
+        show(events);
+        
+        // Следующая страница загружается заранее, переход на неё не ждёт сервер
+        if (events.length === eventsPerPage) {
+            prefetchJSON(eventsUrl(page + 1));
         }
     } catch (error) {
         console.error('Load events error:', error);
@@ -357,8 +514,7 @@ async function handleCreateEvent(e) {
     }
     
     try {
-        const response = await fetch(`${API_CONFIG.EVENT_SERVICE}/events/`, {
-            method: 'POST',
+        const response = await postIdempotent(`${API_CONFIG.EVENT_SERVICE}/events/`, {
             headers: {
                 'Content-Type': 'application/json',
                 'Authorization': `Bearer ${authToken}`
@@ -390,15 +546,20 @@ async function registerForEvent(eventId) {
     }
     
     try {
-        const response = await fetch(`${API_CONFIG.EVENT_SERVICE}/events/${eventId}/register`, {
-            method: 'POST',
+        const response = await postIdempotent(`${API_CONFIG.EVENT_SERVICE}/events/${eventId}/register`, {
             headers: {
                 'Authorization': `Bearer ${authToken}`
             }
         });
         
         if (response.ok) {
-            alert('Вы успешно зарегистрировались на мероприятие!');
+            const data = await response.json();
+            if (data.registration.status === 'waitlisted') {
+                // Мест нет: запись уже стоит в очереди, повторять запрос не нужно
+                alert(`Мест нет. Вы в очереди ожидания (позиция ${data.waitlist_position}), при освобождении места регистрация произойдёт автоматически`);
+            } else {
+                alert('Вы успешно зарегистрировались на мероприятие!');
+            }
             loadEvents(currentEventsPage);
             
             // Обновляем счетчик уведомлений после регистрации
@@ -418,43 +579,45 @@ async function registerForEvent(eventId) {
 // Просмотр деталей мероприятия
 async function viewEventDetails(eventId) {
     try {
-        const response = await fetch(`${API_CONFIG.EVENT_SERVICE}/events/${eventId}`);
+        // Мероприятие, участники и статус текущего пользователя одним запросом
+        const headers = authToken ? authHeaders() : {};
+        const detail = await fetchJSON(`${API_CONFIG.EVENT_SERVICE}/events/${eventId}/detail`, { headers });
         
-        if (response.ok) {
-            const event = await response.json();
+        const event = detail.event;
+        const participants = detail.participants;
+        
+        const modalBody = document.getElementById('modalBody');
+        modalBody.innerHTML = `
+            <h2>${escapeHtml(event.title)}</h2>
+            <p><strong>Категория:</strong> ${getCategoryName(event.category)}</p>
+            <p><strong>Описание:</strong> ${event.description ? escapeHtml(event.description) : 'Отсутствует'}</p>
+            <p><strong>Местоположение:</strong> ${event.location ? escapeHtml(event.location) : 'Не указано'}</p>
+            <p><strong>Дата начала:</strong> ${formatDate(event.start_date)}</p>
+            ${event.end_date ? `<p><strong>Дата окончания:</strong> ${formatDate(event.end_date)}</p>` : ''}
+            <p><strong>Участники:</strong> ${detail.participant_count}${event.max_participants ? `/${event.max_participants}` : ''}</p>
+            ${detail.waitlist_count > 0 ? `<p><strong>В очереди ожидания:</strong> ${detail.waitlist_count}</p>` : ''}
             
-            // Загрузка участников
-            const participantsResponse = await fetch(`${API_CONFIG.EVENT_SERVICE}/events/${eventId}/participants`);
-            const participants = participantsResponse.ok ? await participantsResponse.json() : [];
+            ${participants.length > 0 ? `
+                <h3>Список участников:</h3>
+                <ul>
+                    ${participants.map(p => `<li>${escapeHtml(p.full_name || p.username || `Пользователь #${p.user_id}`)}</li>`).join('')}
+                </ul>
+                ${detail.participant_count > participants.length ? `<p>и ещё ${detail.participant_count - participants.length}</p>` : ''}
+            ` : '<p>Пока нет участников</p>'}
             
-            const modalBody = document.getElementById('modalBody');
-            modalBody.innerHTML = `
-                <h2>${event.title}</h2>
-                <p><strong>Категория:</strong> ${getCategoryName(event.category)}</p>
-                <p><strong>Описание:</strong> ${event.description || 'Отсутствует'}</p>
-                <p><strong>Местоположение:</strong> ${event.location || 'Не указано'}</p>
-                <p><strong>Дата начала:</strong> ${formatDate(event.start_date)}</p>
-                ${event.end_date ? `<p><strong>Дата окончания:</strong> ${formatDate(event.end_date)}</p>` : ''}
-                <p><strong>Участники:</strong> ${event.current_participants}${event.max_participants ? `/${event.max_participants}` : ''}</p>
-                
-                ${participants.length > 0 ? `
-                    <h3>Список участников:</h3>
-                    <ul>
-                        ${participants.map(p => `<li>Пользователь #${p.user_id}</li>`).join('')}
-                    </ul>
-                ` : '<p>Пока нет участников</p>'}
-                
-                ${currentUser ? `
-                    <div class="modal-actions">
-                        <button class="btn btn-primary" onclick="registerForEvent(${event.id})">
-                            <i class="fas fa-user-plus"></i> Зарегистрироваться
-                        </button>
-                    </div>
-                ` : ''}
-            `;
+            ${detail.registration_status === 'confirmed' ? '<p><strong>Вы зарегистрированы</strong></p>' : ''}
+            ${detail.registration_status === 'waitlisted' ? '<p><strong>Вы в очереди ожидания</strong></p>' : ''}
             
-            document.getElementById('eventModal').style.display = 'flex';
-        }
+            ${currentUser && !detail.registration_status ? `
+                <div class="modal-actions">
+                    <button class="btn btn-primary" onclick="registerForEvent(${event.id})">
+                        <i class="fas fa-user-plus"></i> Зарегистрироваться
+                    </button>
+                </div>
+            ` : ''}
+        `;
+        
+        document.getElementById('eventModal').style.display = 'flex';
     } catch (error) {
         console.error('View event details error:', error);
         alert('Ошибка загрузки деталей мероприятия');
@@ -478,36 +641,27 @@ async function loadMyEvents() {
     }
     
     try {
-        // Созданные мероприятия
-        const createdResponse = await fetch(`${API_CONFIG.EVENT_SERVICE}/users/me/events`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
-        
-        if (createdResponse.ok) {
-            const createdEvents = await createdResponse.json();
-            renderMyEvents('created', createdEvents);
-        }
-        
-        // Зарегистрированные мероприятия
-        const registeredResponse = await fetch(`${API_CONFIG.EVENT_SERVICE}/users/me/registered-events`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
+        // Оба списка и счётчик уведомлений приходят одним запросом
+        const show = dashboard => {
+            renderMyEvents('created', dashboard.organized.items, dashboard.organized.total);
+            renderMyEvents('registered', dashboard.registered.items, dashboard.registered.total);
+            
+            if (dashboard.unread_count !== null) {
+                updateNotificationBadges(dashboard.unread_count);
+                localStorage.setItem('unreadNotifications', dashboard.unread_count);
             }
-        });
-        
-        if (registeredResponse.ok) {
-            const registeredEvents = await registeredResponse.json();
-            renderMyEvents('registered', registeredEvents);
-        }
+        };
+        show(await fetchJSON(`${API_CONFIG.EVENT_SERVICE}/users/me/dashboard`, {
+            headers: authHeaders(),
+            onUpdate: show
+        }));
     } catch (error) {
         console.error('Load my events error:', error);
     }
 }
 
 // Отображение моих мероприятий
-function renderMyEvents(type, events) {
+function renderMyEvents(type, events, total = events.length) {
     const containerId = type === 'created' ? 'myCreatedEvents' : 'myRegisteredEvents';
     const container = document.getElementById(containerId);
     
@@ -533,7 +687,6 @@ function renderMyEvents(type, events) {
                 <span class="event-category">${getCategoryName(event.category)}</span>
             </div>
             <div class="event-body">
-                <p>${event.description || 'Описание отсутствует'}</p>
                 <div class="event-info">
                     <i class="fas fa-map-marker-alt"></i>
                     <span>${event.location || 'Местоположение не указано'}</span>
@@ -562,7 +715,9 @@ function renderMyEvents(type, events) {
                 `}
             </div>
         </div>
-    `).join('');
+    `).join('') + (total > events.length ? `
+        <p class="no-events">Показано ${events.length} из ${total}</p>
+    ` : '');
 }
 
 // Удаление мероприятия
@@ -578,6 +733,7 @@ async function deleteEvent(eventId) {
         });
         
         if (response.ok) {
+            noteWrite();
             alert('Мероприятие удалено');
             loadMyEvents();
         } else {
@@ -603,6 +759,7 @@ async function unregisterFromEvent(eventId) {
         });
         
         if (response.ok) {
+            noteWrite();
             alert('Регистрация отменена');
             loadMyEvents();
         } else {
@@ -632,10 +789,7 @@ async function loadNotifications() {
     }
     
     try {
-        const response = await fetch(`${API_CONFIG.NOTIFICATION_SERVICE}/notifications/?user_id=${currentUser.id}`);
-        
-        if (response.ok) {
-            const notifications = await response.json();
+        const show = notifications => {
             renderNotifications(notifications);
             
             // Показываем кнопку "Отметить все как прочитанные" если есть уведомления
@@ -644,10 +798,13 @@ async function loadNotifications() {
             } else {
                 document.getElementById('markAllReadBtn').style.display = 'none';
             }
-            
-            // После загрузки уведомлений обновляем счетчик
-            loadUnreadNotificationsCount();
-        }
+        };
+        show(await fetchJSON(`${API_CONFIG.NOTIFICATION_SERVICE}/notifications/?user_id=${currentUser.id}`, {
+            onUpdate: show
+        }));
+        
+        // После загрузки уведомлений обновляем счетчик
+        loadUnreadNotificationsCount();
     } catch (error) {
         console.error('Load notifications error:', error);
         document.getElementById('notificationsList').innerHTML = `
@@ -704,6 +861,7 @@ async function markAsRead(notificationId) {
         });
         
         if (response.ok) {
+            noteWrite();
             // Обновляем отображение уведомления
             const notificationElement = document.getElementById(`notification-${notificationId}`);
             if (notificationElement) {
@@ -721,20 +879,20 @@ async function markAsRead(notificationId) {
 // Пометить все как прочитанные
 async function markAllAsRead() {
     try {
-        const response = await fetch(`${API_CONFIG.NOTIFICATION_SERVICE}/notifications/?user_id=${currentUser.id}`);
+        // Список перепроверяется у сервера: отмечать нужно актуальные непрочитанные
+        const notifications = await fetchJSON(`${API_CONFIG.NOTIFICATION_SERVICE}/notifications/?user_id=${currentUser.id}`, {
+            maxAge: 0
+        });
+        const unreadNotifications = notifications.filter(n => !n.is_read);
         
-        if (response.ok) {
-            const notifications = await response.json();
-            const unreadNotifications = notifications.filter(n => !n.is_read);
-            
-            for (const notification of unreadNotifications) {
-                await fetch(`${API_CONFIG.NOTIFICATION_SERVICE}/notifications/${notification.id}/read`, {
-                    method: 'PUT'
-                });
-            }
-            
-            loadNotifications();
+        for (const notification of unreadNotifications) {
+            await fetch(`${API_CONFIG.NOTIFICATION_SERVICE}/notifications/${notification.id}/read`, {
+                method: 'PUT'
+            });
         }
+        noteWrite();
+        
+        loadNotifications();
     } catch (error) {
         console.error('Mark all as read error:', error);
     }
@@ -750,6 +908,7 @@ async function deleteNotification(notificationId) {
         });
         
         if (response.ok) {
+            noteWrite();
             // Удаляем элемент из DOM
             const notificationElement = document.getElementById(`notification-${notificationId}`);
             if (notificationElement) {
@@ -769,18 +928,14 @@ async function loadUnreadNotificationsCount() {
     if (!currentUser) return;
     
     try {
-        const response = await fetch(`${API_CONFIG.NOTIFICATION_SERVICE}/users/${currentUser.id}/unread-count`);
+        const data = await fetchJSON(`${API_CONFIG.NOTIFICATION_SERVICE}/users/${currentUser.id}/unread-count`);
+        const count = data.unread_count;
         
-        if (response.ok) {
-            const data = await response.json();
-            const count = data.unread_count;
-            
-            // Обновляем все бейджи
-            updateNotificationBadges(count);
-            
-            // Сохраняем в localStorage для быстрого доступа
-            localStorage.setItem('unreadNotifications', count);
-        }
+        // Обновляем все бейджи
+        updateNotificationBadges(count);
+        
+        // Сохраняем в localStorage для быстрого доступа
+        localStorage.setItem('unreadNotifications', count);
     } catch (error) {
         console.error('Error loading unread notifications count:', error);
     }
@@ -838,16 +993,11 @@ async function loadProfileInfo() {
     if (!currentUser) return;
     
     try {
-        const response = await fetch(`${API_CONFIG.AUTH_SERVICE}/users/me`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
-        });
-        
-        if (response.ok) {
-            const userData = await response.json();
-            displayProfileInfo(userData);
-        }
+        // Профиль обычно уже в кэше после проверки авторизации
+        displayProfileInfo(await fetchJSON(`${API_CONFIG.AUTH_SERVICE}/users/me`, {
+            headers: authHeaders(),
+            onUpdate: displayProfileInfo
+        }));
     } catch (error) {
         console.error('Error loading profile:', error);
     }
@@ -1039,7 +1189,8 @@ function startNotificationPolling() {
     }
     
     notificationCheckInterval = setInterval(() => {
-        if (currentUser) {
+        // Пока вкладка скрыта, опрос пропускается
+        if (currentUser && !document.hidden) {
             loadUnreadNotificationsCount();
         }
     }, 30000); // Проверяем каждые 30 секунд
@@ -1054,6 +1205,16 @@ function stopNotificationPolling() {
 }
 
 // Вспомогательные функции
+// Экранирование введённого пользователями текста перед вставкой в innerHTML
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 function formatDate(dateString) {
     if (!dateString) return 'Не указано';
     
@@ -1085,7 +1246,8 @@ function getNotificationTitle(type) {
         'event_created': 'Мероприятие создано',
         'event_registration': 'Регистрация на мероприятие',
         'event_updated': 'Мероприятие обновлено',
-        'event_cancelled': 'Мероприятие отменено'
+        'event_cancelled': 'Мероприятие отменено',
+        'event_reminder': 'Напоминание о мероприятии'
     };
     return titles[type] || 'Уведомление';
 }
@@ -0,0 +1,93 @@
+"""Заполнение event_stats_daily по существующим регистрациям.
+
+Нужно один раз для данных, появившихся до дневных агрегатов, или после
+их потери. Заполняются только дни, которых в таблице ещё нет: число
+подтверждённых регистраций с этой датой (UTC). Существующие строки не
+меняются — в инкрементальных счётчиках учтены и регистрации, отменённые
+позже, по сырым данным их не восстановить. Повторный запуск ничего не меняет.
+
+    python -m app.backfill_stats
+    python -m app.backfill_stats --event-id 42
+"""
+from datetime import date
+import argparse
+import logging
+
+from sqlalchemy import func, select
+
+from . import models
+from .database import SessionLocal, engine, registration_shards
+from .stats import upsert as stats_upsert
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _utc_day(dialect: str):
+    """День регистрации в UTC, как у инкрементальных счётчиков (stats.today)"""
+    if dialect == "postgresql":
+        # date() от timestamptz берёт день в часовом поясе сессии
+        return func.date(func.timezone("UTC", models.Registration.registered_at))
+    # SQLite хранит время без пояса, в UTC
+    return func.date(models.Registration.registered_at)
+
+
+def _daily_registrations(dialect: str, event_id: int = None):
+    day = _utc_day(dialect)
+    statement = select(
+        models.Registration.event_id,
+        day.label("day"),
+        func.count().label("registrations")
+    ).where(
+        models.Registration.status == models.RegistrationStatus.CONFIRMED.value
+    ).group_by(models.Registration.event_id, day)
+    if event_id is not None:
+        statement = statement.where(models.Registration.event_id == event_id)
+    return statement
+
+
+def backfill(event_id: int = None) -> int:
+    """Число найденных дней с регистрациями; уже заполненные дни пропускаются"""
+    models.Base.metadata.create_all(bind=engine, tables=[models.EventStatsDaily.__table__])
+    db = SessionLocal()
+    try:
+        upsert = stats_upsert(db).on_conflict_do_nothing(index_elements=["event_id", "day"])
+
+        # Агрегаты читаются потоком из каждого шарда и записываются пачками;
+        # мероприятие целиком лежит в одном шарде, поэтому строки шардов не пересекаются
+        total = 0
+        for shard_index in range(registration_shards.count):
+            with registration_shards.session(db, shard_index) as shard:
+                statement = _daily_registrations(shard.get_bind().dialect.name, event_id)
+                result = shard.execute(statement.execution_options(yield_per=BATCH_SIZE))
+                for partition in result.partitions():
+                    rows = [
+                        {
+                            "event_id": row.event_id,
+                            "day": row.day if isinstance(row.day, date) else date.fromisoformat(row.day),
+                            "registrations": row.registrations,
+                            "cancellations": 0
+                        }
+                        for row in partition
+                    ]
+                    db.execute(upsert, rows)
+                    total += len(rows)
+        db.commit()
+        return total
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение дневной статистики регистраций")
+    parser.add_argument("--event-id", type=int, help="только одно мероприятие")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    rows = backfill(args.event_id)
+    logger.info("Дневная статистика заполнена: проверено %s дней", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+
+logger = logging.getLogger(__name__)
+
+
+def exclusive(engine, lock_id: int, job: Callable[[], object]) -> Callable[[], object]:
+    """Обёртка, с которой задачу в каждый момент выполняет только один воркер.
+
+    Используется advisory lock Postgres: воркер, не получивший блокировку,
+    пропускает этот запуск. На SQLite (один процесс) функция не меняется.
+    """
+    if engine.dialect.name != "postgresql":
+        return job
+
+    def run():
+        with engine.connect() as conn:
+            if not conn.execute(select(func.pg_try_advisory_lock(lock_id))).scalar():
+                return None
+            try:
+                return job()
+            finally:
+                conn.execute(select(func.pg_advisory_unlock(lock_id)))
+                conn.commit()
+
+    return run
+
+
+class PeriodicTask:
+    """Периодический запуск синхронной функции в пуле потоков внутри цикла событий сервиса"""
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        func: Callable[[], object],
+        initial_delay: Optional[float] = None,
+        run_on_stop: bool = False
+    ):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.initial_delay = interval if initial_delay is None else initial_delay
+        # Последний запуск при остановке процесса, чтобы не оставлять накопленную работу
+        self.run_on_stop = run_on_stop
+        self._task: Optional[asyncio.Task] = None
+        self._running: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+        logger.info("Фоновая задача %s запущена, интервал %s с", self.name, self.interval)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Текущий запуск доводится до конца: поток с функцией всё равно не прервать
+        running = self._running
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        if running is not None:
+            await asyncio.gather(running, return_exceptions=True)
+        self._task = None
+        if self.run_on_stop:
+            await self.run_once()
+
+    async def run_once(self):
+        try:
+            await asyncio.to_thread(self.func)
+        except Exception as e:
+            logger.error("Ошибка фоновой задачи %s: %s", self.name, e)
+
+    async def _loop(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            # Отдельная задача: отмена цикла при остановке не обрывает ожидание текущего запуска
+            self._running = asyncio.create_task(self.run_once())
+            await asyncio.shield(self._running)
+            self._running = None
+            await asyncio.sleep(self.interval)
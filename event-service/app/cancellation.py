@@ -0,0 +1,39 @@
+import logging
+
+from . import crud, notifications
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _fan_out(db, event_id: int, title: str):
+    # Получатели читаются пачками по размеру запроса рассылки, без блокировки строки мероприятия
+    for user_ids in crud.iter_registrant_ids(db, event_id, notifications.NOTIFICATION_CHUNK_SIZE):
+        notifications.send_bulk_notifications(
+            user_ids,
+            event_id,
+            "event_cancelled",
+            f"Мероприятие '{title}' отменено"
+        )
+
+
+def notify_cancelled(event_id: int, title: str):
+    """Фоновая рассылка event_cancelled всем участникам отменённого мероприятия"""
+    db = SessionLocal()
+    try:
+        _fan_out(db, event_id, title)
+    finally:
+        db.close()
+
+
+def notify_and_purge(event_id: int, title: str, notify: bool = True):
+    """Фоновая рассылка и физическое удаление отменённого мероприятия"""
+    db = SessionLocal()
+    try:
+        if notify:
+            _fan_out(db, event_id, title)
+        crud.purge_event(db, event_id)
+    except Exception as e:
+        logger.error("Ошибка при удалении мероприятия %s: %s", event_id, e)
+    finally:
+        db.close()
@@ -1,20 +1,30 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc
+from sqlalchemy import or_, and_, case, desc, delete, update, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List, Tuple
 import logging
 
-from . import models, schemas
+from . import models, schemas, event_changes, feed, stats
+from .database import read_session, registration_shards
+from .detail_cache import event_details
+from .fastjson import columns_for
 
 logger = logging.getLogger(__name__)
 
+# Колонки для списков: строки сериализуются напрямую, без ORM-объектов
+EVENT_COLUMNS = columns_for(models.Event, schemas.Event)
+
 # CRUD для мероприятий
 def create_event(db: Session, event: schemas.EventCreate, user_id: int):
-    db_event = models.Event(**event.model_dump(), organizer_id=user_id)
+    # updated_at задан явно, иначе после INSERT колонка с onupdate дочитывается отдельным SELECT
+    db_event = models.Event(**event.model_dump(), organizer_id=user_id, updated_at=None)
     db.add(db_event)
+    db.flush()
+    feed.add_event(db, db_event.id)
     db.commit()
-    db.refresh(db_event)
-    logger.info(f"Создано мероприятие {db_event.id} пользователем {user_id}")
+    logger.info("Создано мероприятие %s пользователем %s", db_event.id, user_id)
     return db_event
 
 def get_event(db: Session, event_id: int):
@@ -25,16 +35,14 @@ def get_events(db: Session, skip: int = 0, limit: int = 100):
         .order_by(desc(models.Event.start_date))\
         .offset(skip).limit(limit).all()
 
-def get_events_with_filters(
-    db: Session, 
-    skip: int = 0, 
-    limit: int = 100,
+def _filter_events(
+    query,
     category: Optional[str] = None,
     location: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None
 ):
-    query = db.query(models.Event).filter(models.Event.is_published == True)
+    query = query.filter(models.Event.is_published == True)
     
     if category:
         query = query.filter(models.Event.category == category)
@@ -50,91 +58,466 @@ def get_events_with_filters(
         date_to_dt = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
         query = query.filter(models.Event.start_date <= date_to_dt)
     
+    return query
+
+def get_events_with_filters(
+    db: Session, 
+    skip: int = 0, 
+    limit: int = 100,
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    query = _filter_events(db.query(*EVENT_COLUMNS), category, location, date_from, date_to)
     return query.order_by(desc(models.Event.start_date))\
         .offset(skip).limit(limit).all()
 
-def update_event(db: Session, event_id: int, event_update: schemas.EventUpdate):
-    db_event = get_event(db, event_id)
-    if not db_event:
-        return None
-    
+def update_event(
+    db: Session,
+    db_event: models.Event,
+    event_update: schemas.EventUpdate
+) -> Tuple[models.Event, List[int]]:
+    """Правка мероприятия; возвращает его и пользователей, получивших место из очереди при увеличении лимита"""
     update_data = event_update.model_dump(exclude_unset=True)
+    changes = event_changes.diff(db_event, update_data)
     
     for field, value in update_data.items():
         setattr(db_event, field, value)
     
+    # Участники уведомляются только об изменении видимых полей, в одной транзакции с правкой
+    if changes and not db_event.is_cancelled:
+        event_changes.record(db, db_event.id, changes)
+    with registration_shards.session_for(db, db_event.id) as shard:
+        promoted = []
+        # Новый лимит заполняется из очереди в той же транзакции: пока она не зафиксирована,
+        # строка мероприятия заблокирована и новая регистрация не займёт места раньше очереди
+        if update_data.get("max_participants") is not None and not db_event.is_cancelled:
+            db.flush()
+            promoted, participants = _fill_seats(db, shard, db_event.id)
+            if participants is not None:
+                set_committed_value(db_event, "current_participants", participants)
+        # Строка ленты пересчитывается, только если изменились её поля
+        if feed.FEED_FIELDS.intersection(update_data):
+            db.flush()
+            feed.refresh_event(db, db_event.id)
+        _commit(db, shard)
+    event_details.invalidate(db_event.id)
+    logger.info("Обновлено мероприятие %s", db_event.id)
+    return db_event, promoted
+
+def cancel_event(db: Session, db_event: models.Event):
+    """Мягкая отмена: мероприятие скрывается из выдачи, строка блокируется на один короткий UPDATE"""
+    db_event.is_cancelled = True
+    db_event.is_published = False
+    db_event.cancelled_at = func.now()
+    feed.remove_event(db, db_event.id)
     db.commit()
-    db.refresh(db_event)
-    logger.info(f"Обновлено мероприятие {event_id}")
+    event_details.invalidate(db_event.id)
+    logger.info("Отменено мероприятие %s", db_event.id)
     return db_event
 
-def delete_event(db: Session, event_id: int):
-    db_event = get_event(db, event_id)
-    if not db_event:
-        return None
-    
-    # Удаляем все регистрации на это мероприятие
-    db.query(models.Registration).filter(models.Registration.event_id == event_id).delete()
+def iter_registrant_ids(db: Session, event_id: int, batch_size: int = 1000) -> Iterator[List[int]]:
+    """Участники мероприятия пачками: серверный курсор в шарде мероприятия, без загрузки всего списка в память"""
+    with registration_shards.session_for(db, event_id) as shard:
+        result = shard.execute(
+            select(models.Registration.user_id)
+            .where(models.Registration.event_id == event_id)
+            .execution_options(yield_per=batch_size)
+        )
+        for partition in result.scalars().partitions():
+            yield list(partition)
+
+def purge_event(db: Session, event_id: int, batch_size: int = 10000):
+    """Физическое удаление мероприятия; регистрации снимаются пачками, чтобы не держать длинную транзакцию"""
+    with registration_shards.session_for(db, event_id) as shard:
+        while True:
+            batch = select(models.Registration.id)\
+                .where(models.Registration.event_id == event_id)\
+                .limit(batch_size)\
+                .scalar_subquery()
+            deleted = shard.execute(
+                delete(models.Registration).where(models.Registration.id.in_(batch))
+            ).rowcount
+            shard.commit()
+            if deleted < batch_size:
+                break
     
-    db.delete(db_event)
+    # Оставшиеся регистрации (записанные в процессе) удалит ON DELETE CASCADE;
+    # в шардах внешних ключей нет, поэтому регистрации там снимаются до удаления мероприятия
+    db.execute(delete(models.Event).where(models.Event.id == event_id))
     db.commit()
-    logger.info(f"Удалено мероприятие {event_id}")
-    return db_event
+    event_details.invalidate(event_id)
+    logger.info("Удалено мероприятие %s", event_id)
 
-def get_events_by_organizer(db: Session, organizer_id: int):
-    return db.query(models.Event)\
+def get_events_by_organizer(db: Session, organizer_id: int, skip: int = 0, limit: int = 100):
+    return db.query(*EVENT_COLUMNS)\
         .filter(models.Event.organizer_id == organizer_id)\
         .order_by(desc(models.Event.created_at))\
-        .all()
+        .offset(skip).limit(limit).all()
 
 # CRUD для регистраций
-def create_registration(db: Session, event_id: int, user_id: int):
-    db_registration = models.Registration(event_id=event_id, user_id=user_id)
-    db.add(db_registration)
-    db.commit()
-    db.refresh(db_registration)
-    logger.info(f"Создана регистрация {db_registration.id} для мероприятия {event_id}")
-    return db_registration
+def create_registration(
+    db: Session, db_event: models.Event, user_id: int
+) -> Tuple[Optional[models.Registration], List[int]]:
+    """Регистрация с атомарным занятием места; без свободных мест — запись в очередь ожидания.
 
-def get_registration(db: Session, event_id: int, user_id: int):
-    return db.query(models.Registration)\
-        .filter(
-            models.Registration.event_id == event_id,
-            models.Registration.user_id == user_id
-        ).first()
-
-def delete_registration(db: Session, registration_id: int):
-    db_registration = db.query(models.Registration).filter(models.Registration.id == registration_id).first()
-    if not db_registration:
-        return None
+    Возвращает регистрацию и пользователей, получивших место из очереди.
+    Повторную регистрацию отклоняет уникальный индекс (event_id, user_id):
+    тогда регистрация None, а место и счётчики не меняются.
+    """
+    # Проверка лимита и увеличение счётчика одним UPDATE, без гонки между проверкой и записью
+    participants = db.execute(
+        update(models.Event)
+        .where(
+            models.Event.id == db_event.id,
+            or_(
+                models.Event.max_participants.is_(None),
+                models.Event.current_participants < models.Event.max_participants
+            )
+        )
+        .values(current_participants=models.Event.current_participants + 1)
+        .returning(models.Event.current_participants)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if participants is None:
+        db.rollback()
+        return _join_waitlist(db, db_event, user_id)
+    set_committed_value(db_event, "current_participants", participants)
+    feed.on_participants_changed(db, db_event.id, participants)
+    stats.record(db, db_event.id, registrations=1)
     
-    db.delete(db_registration)
-    db.commit()
-    logger.info(f"Удалена регистрация {registration_id}")
-    return db_registration
+    db_registration = models.Registration(event_id=db_event.id, user_id=user_id)
+    if not registration_shards.sharded:
+        db.add(db_registration)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Откатываются и место, и строка ленты, и статистика
+            db.rollback()
+            return None, []
+    else:
+        # Место занимается в основной БД, регистрация пишется в шард мероприятия;
+        # распределённой транзакции нет, поэтому при ошибке шарда место возвращается
+        db.commit()
+        try:
+            with registration_shards.session_for(db, db_event.id) as shard:
+                shard.add(db_registration)
+                shard.commit()
+        except Exception as e:
+            _release_seat(db, db_event.id)
+            stats.record(db, db_event.id, registrations=-1)
+            db.commit()
+            if isinstance(e, IntegrityError):
+                return None, []
+            raise
+    event_details.invalidate(db_event.id)
+    logger.info("Создана регистрация %s для мероприятия %s", db_registration.id, db_event.id)
+    return db_registration, []
 
-def update_event_participants(db: Session, event_id: int, increment: bool = True):
-    db_event = get_event(db, event_id)
-    if not db_event:
-        return
+def _join_waitlist(db: Session, db_event: models.Event, user_id: int) -> Tuple[models.Registration, List[int]]:
+    """Запись в конец очереди ожидания: одна строка вместо повторных попыток клиента"""
+    db_registration = models.Registration(
+        event_id=db_event.id,
+        user_id=user_id,
+        status=models.RegistrationStatus.WAITLISTED.value
+    )
+    try:
+        with registration_shards.session_for(db, db_event.id) as shard:
+            shard.add(db_registration)
+            shard.commit()
+    except IntegrityError:
+        db.rollback()
+        return None, []
+    event_details.invalidate(db_event.id)
+    logger.info("Пользователь %s в очереди ожидания мероприятия %s", user_id, db_event.id)
     
-    if increment:
-        db_event.current_participants += 1
+    # Место могло освободиться между проверкой и записью, пока очередь была пуста:
+    # блокирующее повышение нужно только в этом редком случае
+    seats = db.execute(
+        select(models.Event.current_participants, models.Event.max_participants)
+        .where(models.Event.id == db_event.id)
+    ).one()
+    db.rollback()
+    promoted = []
+    if seats.max_participants is not None and (seats.current_participants or 0) < seats.max_participants:
+        promoted = promote_waitlist(db, db_event)
+        if user_id in promoted:
+            set_committed_value(db_registration, "status", models.RegistrationStatus.CONFIRMED.value)
+    return db_registration, promoted
+
+def _release_seat(db: Session, event_id: int):
+    """Уменьшение счётчика участников в транзакции вызывающего; новые значения счётчика и лимита"""
+    seats = db.execute(
+        update(models.Event)
+        .where(models.Event.id == event_id, models.Event.current_participants > 0)
+        .values(current_participants=models.Event.current_participants - 1)
+        .returning(models.Event.current_participants, models.Event.max_participants)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if seats is not None:
+        feed.on_participants_changed(db, event_id, seats.current_participants)
+    return seats
+
+def _confirm_waitlisted(shard: Session, event_id: int, free: int) -> List[int]:
+    """Перевод первых free записей очереди в участники в транзакции шарда вызывающего"""
+    if free <= 0:
+        return []
+    # SKIP LOCKED: запись, которую сейчас удаляет её владелец, не задерживает очередь
+    waiting = shard.execute(
+        select(models.Registration.id, models.Registration.user_id)
+        .where(
+            models.Registration.event_id == event_id,
+            models.Registration.status == models.RegistrationStatus.WAITLISTED.value
+        )
+        .order_by(models.Registration.id)
+        .limit(free)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not waiting:
+        return []
+    shard.execute(
+        update(models.Registration)
+        .where(models.Registration.id.in_([row.id for row in waiting]))
+        .values(status=models.RegistrationStatus.CONFIRMED.value)
+        .execution_options(synchronize_session=False)
+    )
+    logger.info("Из очереди ожидания мероприятия %s повышено %s записей", event_id, len(waiting))
+    return [row.user_id for row in waiting]
+
+def _fill_seats(db: Session, shard: Session, event_id: int, released: int = 0) -> Tuple[List[int], Optional[int]]:
+    """Свободные места мероприятия переходят первым из очереди; released — только что освобождённые места.
+
+    Строка мероприятия блокируется до коммита вызывающего, поэтому два заполнения
+    не выдают одни и те же места, а новые регистрации ждут и не обгоняют очередь.
+    Счётчик участников и дневная статистика меняются один раз на итоговую разницу.
+    Возвращает повышенных пользователей и новое число участников (None, если ничего не изменилось).
+    """
+    if released:
+        # Освобождение мест сразу блокирует строку и возвращает новые значения
+        current = func.coalesce(models.Event.current_participants, 0)
+        seats = db.execute(
+            update(models.Event)
+            .where(models.Event.id == event_id)
+            .values(current_participants=case((current > released, current - released), else_=0))
+            .returning(models.Event.current_participants, models.Event.max_participants)
+            .execution_options(synchronize_session=False)
+        ).first()
     else:
-        db_event.current_participants = max(0, db_event.current_participants - 1)
-    
+        seats = db.execute(
+            select(models.Event.current_participants, models.Event.max_participants)
+            .where(models.Event.id == event_id)
+            .with_for_update()
+        ).first()
+    if seats is None:
+        return [], None
+    participants = seats.current_participants or 0
+    promoted = []
+    if seats.max_participants is not None:
+        promoted = _confirm_waitlisted(shard, event_id, seats.max_participants - participants)
+    if not promoted and not released:
+        return [], None
+    if promoted:
+        participants += len(promoted)
+        db.execute(
+            update(models.Event)
+            .where(models.Event.id == event_id)
+            .values(current_participants=participants)
+            .execution_options(synchronize_session=False)
+        )
+    stats.record(db, event_id, registrations=len(promoted), cancellations=released)
+    return promoted, participants
+
+def _commit(db: Session, shard: Session):
+    """Без шардирования — одна транзакция. С шардами сначала фиксируется счётчик
+    в основной БД: при сбое между коммитами место теряется, но не выдаётся дважды"""
     db.commit()
-    db.refresh(db_event)
+    if shard is not db:
+        shard.commit()
+
+def promote_waitlist(db: Session, db_event: models.Event) -> List[int]:
+    """Заполнение свободных мест мероприятия из очереди ожидания одной транзакцией"""
+    with registration_shards.session_for(db, db_event.id) as shard:
+        promoted, participants = _fill_seats(db, shard, db_event.id)
+        if participants is not None:
+            feed.on_participants_changed(db, db_event.id, participants)
+        _commit(db, shard)
+    if participants is not None:
+        event_details.invalidate(db_event.id)
+        set_committed_value(db_event, "current_participants", participants)
+    return promoted
+
+def get_registration(db: Session, event_id: int, user_id: int):
+    with registration_shards.session_for(db, event_id) as shard:
+        return shard.query(models.Registration)\
+            .filter(
+                models.Registration.event_id == event_id,
+                models.Registration.user_id == user_id
+            ).first()
+
+def get_waitlist_position(db: Session, event_id: int, registration_id: int) -> int:
+    """Место записи в очереди ожидания, начиная с 1"""
+    with registration_shards.session_for(db, event_id) as shard:
+        return shard.scalar(
+            select(func.count())
+            .where(
+                models.Registration.event_id == event_id,
+                models.Registration.status == models.RegistrationStatus.WAITLISTED.value,
+                models.Registration.id <= registration_id
+            )
+        )
+
+def delete_registration(db: Session, event_id: int, user_id: int) -> Optional[List[int]]:
+    """Удаление регистрации; освободившееся место в той же транзакции переходит первому из очереди.
+
+    Возвращает пользователей, получивших место; None, если регистрации не было.
+    """
+    with registration_shards.session_for(db, event_id) as shard:
+        deleted = shard.execute(
+            delete(models.Registration)
+            .where(
+                models.Registration.event_id == event_id,
+                models.Registration.user_id == user_id
+            )
+            .returning(models.Registration.id, models.Registration.status)
+        ).first()
+        if deleted is None:
+            shard.rollback()
+            return None
+        # С шардами удаление фиксируется сразу, без них — одной транзакцией со счётчиком ниже
+        if shard is not db:
+            shard.commit()
+        
+        promoted = []
+        # Запись из очереди места не занимала: счётчики не меняются
+        if deleted.status != models.RegistrationStatus.WAITLISTED.value:
+            promoted, participants = _fill_seats(db, shard, event_id, released=1)
+            if participants is not None:
+                feed.on_participants_changed(db, event_id, participants)
+        _commit(db, shard)
+    event_details.invalidate(event_id)
+    logger.info("Удалена регистрация %s", deleted.id)
+    return promoted
 
 def get_event_participants(db: Session, event_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Registration)\
-        .filter(models.Registration.event_id == event_id)\
-        .order_by(models.Registration.registered_at)\
-        .offset(skip).limit(limit).all()
+    with registration_shards.session_for(db, event_id) as shard:
+        return shard.query(models.Registration)\
+            .filter(
+                models.Registration.event_id == event_id,
+                models.Registration.status == models.RegistrationStatus.CONFIRMED.value
+            )\
+            .order_by(models.Registration.registered_at)\
+            .offset(skip).limit(limit).all()
 
-def get_registered_events(db: Session, user_id: int):
-    return db.query(models.Event)\
-        .join(models.Registration, models.Event.id == models.Registration.event_id)\
-        .filter(models.Registration.user_id == user_id)\
+def get_registration_statuses(db: Session, event_id: int, limit: int) -> Optional[Dict[int, str]]:
+    """Статусы всех регистраций мероприятия по пользователю; None, если их больше limit"""
+    with registration_shards.session_for(db, event_id) as shard:
+        rows = shard.execute(
+            select(models.Registration.user_id, models.Registration.status)
+            .where(models.Registration.event_id == event_id)
+            .limit(limit + 1)
+        ).all()
+    if len(rows) > limit:
+        return None
+    return {row.user_id: row.status for row in rows}
+
+def count_waitlisted(db: Session, event_id: int) -> int:
+    with registration_shards.session_for(db, event_id) as shard:
+        return shard.scalar(
+            select(func.count())
+            .where(
+                models.Registration.event_id == event_id,
+                models.Registration.status == models.RegistrationStatus.WAITLISTED.value
+            )
+        )
+
+def _registered_event_ids(user_id: int) -> List[int]:
+    """Мероприятия с регистрацией пользователя: scatter-gather по всем шардам"""
+    def query(shard: Session) -> List[int]:
+        return list(shard.scalars(
+            select(models.Registration.event_id).where(models.Registration.user_id == user_id)
+        ))
+    return sorted({event_id for ids in registration_shards.scatter(None, query) for event_id in ids})
+
+def _registered_only(statement, user_id: int):
+    """Запрос по мероприятиям, ограниченный теми, на которые зарегистрирован пользователь"""
+    if not registration_shards.sharded:
+        return statement\
+            .join(models.Registration, models.Event.id == models.Registration.event_id)\
+            .where(models.Registration.user_id == user_id)
+    # Регистрации в других БД: JOIN заменяется списком id, собранным со всех шардов
+    return statement.where(models.Event.id.in_(_registered_event_ids(user_id)))
+
+def get_registered_events(db: Session, user_id: int, skip: int = 0, limit: int = 100):
+    return _registered_only(db.query(*EVENT_COLUMNS), user_id)\
         .order_by(desc(models.Event.start_date))\
-        .all()
\ No newline at end of file
+        .offset(skip).limit(limit).all()
+
+# Краткие списки мероприятий: только нужные колонки, без загрузки ORM-объектов
+SUMMARY_COLUMNS = [
+    models.Event.id,
+    models.Event.title,
+    models.Event.category,
+    models.Event.location,
+    models.Event.start_date,
+    models.Event.current_participants,
+    models.Event.max_participants,
+    models.Event.is_published,
+    models.Event.is_cancelled,
+]
+
+def _summary_page(db: Session, statement, page: int, size: int):
+    # Общее число строк приходит оконной функцией в том же запросе, что и страница
+    rows = db.execute(
+        statement.add_columns(func.count().over().label("total"))
+        .offset((page - 1) * size).limit(size)
+    ).all()
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        total = db.scalar(select(func.count()).select_from(statement.subquery()))
+    else:
+        total = 0
+    return {
+        "items": rows,
+        "total": total,
+        "page": page,
+        "size": size,
+        "pages": (total + size - 1) // size
+    }
+
+def get_organized_events_summary(db: Session, organizer_id: int, page: int = 1, size: int = 20):
+    statement = select(*SUMMARY_COLUMNS)\
+        .where(models.Event.organizer_id == organizer_id)\
+        .order_by(desc(models.Event.created_at), desc(models.Event.id))
+    return _summary_page(db, statement, page, size)
+
+def get_registered_events_summary(db: Session, user_id: int, page: int = 1, size: int = 20):
+    statement = _registered_only(select(*SUMMARY_COLUMNS), user_id)\
+        .order_by(desc(models.Event.start_date), desc(models.Event.id))
+    return _summary_page(db, statement, page, size)
+
+# Запросы для потоковой выгрузки: кортежи колонок без ORM-объектов
+PARTICIPANT_EXPORT_COLUMNS = ["user_id", "status", "registered_at"]
+EVENT_EXPORT_COLUMNS = [
+    "id", "title", "category", "location", "start_date", "end_date",
+    "max_participants", "current_participants", "is_published", "is_cancelled"
+]
+
+def participants_export_query(event_id: int):
+    return select(*(getattr(models.Registration, column) for column in PARTICIPANT_EXPORT_COLUMNS))\
+        .where(models.Registration.event_id == event_id)\
+        .order_by(models.Registration.id)
+
+def participants_export_session(event_id: int):
+    """Фабрика сессий для выгрузки участников: шард мероприятия или реплика"""
+    return registration_shards.sessionmaker_for(event_id, read_session)
+
+def organized_events_export_query(organizer_id: int):
+    return select(*(getattr(models.Event, column) for column in EVENT_EXPORT_COLUMNS))\
+        .where(models.Event.organizer_id == organizer_id)\
+        .order_by(desc(models.Event.created_at))
+
+def registered_events_export_query(user_id: int):
+    return _registered_only(select(*(getattr(models.Event, column) for column in EVENT_EXPORT_COLUMNS)), user_id)\
+        .order_by(desc(models.Event.start_date))
@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
 import requests
 import os
-from .database import SessionLocal
+from .database import SessionLocal, read_session
+from .read_routing import wants_primary
+from .logging_config import outgoing_headers
 
 security = HTTPBearer()
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8000")
@@ -14,6 +17,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db(request: Request):
+    """Сессия для обработчиков только на чтение: реплика, кроме чтения после своей записи"""
+    db = SessionLocal() if wants_primary(request.scope) else read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Верификация JWT токена через auth-service"""
     token = credentials.credentials
@@ -22,7 +33,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         # Отправляем запрос в auth-service для верификации токена
         response = requests.get(
             f"{AUTH_SERVICE_URL}/users/me",
-            headers={"Authorization": f"Bearer {token}"},
+            headers=outgoing_headers({"Authorization": f"Bearer {token}"}),
             timeout=5
         )
         
@@ -43,4 +54,11 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Authentication service unavailable"
-        )
\ No newline at end of file
+        )
+optional_security = HTTPBearer(auto_error=False)
+
+def optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[dict]:
+    """Текущий пользователь для публичных эндпоинтов: без токена — None, с неверным токеном — 401"""
+    if credentials is None:
+        return None
+    return verify_token(credentials)
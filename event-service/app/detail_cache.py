@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
+import os
+import threading
+import time
+
+T = TypeVar("T")
+
+# Сколько секунд карточка мероприятия отдаётся из памяти процесса. Инвалидация
+# видна только в процессе, выполнившем запись: другие воркеры gunicorn отдают
+# прежнюю карточку не дольше этого срока (кроме запросов с X-Consistency: strong)
+DETAIL_CACHE_TTL = float(os.getenv("DETAIL_CACHE_TTL", 10))
+DETAIL_CACHE_MAX_EVENTS = int(os.getenv("DETAIL_CACHE_MAX_EVENTS", 1000))
+
+
+class _Load:
+    """Идущая загрузка ключа: её ждут одновременные промахи.
+
+    invalidated растёт при инвалидации ключа во время загрузки.
+    """
+    __slots__ = ("lock", "waiters", "invalidated")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiters = 0
+        self.invalidated = 0
+
+
+class VersionedCache(Generic[T]):
+    """TTL-кэш по ключу с версиями для инвалидации.
+
+    Загрузка, начавшаяся до инвалидации ключа, в кэш не попадает: иначе
+    прочитанные до записи данные жили бы ещё TTL секунд. Одновременные
+    промахи по одному ключу ждут одну загрузку, а не идут в БД каждый.
+    Состояние хранится только для ключей в кэше и идущих загрузок: промахи
+    по несуществующим ключам и запись без чтения память не занимают.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, T]]" = OrderedDict()
+        self._loading: Dict[int, _Load] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key: int) -> Optional[T]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get(self, key: int, load: Callable[[int], Tuple[Optional[T], bool]], refresh: bool = False) -> Optional[T]:
+        """Значение из кэша или load(key) -> (значение, можно ли его кэшировать).
+
+        refresh=True пропускает кэш, но свежее значение в нём сохраняется.
+        """
+        if self.ttl <= 0:
+            return load(key)[0]
+        with self._lock:
+            value = None if refresh else self._fresh(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = _Load()
+            pending.waiters += 1
+
+        try:
+            with pending.lock:
+                with self._lock:
+                    # Пока ждали, значение мог загрузить другой поток
+                    value = None if refresh else self._fresh(key)
+                    if value is not None:
+                        self.hits += 1
+                        return value
+                    self.misses += 1
+                    version = pending.invalidated
+                value, cacheable = load(key)
+                with self._lock:
+                    if value is not None and cacheable and pending.invalidated == version:
+                        self._entries[key] = (time.monotonic() + self.ttl, value)
+                        self._entries.move_to_end(key)
+                        self._evict()
+                return value
+        finally:
+            with self._lock:
+                pending.waiters -= 1
+                if not pending.waiters:
+                    del self._loading[key]
+
+    def invalidate(self, key: int):
+        with self._lock:
+            self._entries.pop(key, None)
+            pending = self._loading.get(key)
+            if pending is not None:
+                pending.invalidated += 1
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Карточки мероприятий для GET /events/{id}/detail
+event_details: VersionedCache = VersionedCache(DETAIL_CACHE_TTL, DETAIL_CACHE_MAX_EVENTS)
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import logging
+import os
+
+from sqlalchemy import JSON, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from . import models, notifications
+from .database import SessionLocal, dialect_insert, engine, registration_shards
+
+logger = logging.getLogger(__name__)
+
+# Правки в течение этого окна сливаются в одно уведомление на участника
+EVENT_UPDATE_DEBOUNCE_SECONDS = int(os.getenv("EVENT_UPDATE_DEBOUNCE_SECONDS", 60))
+# Как часто проверяются накопленные изменения
+EVENT_CHANGES_POLL_INTERVAL = float(os.getenv("EVENT_CHANGES_POLL_INTERVAL", 5))
+
+# Поля, изменение которых участники должны увидеть
+VISIBLE_FIELDS = {
+    "title": "название",
+    "start_date": "дата начала",
+    "location": "место",
+}
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _display(value) -> str:
+    if value is None:
+        return "не указано"
+    if isinstance(value, datetime):
+        return value.strftime("%d.%m.%Y %H:%M")
+    return str(value)
+
+
+def diff(db_event: models.Event, update_data: dict) -> Dict[str, object]:
+    """Исходные значения видимых полей, которые меняет обновление"""
+    return {
+        field: _jsonable(getattr(db_event, field))
+        for field in VISIBLE_FIELDS
+        if field in update_data and getattr(db_event, field) != update_data[field]
+    }
+
+
+def _merge_changes(new, pending):
+    """Слияние JSON-объектов в SQL: при совпадении ключей остаётся значение из pending"""
+    if engine.dialect.name == "postgresql":
+        return cast(cast(new, JSONB).op("||")(cast(pending, JSONB)), JSON)
+    return func.json_patch(new, pending)
+
+
+def record(db: Session, event_id: int, changes: Dict[str, object]):
+    """Запись изменений в outbox в транзакции обновления мероприятия; коммит делает вызывающий.
+
+    Одним INSERT ... ON CONFLICT: две одновременные первые правки мероприятия
+    не вставляют строку дважды, а сливаются.
+    """
+    due_at = datetime.now(timezone.utc) + timedelta(seconds=EVENT_UPDATE_DEBOUNCE_SECONDS)
+    table = models.EventChangeOutbox.__table__
+    statement = dialect_insert(table).values(event_id=event_id, changes=changes, due_at=due_at)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["event_id"],
+        # Сохраняется самое раннее исходное значение поля, окно откладывается до последней правки
+        set_={
+            "changes": _merge_changes(statement.excluded.changes, table.c.changes),
+            "due_at": statement.excluded.due_at,
+        }
+    ))
+
+
+def _message(db_event: models.Event, changes: Dict[str, object]) -> Optional[str]:
+    changed = []
+    for field in VISIBLE_FIELDS:
+        if field not in changes:
+            continue
+        original = changes[field]
+        current = getattr(db_event, field)
+        # Поле вернули к исходному значению за время окна, сообщать не о чем
+        if _jsonable(current) == original:
+            continue
+        changed.append(f"{VISIBLE_FIELDS[field]}: {_display(current)}")
+    if not changed:
+        return None
+    return f"Мероприятие '{db_event.title}' изменено. " + "; ".join(changed)
+
+
+def _fan_out(db: Session, event_id: int, changes: Dict[str, object]):
+    db_event = db.get(models.Event, event_id)
+    if db_event is None or db_event.is_cancelled:
+        return
+    message = _message(db_event, changes)
+    if message is None:
+        return
+
+    # Участники читаются из шарда мероприятия серверным курсором пачками, без загрузки всего списка в память
+    with registration_shards.session_for(db, event_id) as shard:
+        result = shard.execute(
+            select(models.Registration.user_id)
+            .where(models.Registration.event_id == event_id)
+            .execution_options(yield_per=notifications.NOTIFICATION_CHUNK_SIZE)
+        )
+        for partition in result.scalars().partitions():
+            notifications.send_bulk_notifications(list(partition), event_id, "event_updated", message)
+
+
+def dispatch_due():
+    """Рассылка event_updated по мероприятиям, у которых закончилось окно накопления правок"""
+    db = SessionLocal()
+    try:
+        # Строки забираются атомарным DELETE ... RETURNING, поэтому реплики сервиса не дублируют рассылку
+        due = db.execute(
+            delete(models.EventChangeOutbox)
+            .where(models.EventChangeOutbox.due_at <= datetime.now(timezone.utc))
+            .returning(models.EventChangeOutbox.event_id, models.EventChangeOutbox.changes)
+        ).all()
+        db.commit()
+        for event_id, changes in due:
+            try:
+                _fan_out(db, event_id, changes)
+            except Exception as e:
+                logger.error("Ошибка рассылки изменений мероприятия %s: %s", event_id, e)
+            finally:
+                db.rollback()
+        if due:
+            logger.info("Разосланы изменения мероприятий: %s", len(due))
+    finally:
+        db.close()
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import os
+
+from . import crud, models, schemas, users
+from .database import SessionLocal
+from .detail_cache import event_details
+from .http_cache import make_etag
+
+# Участников на первой странице карточки
+DETAIL_PARTICIPANTS = int(os.getenv("DETAIL_PARTICIPANTS", 20))
+# Пока регистраций не больше этого числа, статусы всех пользователей хранятся в карточке
+# и статус текущего пользователя не требует запроса; для больших мероприятий — отдельный запрос
+DETAIL_MEMBERSHIP_LIMIT = int(os.getenv("DETAIL_MEMBERSHIP_LIMIT", 5000))
+
+
+@dataclass
+class CachedDetail:
+    event: schemas.Event
+    participants: List[schemas.DetailParticipant]
+    waitlist_count: int
+    statuses: Optional[Dict[int, str]]
+    # Имена участников загружены (карточку загрузил запрос с токеном пользователя)
+    named: bool
+    # Хеш содержимого для ETag: одинаков у одинаковых карточек в разных загрузках и воркерах
+    version: str
+
+
+def _load(event_id: int, authorization: Optional[str]) -> Tuple[Optional[CachedDetail], bool]:
+    """Загрузка карточки из основной БД: реплика могла бы вернуть данные до инвалидации.
+
+    Имена участников auth-service отдаёт только по токену пользователя, поэтому
+    анонимный запрос загружает карточку без них.
+    """
+    db = SessionLocal()
+    try:
+        db_event = crud.get_event(db, event_id=event_id)
+        if db_event is None:
+            return None, False
+        registrations = crud.get_event_participants(db, event_id, 0, DETAIL_PARTICIPANTS)
+        statuses = crud.get_registration_statuses(db, event_id, DETAIL_MEMBERSHIP_LIMIT)
+        if statuses is not None:
+            waitlist_count = sum(1 for status in statuses.values() if status == models.RegistrationStatus.WAITLISTED.value)
+        else:
+            waitlist_count = crud.count_waitlisted(db, event_id)
+    finally:
+        db.close()
+
+    # Имена участников одним запросом к auth-service; без него карточка отдаётся, но не кэшируется
+    profiles = None
+    if authorization is not None:
+        profiles = users.get_profiles([registration.user_id for registration in registrations], authorization)
+    participants = []
+    for registration in registrations:
+        profile = (profiles or {}).get(registration.user_id, {})
+        participants.append(schemas.DetailParticipant(
+            user_id=registration.user_id,
+            username=profile.get("username"),
+            full_name=profile.get("full_name"),
+            registered_at=registration.registered_at
+        ))
+    event = schemas.Event.model_validate(db_event)
+    # Карточка сериализуется для хеша один раз на загрузку, а не на каждый запрос
+    content = [event.model_dump_json(), waitlist_count] + [participant.model_dump_json() for participant in participants]
+    detail = CachedDetail(
+        event=event,
+        participants=participants,
+        waitlist_count=waitlist_count,
+        statuses=statuses,
+        named=profiles is not None,
+        version=hashlib.sha1(repr(content).encode()).hexdigest()
+    )
+    return detail, authorization is None or profiles is not None
+
+
+def status_of(event_id: int, detail: CachedDetail, user: Optional[dict]) -> Optional[str]:
+    """Статус регистрации пользователя: из карточки или, для больших мероприятий, отдельным запросом"""
+    if not user:
+        return None
+    user_id = user["user_id"]
+    if detail.statuses is not None:
+        return detail.statuses.get(user_id)
+    db = SessionLocal()
+    try:
+        registration = crud.get_registration(db, event_id, user_id)
+        return registration.status if registration else None
+    finally:
+        db.close()
+
+
+def _anonymous(participant: schemas.DetailParticipant) -> schemas.DetailParticipant:
+    return participant.model_copy(update={"username": None, "full_name": None})
+
+
+def get_card(
+    event_id: int,
+    user: Optional[dict],
+    authorization: Optional[str] = None,
+    refresh: bool = False
+) -> Optional[CachedDetail]:
+    """Карточка мероприятия из кэша процесса (для пользователя — с именами участников); None, если мероприятия нет"""
+    load = partial(_load, authorization=authorization if user else None)
+    detail = event_details.get(event_id, load, refresh=refresh)
+    if detail is None:
+        return None
+    if user and not detail.named:
+        # В кэше карточка без имён, загруженная анонимным запросом: перечитывается с токеном
+        detail = event_details.get(event_id, load, refresh=True)
+    return detail
+
+
+def etag(detail: CachedDetail, user: Optional[dict], status: Optional[str]) -> str:
+    """Валидатор ответа: версия карточки, получатель и его статус; считается без сборки ответа"""
+    return make_etag(detail.version, user["user_id"] if user else None, status)
+
+
+def render(detail: CachedDetail, user: Optional[dict], status: Optional[str]) -> schemas.EventDetail:
+    """Ответ для пользователя или анонима (без имён участников)"""
+    participants = detail.participants if user else [_anonymous(participant) for participant in detail.participants]
+    return schemas.EventDetail(
+        event=detail.event,
+        participant_count=detail.event.current_participants or 0,
+        waitlist_count=detail.waitlist_count,
+        participants=participants,
+        registration_status=status,
+        is_registered=status == models.RegistrationStatus.CONFIRMED.value
+    )
@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List
+import csv
+import enum
+import io
+import json
+import logging
+import os
+import zlib
+
+from fastapi.responses import StreamingResponse
+
+from .database import read_session
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк читается из серверного курсора за раз
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(columns: List[str], rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_plain(value) for value in row])
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(columns: List[str], rows) -> bytes:
+    return "".join(
+        json.dumps({column: _plain(value) for column, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+
+def stream_rows(statement, columns: List[str], fmt: str, session_factory: Callable = read_session) -> Iterator[bytes]:
+    """Построчная выгрузка запроса: в памяти одновременно не больше одной пачки строк"""
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    if fmt == "csv":
+        yield _encode_csv(columns, [columns])
+
+    # Своя сессия (реплика или шард): генератор дочитывается уже после выхода из обработчика
+    db = session_factory()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield encode(columns, partition)
+    finally:
+        db.close()
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(
+    statement,
+    columns: List[str],
+    fmt: str,
+    filename: str,
+    gzip: bool = False,
+    session_factory: Callable = read_session
+) -> StreamingResponse:
+    """StreamingResponse с выгрузкой в CSV или NDJSON, при gzip сжимается на лету"""
+    body = stream_rows(statement, columns, fmt, session_factory)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    if gzip:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import logging
+import os
+
+from sqlalchemy import DateTime, Float, bindparam, case, cast, delete, desc, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal, dialect_insert, registration_shards
+
+logger = logging.getLogger(__name__)
+
+# Окно, в котором считается скорость регистраций
+FEED_VELOCITY_HOURS = int(os.getenv("FEED_VELOCITY_HOURS", 24))
+# Вес заполненности в рейтинге: полностью заполненное мероприятие равно стольким регистрациям за окно
+FEED_FILL_WEIGHT = float(os.getenv("FEED_FILL_WEIGHT", 10))
+FEED_REFRESH_INTERVAL = float(os.getenv("FEED_REFRESH_INTERVAL", 60))
+
+FEED_COLUMNS = [
+    "id", "title", "category", "location", "start_date", "current_participants",
+    "max_participants", "fill_ratio", "registrations_recent", "score", "refreshed_at"
+]
+
+# Поля мероприятия, от которых зависит строка ленты
+FEED_FIELDS = {"title", "category", "location", "start_date", "max_participants", "is_published"}
+
+# Поля, которые полная пересборка переписывает в существующей строке. Участников
+# и заполненность ведут регистрации (on_participants_changed) в своих транзакциях:
+# пересборка со снимком до их коммита не должна их затирать
+REBUILT_FIELDS = ["title", "category", "location", "start_date", "max_participants", "registrations_recent", "refreshed_at"]
+
+
+def _fill_ratio(participants, max_participants):
+    return case(
+        (max_participants > 0, cast(participants, Float) / max_participants),
+        else_=0.0
+    )
+
+
+def _recent(now: datetime, event_id: Optional[int] = None):
+    """Число регистраций за окно по мероприятиям"""
+    since = now - timedelta(hours=FEED_VELOCITY_HOURS)
+    recent = select(
+        models.Registration.event_id,
+        func.count().label("registrations")
+    ).where(models.Registration.registered_at >= since)
+    if event_id is not None:
+        recent = recent.where(models.Registration.event_id == event_id)
+    return recent.group_by(models.Registration.event_id)
+
+
+def _listed(now: datetime):
+    """Условия попадания мероприятия в ленту"""
+    return (
+        models.Event.is_published == True,
+        models.Event.is_cancelled == False,
+        models.Event.start_date >= now
+    )
+
+
+def _source(now: datetime, event_id: Optional[int] = None):
+    """Строки ленты, вычисленные из events и registrations"""
+    # Регистрации в шардах не соединить с events: скорость дописывается отдельно (_apply_recent)
+    recent = None if registration_shards.sharded else _recent(now, event_id).subquery()
+
+    registrations = func.coalesce(recent.c.registrations, 0) if recent is not None else literal(0)
+    fill_ratio = _fill_ratio(func.coalesce(models.Event.current_participants, 0), models.Event.max_participants)
+    statement = select(
+        models.Event.id,
+        models.Event.title,
+        models.Event.category,
+        models.Event.location,
+        models.Event.start_date,
+        func.coalesce(models.Event.current_participants, 0),
+        models.Event.max_participants,
+        fill_ratio,
+        registrations,
+        registrations + FEED_FILL_WEIGHT * fill_ratio,
+        literal(now, DateTime(timezone=True))
+    )
+    if recent is not None:
+        statement = statement.outerjoin(recent, recent.c.event_id == models.Event.id)
+    statement = statement.where(*_listed(now))
+    if event_id is not None:
+        statement = statement.where(models.Event.id == event_id)
+    return statement
+
+
+def _apply_recent(db: Session, now: datetime, event_id: Optional[int] = None):
+    """Скорость регистраций из шардов: scatter-gather и пачка UPDATE в транзакции вызывающего"""
+    if not registration_shards.sharded:
+        return
+    statement = _recent(now, event_id)
+    if event_id is not None:
+        with registration_shards.session_for(db, event_id) as shard:
+            counts = shard.execute(statement).all()
+    else:
+        counts = [row for rows in registration_shards.scatter(db, lambda shard: shard.execute(statement).all()) for row in rows]
+    if not counts:
+        return
+    # UPDATE по таблице, а не по модели: executemany без ORM-режима bulk update
+    table = models.EventFeed.__table__
+    registrations = bindparam("registrations")
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("feed_id"))
+        .values(
+            registrations_recent=registrations,
+            score=registrations + FEED_FILL_WEIGHT * table.c.fill_ratio
+        ),
+        [{"feed_id": row.event_id, "registrations": row.registrations} for row in counts]
+    )
+
+
+def refresh_event(db: Session, event_id: int):
+    """Пересчёт строки одного мероприятия в транзакции вызывающего, изменившей само мероприятие"""
+    now = datetime.now(timezone.utc)
+    # Строка мероприятия заблокирована вызывающим: регистрации ждут коммита, строку можно переписать целиком
+    statement = dialect_insert(models.EventFeed).from_select(FEED_COLUMNS, _source(now, event_id))
+    rows = db.execute(statement.on_conflict_do_update(
+        index_elements=["id"],
+        set_={column: statement.excluded[column] for column in FEED_COLUMNS if column != "id"}
+    )).rowcount
+    if not rows:
+        remove_event(db, event_id)
+    _apply_recent(db, now, event_id)
+
+
+def add_event(db: Session, event_id: int):
+    """Строка ленты для только что созданного мероприятия"""
+    db.execute(insert(models.EventFeed).from_select(FEED_COLUMNS, _source(datetime.now(timezone.utc), event_id)))
+
+
+def remove_event(db: Session, event_id: int):
+    db.execute(delete(models.EventFeed).where(models.EventFeed.id == event_id))
+
+
+def on_participants_changed(db: Session, event_id: int, participants: int):
+    """Новое число участников после регистрации, отмены или перевода из очереди.
+
+    Скорость регистраций здесь не меняется: отмена не знает, попадала ли
+    регистрация в окно, — её пересчитывает только пересборка (refresh).
+    """
+    fill_ratio = _fill_ratio(participants, models.EventFeed.max_participants)
+    db.execute(
+        update(models.EventFeed)
+        .where(models.EventFeed.id == event_id)
+        .values(
+            current_participants=participants,
+            fill_ratio=fill_ratio,
+            score=models.EventFeed.registrations_recent + FEED_FILL_WEIGHT * fill_ratio
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh():
+    """Полная пересборка ленты: прошедшие мероприятия выпадают, скорость регистраций пересчитывается"""
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc)
+        # Upsert вместо удаления и вставки: изменения участников, закоммиченные во время
+        # пересборки, не теряются (REBUILT_FIELDS); удаляются только выпавшие мероприятия
+        db.execute(
+            delete(models.EventFeed)
+            .where(models.EventFeed.id.not_in(select(models.Event.id).where(*_listed(now))))
+            .execution_options(synchronize_session=False)
+        )
+        statement = dialect_insert(models.EventFeed).from_select(FEED_COLUMNS, _source(now))
+        set_ = {column: statement.excluded[column] for column in REBUILT_FIELDS}
+        set_["score"] = statement.excluded.registrations_recent + FEED_FILL_WEIGHT * models.EventFeed.fill_ratio
+        rows = db.execute(statement.on_conflict_do_update(index_elements=["id"], set_=set_)).rowcount
+        _apply_recent(db, now)
+        db.commit()
+        logger.info("Лента мероприятий обновлена: %s строк", rows)
+    finally:
+        db.close()
+
+
+def get_feed(db: Session, category: Optional[str] = None, skip: int = 0, limit: int = 20):
+    """Ближайшие мероприятия: индекс (category, start_date)"""
+    query = db.query(*(getattr(models.EventFeed, column) for column in FEED_COLUMNS))\
+        .filter(models.EventFeed.start_date >= datetime.now(timezone.utc))
+    if category:
+        query = query.filter(models.EventFeed.category == category)
+    return query.order_by(models.EventFeed.start_date).offset(skip).limit(limit).all()
+
+
+def get_trending(db: Session, category: Optional[str] = None, limit: int = 20):
+    """Популярные мероприятия: индекс (category, score)"""
+    query = db.query(*(getattr(models.EventFeed, column) for column in FEED_COLUMNS))\
+        .filter(models.EventFeed.start_date >= datetime.now(timezone.utc))
+    if category:
+        query = query.filter(models.EventFeed.category == category)
+    return query.order_by(desc(models.EventFeed.score)).limit(limit).all()
@@ -0,0 +1,200 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+import hashlib
+import os
+import zlib
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него ответы сжимаются только gzip
+    brotli = None
+
+# Ответы меньше порога не сжимаются: выигрыш меньше накладных расходов
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress = self._impl.process
+            self.finish = self._impl.finish
+        else:
+            self._impl = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._impl.compress
+            self.finish = self._impl.flush
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: сжатие ответов gzip или brotli по Accept-Encoding.
+
+    Ответы с уже заданным Content-Encoding (например, сжатые выгрузки),
+    несжимаемые типы и тела меньше порога проходят без изменений.
+    Потоковые ответы сжимаются по частям.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = start_message.get("headers", [])
+                names = {name.lower(): value for name, value in headers}
+                content_type = names.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in names
+                    or start_message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                )
+                if not passthrough:
+                    compressor = _Compressor(encoding)
+                    headers = [(name, value) for name, value in headers if name.lower() != b"content-length"]
+                    headers.append((b"content-encoding", encoding.encode()))
+                    headers.append((b"vary", b"Accept-Encoding"))
+                    if not more_body:
+                        body = compressor.compress(body) + compressor.finish()
+                        headers.append((b"content-length", str(len(body)).encode()))
+                        compressor = None
+                    start_message["headers"] = headers
+                await send(start_message)
+                start_message = None
+                if passthrough or compressor is None:
+                    await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                    return
+
+            if passthrough or compressor is None:
+                await send(message)
+                return
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из значений-валидаторов (счётчики, max(id), время изменения)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def page_response(request: Request, response: Response) -> Response:
+    """Готовый ответ-список со слабым ETag по его телу; 304, если у клиента та же страница.
+
+    Валидатор выводится из уже выбранной страницы, поэтому условный запрос
+    выполняет тот же запрос к БД и сериализацию и экономит только передачу тела.
+    Проверить страницу до запроса нечем: версии, общей для всех воркеров и
+    меняющейся при любом изменении под фильтром, нет, а агрегат по фильтру
+    (count, max(updated_at)) дороже самой страницы с LIMIT по индексу.
+    Где такая версия есть, валидатор проверяется до чтения (карточка
+    мероприятия — версия в кэше процесса, /events/{id} — updated_at).
+    """
+    etag = f'W/"{hashlib.sha1(response.body).hexdigest()[:20]}"'
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return set_validators(response, etag)
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Проверка If-None-Match (приоритетно) и If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Слабое сравнение: префикс W/ не учитывается
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    # Кэш хранит ответ, но перед использованием перепроверяет его условным запросом
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return set_validators(Response(status_code=304), etag, last_modified)
@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+from sqlalchemy import delete, select, update
+
+from . import models
+from .database import engine, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранится ответ на ключ идемпотентности
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 600))
+# Незавершённый запрос с этим ключом считается брошенным после этого времени
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+table = models.IdempotencyKey.__table__
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def scope_key(key: str, method: str, path: str, authorization: str) -> str:
+    """Ключ действует в пределах пользователя (заголовок Authorization) и эндпоинта"""
+    return hashlib.sha256("\n".join((key, method, path, authorization)).encode()).hexdigest()
+
+
+def _lookup(key_hash: str):
+    with engine.connect() as conn:
+        return conn.execute(select(table).where(table.c.key_hash == key_hash)).first()
+
+
+def _claim(key_hash: str, request_hash: str, existing: bool) -> bool:
+    """Запись ключа как незавершённого; False, если ключ уже занят"""
+    now = _now()
+    with engine.begin() as conn:
+        # Просроченная запись (TTL или брошенный запрос) освобождает ключ
+        if existing:
+            conn.execute(
+                delete(table).where(
+                    table.c.key_hash == key_hash,
+                    ((table.c.status == COMPLETED) & (table.c.expires_at < now))
+                    | ((table.c.status == IN_PROGRESS) & (table.c.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)))
+                )
+            )
+        result = conn.execute(
+            dialect_insert(table).values(
+                key_hash=key_hash,
+                request_hash=request_hash,
+                status=IN_PROGRESS,
+                created_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            ).on_conflict_do_nothing(index_elements=["key_hash"])
+        )
+        return result.rowcount == 1
+
+
+def _complete(key_hash: str, status_code: int, content_type: Optional[str], body: bytes):
+    with engine.begin() as conn:
+        conn.execute(
+            update(table)
+            .where(table.c.key_hash == key_hash)
+            .values(status=COMPLETED, status_code=status_code, content_type=content_type, body=body)
+        )
+
+
+def _release(key_hash: str):
+    with engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.key_hash == key_hash))
+
+
+def purge_expired() -> int:
+    """Удаление просроченных ключей"""
+    with engine.begin() as conn:
+        deleted = conn.execute(delete(table).where(table.c.expires_at < _now())).rowcount
+    if deleted:
+        logger.info("Удалено просроченных ключей идемпотентности: %s", deleted)
+    return deleted
+
+
+async def _send_json(send, status_code: int, payload: dict, headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI-middleware: POST с заголовком Idempotency-Key выполняется один раз.
+
+    Первый ответ (кроме 5xx) сохраняется и отдаётся повторно на ретраи с тем же
+    ключом одним SELECT по первичному ключу. Пока первый запрос выполняется,
+    повтор получает 409; тот же ключ с другим телом запроса получает 422.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": "Invalid Idempotency-Key"})
+            return
+
+        # Тело читается целиком: по нему отличается повтор от другого запроса с тем же ключом
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        request_hash = hashlib.sha256(body).hexdigest()
+        key_hash = scope_key(
+            key,
+            scope["method"],
+            scope["path"],
+            headers.get(b"authorization", b"").decode("latin-1")
+        )
+
+        stored = await asyncio.to_thread(_lookup, key_hash)
+        if stored is not None and stored.status == COMPLETED and _aware(stored.expires_at) >= _now():
+            await self._replay(send, stored, request_hash)
+            return
+
+        if not await asyncio.to_thread(_claim, key_hash, request_hash, stored is not None):
+            stored = await asyncio.to_thread(_lookup, key_hash)
+            if stored is not None and stored.status == COMPLETED:
+                await self._replay(send, stored, request_hash)
+            else:
+                await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is in progress"},
+                                 [(b"retry-after", b"1")])
+            return
+
+        await self._execute(scope, body, receive, send, key_hash)
+
+    async def _replay(self, send, stored, request_hash: str):
+        if stored.request_hash != request_hash:
+            await _send_json(send, 422, {"detail": "Idempotency-Key was used with a different request"})
+            return
+        response_headers = [
+            (b"content-length", str(len(stored.body or b"")).encode()),
+            (b"idempotent-replayed", b"true"),
+        ]
+        if stored.content_type:
+            response_headers.append((b"content-type", stored.content_type.encode("latin-1")))
+        await send({"type": "http.response.start", "status": stored.status_code, "headers": response_headers})
+        await send({"type": "http.response.body", "body": stored.body or b""})
+
+    async def _execute(self, scope, body: bytes, receive, send, key_hash: str):
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Тело уже отдано приложению, дальше только события соединения
+            return await receive()
+
+        status_code = 500
+        content_type = None
+        response_body = []
+        finished = False
+
+        async def finish():
+            nonlocal finished
+            finished = True
+            # Ошибки сервера не запоминаются: повтор с тем же ключом выполнится заново
+            if status_code >= 500:
+                await asyncio.to_thread(_release, key_hash)
+            else:
+                await asyncio.to_thread(_complete, key_hash, status_code, content_type, b"".join(response_body))
+
+        async def send_wrapper(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        content_type = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+            # Ответ сохраняется сразу после отправки, не дожидаясь фоновых задач обработчика
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                await finish()
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            if not finished:
+                await finish()
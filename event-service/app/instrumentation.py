@@ -0,0 +1,162 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import logging
+import os
+import time
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# В режиме отладки итоги по SQL отдаются в заголовках ответа
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+# Сколько одинаковых запросов за один HTTP-запрос считается признаком N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 2))
+
+
+class QueryStats:
+    """SQL-статистика одного HTTP-запроса"""
+
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        stats.statements[statement] += 1
+
+
+def install(engine):
+    """Подключение счётчика запросов к движку SQLAlchemy"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RouteMetrics:
+    __slots__ = ("requests", "queries", "db_seconds", "n_plus_one")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.n_plus_one = 0
+
+
+metrics: Dict[str, RouteMetrics] = {}
+
+
+def _route_name(scope) -> str:
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", None) or "unmatched"
+
+
+class QueryCountMiddleware:
+    """ASGI-middleware: считает SQL-запросы и время БД на каждый HTTP-запрос"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if DEBUG and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.duration * 1000:.2f}".encode()))
+                headers.append((b"x-db-repeated-queries", str(len(stats.repeated())).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._record(scope, stats)
+
+    def _record(self, scope, stats: QueryStats):
+        route = _route_name(scope)
+        route_metrics = metrics.get(route)
+        if route_metrics is None:
+            route_metrics = metrics[route] = RouteMetrics()
+        route_metrics.requests += 1
+        route_metrics.queries += stats.count
+        route_metrics.db_seconds += stats.duration
+
+        repeated = stats.repeated()
+        if repeated:
+            route_metrics.n_plus_one += 1
+            for sql, count in repeated.items():
+                logger.warning("Возможный N+1 в %s: запрос выполнен %s раз: %s", route, count, sql)
+
+
+def render_metrics() -> str:
+    """Метрики в текстовом формате Prometheus"""
+    lines = []
+    for name, kind, help_text, attr in (
+        ("http_requests_total", "counter", "HTTP-запросы по обработчикам", "requests"),
+        ("db_queries_total", "counter", "SQL-запросы по обработчикам", "queries"),
+        ("db_query_seconds_total", "counter", "Время выполнения SQL по обработчикам", "db_seconds"),
+        ("db_n_plus_one_total", "counter", "HTTP-запросы с повторяющимися SQL-запросами", "n_plus_one"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for route, route_metrics in sorted(metrics.items()):
+            lines.append(f'{name}{{handler="{route}"}} {getattr(route_metrics, attr)}')
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, engine=None):
+    """Помощник для тестов: блок кода выполняет не больше max_queries SQL-запросов.
+
+        with assert_query_budget(2):
+            client.post(f"/events/{event_id}/register", headers=headers)
+    """
+    if engine is None:
+        from .database import engine
+
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    if len(statements) > max_queries:
+        raise AssertionError(
+            f"Выполнено {len(statements)} SQL-запросов при бюджете {max_queries}:\n"
+            + "\n".join(statements)
+        )
@@ -0,0 +1,208 @@
+"""Логирование сервиса: JSON-строки в stdout через очередь и фоновый поток записи.
+
+На пути запроса обработчик только дополняет запись request_id и кладёт её
+в очередь без ожидания. Сообщение (logger.info("... %s", value)) форматируется,
+сериализуется и пишется в поток QueueListener. При переполненной очереди
+запись отбрасывается и учитывается в счётчике, запрос не блокируется.
+
+INFO-записи частых обработчиков выборочно пропускаются (LOG_SAMPLE_RATES)
+ещё до постановки в очередь; WARNING и выше пишутся всегда.
+"""
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").upper()
+# json — по строке JSON на запись; text — для чтения глазами при локальной отладке
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+REQUEST_ID_HEADER = "x-request-id"
+# Принимается только безопасный идентификатор от клиента, иначе генерируется свой
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def outgoing_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Заголовки запроса к другому сервису с request_id текущего запроса"""
+    headers = dict(headers or {})
+    request_id = _request_id.get()
+    if request_id is not None:
+        headers["X-Request-ID"] = request_id
+    return headers
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    """Разбор "read_events=0.01,create_notification=0.1" в {имя обработчика: доля}"""
+    rates = {}
+    for item in (value or "").split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class RequestIdMiddleware:
+    """ASGI-middleware: request_id из X-Request-ID (или новый) в контексте логов и в ответе"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Сервис и request_id в записи; выполняется в потоке запроса, где виден контекст"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.service = self.service
+        record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Доля INFO/DEBUG-записей по имени функции-обработчика, из которой они сделаны"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rates.get(record.funcName)
+        if rate is None or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler без форматирования в потоке запроса и без ожидания места в очереди"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение и исключение форматирует поток записи; аргументы логов — неизменяемые значения
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": getattr(record, "service", None),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+handler: Optional[NonBlockingQueueHandler] = None
+sampling: Optional[SamplingFilter] = None
+
+
+def setup(service: str, sample_rates: Optional[Dict[str, float]] = None):
+    """Настройка корневого логгера процесса; LOG_SAMPLE_RATES дополняет sample_rates сервиса"""
+    global _listener, handler, sampling
+    if _listener is not None:
+        return
+
+    log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    sampling = SamplingFilter({**(sample_rates or {}), **parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))})
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter(service))
+    handler.addFilter(sampling)
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    _listener = QueueListener(log_queue, stream)
+    _listener.start()
+    # При выходе процесса очередь дописывается до конца
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # Логи uvicorn идут через ту же очередь; журнал доступа — только если он включён
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+
+def render_metrics() -> str:
+    """Отброшенные при переполнении очереди и пропущенные выборкой записи (формат Prometheus)"""
+    lines = []
+    for name, help_text, value in (
+        ("log_records_dropped_total", "Записи лога, отброшенные при переполнении очереди", handler.dropped if handler else 0),
+        ("log_records_sampled_out_total", "INFO-записи, пропущенные выборкой", sampling.sampled_out if sampling else 0),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,40 +1,145 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query
+from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-import requests
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 from typing import Optional, List
 
-from . import models, schemas, crud, database
-from .dependencies import get_db, verify_token
+from . import models, schemas, crud, database, instrumentation, notifications, cancellation, event_changes, exports, http_cache, feed, stats, idempotency, rate_limit, lifecycle, migrate, read_routing, event_detail, reminders, logging_config, profiling
+from .fastjson import rows_response
+from .background import PeriodicTask, exclusive
+from .dependencies import get_db, get_read_db, verify_token, optional_user
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования: JSON через очередь и фоновый поток записи
+# Строка с фильтрами read_events пишется на каждый просмотр списка: в лог попадает 1%
+logging_config.setup("event-service", sample_rates={"read_events": 0.01})
 logger = logging.getLogger(__name__)
 
+# Старт: ожидание БД без блокировки event loop; схема — только с MIGRATE_ON_STARTUP
+# (запуск одним процессом), иначе её создаёт отдельный шаг python -m app.migrate
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await lifecycle.wait_for_db(database.engine)
+    if database.registration_shards.sharded:
+        for shard_engine in database.registration_shards.engines:
+            await lifecycle.wait_for_db(shard_engine)
+    if lifecycle.MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate.migrate)
+    event_changes_task.start()
+    feed_task.start()
+    idempotency_task.start()
+    reminders_task.start()
+    lifecycle.state.ready = True
+    yield
+    lifecycle.state.ready = False
+    await event_changes_task.stop()
+    await feed_task.stop()
+    await idempotency_task.stop()
+    await reminders_task.stop()
+
 app = FastAPI(
     title="Event Service API",
     description="API для управления мероприятиями",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan
 )
 
-# Настройка CORS
+# Повторы POST с тем же Idempotency-Key получают сохранённый ответ
+app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# Подсчёт SQL-запросов на каждый HTTP-запрос
+instrumentation.install(database.engine)
+if database.replica_engine is not None:
+    instrumentation.install(database.replica_engine)
+if database.registration_shards.sharded:
+    for shard_engine in database.registration_shards.engines:
+        instrumentation.install(shard_engine)
+app.add_middleware(instrumentation.QueryCountMiddleware)
+
+# После своей записи клиент некоторое время читает из primary, а не из реплики
+app.add_middleware(read_routing.ReadYourWritesMiddleware)
+
+# Сжатие ответов gzip/brotli
+app.add_middleware(http_cache.CompressionMiddleware)
+
+# Ограничение частоты запросов и перегрузки: лишние запросы сразу получают 429/503
+app.add_middleware(
+    rate_limit.RateLimitMiddleware,
+    service="event",
+    rules=[
+        rate_limit.Rule("register", "POST", r"^/events/\d+/register$", rate=2, burst=5),
+        rate_limit.Rule("create", "POST", r"^/events/?$", rate=0.2, burst=10),
+        # Выгрузки держат соединение с БД на всё время потока
+        rate_limit.Rule("export", "GET", r"^/(events/\d+/participants|users/me/events)/export$",
+                        rate=0.1, burst=3, concurrency=4),
+    ]
+)
+
+# Профиль запроса по X-Profile и журнал медленных запросов; без PROFILING_TOKEN
+# и SLOW_REQUEST_THRESHOLD_MS middleware не подключается и запросы не замедляет
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Сэмплер стеков для администратора: /debug/profiling/*
+app.include_router(profiling.router)
+
+# Сквозной X-Request-ID: принимается от клиента или соседнего сервиса, попадает в логи и ответ
+app.add_middleware(logging_config.RequestIdMiddleware)
+
+# Настройка CORS. Добавляется последним, т.е. снаружи остальных middleware:
+# отказы 429/503/409 без CORS-заголовков браузер не покажет клиенту
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Без этого браузер не отдаёт скрипту ETag для перепроверки кэша клиента
+    expose_headers=["ETag", "X-Request-ID"],
+)
+
+# При нескольких воркерах каждую периодическую задачу в момент времени выполняет один
+# из них (advisory lock с этим номером); остальные пропускают запуск
+LOCK_EVENT_CHANGES = 4201
+LOCK_EVENT_FEED = 4202
+LOCK_IDEMPOTENCY_PURGE = 4203
+LOCK_REMINDERS = 4204
+
+# Рассылка накопленных изменений мероприятий; при остановке — последний проход по outbox
+event_changes_task = PeriodicTask(
+    "event-changes",
+    event_changes.EVENT_CHANGES_POLL_INTERVAL,
+    exclusive(database.engine, LOCK_EVENT_CHANGES, event_changes.dispatch_due),
+    run_on_stop=True
+)
+
+# Периодическая пересборка ленты; первая сразу после старта
+feed_task = PeriodicTask(
+    "event-feed",
+    feed.FEED_REFRESH_INTERVAL,
+    exclusive(database.engine, LOCK_EVENT_FEED, feed.refresh),
+    initial_delay=1
+)
+
+# Очистка просроченных ключей идемпотентности
+idempotency_task = PeriodicTask(
+    "idempotency-purge",
+    idempotency.IDEMPOTENCY_PURGE_INTERVAL,
+    exclusive(database.engine, LOCK_IDEMPOTENCY_PURGE, idempotency.purge_expired)
 )
 
-# Создание таблиц при запуске
-@app.on_event("startup")
-async def startup():
-    models.Base.metadata.create_all(bind=database.engine)
-    logger.info("Таблицы базы данных созданы")
+# Напоминания о начале мероприятий; очередь загружается из БД сразу после старта
+reminders_task = PeriodicTask(
+    "event-reminders",
+    reminders.REMINDER_TICK_INTERVAL,
+    exclusive(database.engine, LOCK_REMINDERS, reminders.scheduler.run_due),
+    initial_delay=1
+)
 
 # Корневой эндпоинт
 @app.get("/")
@@ -54,45 +159,37 @@ def create_event(
     current_user: dict = Depends(verify_token)
 ):
     """Создание нового мероприятия"""
-    logger.info(f"Создание мероприятия: {event.title} пользователем {current_user['email']}")
+    logger.info("Создание мероприятия: %s пользователем %s", event.title, current_user['email'])
     
     try:
         db_event = crud.create_event(db=db, event=event, user_id=current_user["user_id"])
         
         # Отправка уведомления о создании мероприятия
-        notification_data = {
-            "user_id": current_user["user_id"],
-            "event_id": db_event.id,
-            "notification_type": "event_created",
-            "message": f"Вы создали мероприятие '{event.title}'"
-        }
-        
-        try:
-            requests.post(
-                "http://notification-service:8000/notifications/",
-                json=notification_data,
-                timeout=1
-            )
-        except:
-            logger.warning("Не удалось отправить уведомление")
+        notifications.send_notification(
+            current_user["user_id"],
+            db_event.id,
+            "event_created",
+            f"Вы создали мероприятие '{event.title}'"
+        )
         
         return db_event
     except Exception as e:
-        logger.error(f"Ошибка при создании мероприятия: {str(e)}")
+        logger.error("Ошибка при создании мероприятия: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/events/", response_model=List[schemas.Event], tags=["Мероприятия"])
 def read_events(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     category: Optional[str] = None,
     location: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение списка мероприятий с фильтрацией"""
-    logger.info(f"Получение мероприятий с фильтрами: category={category}, location={location}")
+    logger.info("Получение мероприятий с фильтрами: category=%s, location=%s", category, location)
     
     events = crud.get_events_with_filters(
         db, 
@@ -103,25 +200,82 @@ def read_events(
         date_from=date_from,
         date_to=date_to
     )
-    return events
+    return http_cache.page_response(request, rows_response(events))
+
+# Маршруты ленты объявлены до /events/{event_id}, иначе "feed" разбирается как идентификатор
+@app.get("/events/feed", response_model=List[schemas.FeedItem], tags=["Мероприятия"])
+def read_events_feed(
+    request: Request,
+    category: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
+    """Ближайшие опубликованные мероприятия из предрассчитанной ленты"""
+    return http_cache.page_response(request, rows_response(feed.get_feed(db, category=category, skip=skip, limit=limit)))
+
+@app.get("/events/trending", response_model=List[schemas.FeedItem], tags=["Мероприятия"])
+def read_trending_events(
+    request: Request,
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
+    """Популярные мероприятия: скорость регистраций и заполненность"""
+    return http_cache.page_response(request, rows_response(feed.get_trending(db, category=category, limit=limit)))
 
 @app.get("/events/{event_id}", response_model=schemas.Event, tags=["Мероприятия"])
-def read_event(event_id: int, db: Session = Depends(get_db)):
+def read_event(event_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """Получение информации о конкретном мероприятии"""
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
+    
+    last_modified = db_event.updated_at or db_event.created_at
+    etag = http_cache.make_etag(db_event.id, last_modified, db_event.current_participants)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    http_cache.set_validators(response, etag, last_modified)
     return db_event
 
+@app.get("/events/{event_id}/detail", response_model=schemas.EventDetail, tags=["Мероприятия"])
+def read_event_detail(
+    event_id: int,
+    request: Request,
+    response: Response,
+    current_user: Optional[dict] = Depends(optional_user)
+):
+    """Мероприятие, число участников, первая страница участников и статус текущего пользователя.
+
+    Карточка берётся из кэша процесса, повторные просмотры не обращаются к БД.
+    ETag — хеш карточки, посчитанный при её загрузке в кэш: условный запрос
+    получает 304 до сборки и сериализации ответа.
+    """
+    # После своей записи клиент получает карточку мимо кэша (как и чтение из primary).
+    # Имена участников запрашиваются в auth-service с токеном пользователя; аноним их не получает
+    detail = event_detail.get_card(
+        event_id, current_user, authorization=request.headers.get("Authorization"),
+        refresh=read_routing.wants_primary(request.scope)
+    )
+    if detail is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    status = event_detail.status_of(event_id, detail, current_user)
+    etag = event_detail.etag(detail, current_user, status)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag)
+    http_cache.set_validators(response, etag)
+    return event_detail.render(detail, current_user, status)
+
 @app.put("/events/{event_id}", response_model=schemas.Event, tags=["Мероприятия"])
 def update_event(
     event_id: int,
     event_update: schemas.EventUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
     """Обновление мероприятия"""
-    logger.info(f"Обновление мероприятия {event_id} пользователем {current_user['email']}")
+    logger.info("Обновление мероприятия %s пользователем %s", event_id, current_user['email'])
     
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
@@ -130,16 +284,44 @@ def update_event(
     if db_event.organizer_id != current_user["user_id"]:
         raise HTTPException(status_code=403, detail="Not authorized to update this event")
     
-    return crud.update_event(db=db, event_id=event_id, event_update=event_update)
+    # Увеличенный лимит сразу заполняется из очереди ожидания
+    db_event, promoted = crud.update_event(db=db, db_event=db_event, event_update=event_update)
+    notify_promoted(background_tasks, db_event, promoted)
+    return db_event
+
+@app.post("/events/{event_id}/cancel", response_model=schemas.Event, tags=["Мероприятия"])
+def cancel_event(
+    event_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Отмена мероприятия с уведомлением всех участников"""
+    logger.info("Отмена мероприятия %s пользователем %s", event_id, current_user['email'])
+    
+    db_event = crud.get_event(db, event_id=event_id)
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if db_event.organizer_id != current_user["user_id"]:
+        raise HTTPException(status_code=403, detail="Not authorized to cancel this event")
+    
+    if db_event.is_cancelled:
+        raise HTTPException(status_code=400, detail="Event is already cancelled")
+    
+    crud.cancel_event(db, db_event)
+    background_tasks.add_task(cancellation.notify_cancelled, event_id, db_event.title)
+    return db_event
 
 @app.delete("/events/{event_id}", tags=["Мероприятия"])
 def delete_event(
     event_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
     """Удаление мероприятия"""
-    logger.info(f"Удаление мероприятия {event_id} пользователем {current_user['email']}")
+    logger.info("Удаление мероприятия %s пользователем %s", event_id, current_user['email'])
     
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
@@ -148,66 +330,85 @@ def delete_event(
     if db_event.organizer_id != current_user["user_id"]:
         raise HTTPException(status_code=403, detail="Not authorized to delete this event")
     
-    crud.delete_event(db=db, event_id=event_id)
+    # Мероприятие сразу скрывается, а рассылка и физическое удаление идут в фоне
+    notify = not db_event.is_cancelled
+    if notify:
+        crud.cancel_event(db, db_event)
+    background_tasks.add_task(cancellation.notify_and_purge, event_id, db_event.title, notify)
     return {"message": "Event deleted successfully"}
 
+def notify_promoted(background_tasks: BackgroundTasks, db_event: models.Event, user_ids: List[int]):
+    """Уведомление пользователей, получивших место из очереди ожидания, после ответа"""
+    if user_ids:
+        background_tasks.add_task(
+            notifications.send_bulk_notifications,
+            user_ids,
+            db_event.id,
+            "event_registration",
+            f"Освободилось место: вы зарегистрированы на мероприятие '{db_event.title}'"
+        )
+
 # Эндпоинты для регистрации на мероприятия
 @app.post("/events/{event_id}/register", tags=["Регистрации"])
 def register_for_event(
     event_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
     """Регистрация пользователя на мероприятие"""
-    logger.info(f"Регистрация пользователя {current_user['email']} на мероприятие {event_id}")
+    logger.info("Регистрация пользователя %s на мероприятие %s", current_user['email'], event_id)
     
     db_event = crud.get_event(db, event_id=event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    existing_registration = crud.get_registration(db, event_id, current_user["user_id"])
-    if existing_registration:
-        raise HTTPException(status_code=400, detail="Already registered for this event")
-    
-    if db_event.max_participants and db_event.current_participants >= db_event.max_participants:
-        raise HTTPException(status_code=400, detail="Event is full")
-    
-    registration = crud.create_registration(db, event_id, current_user["user_id"])
-    
-    crud.update_event_participants(db, event_id, increment=True)
+    if db_event.is_cancelled:
+        raise HTTPException(status_code=400, detail="Event is cancelled")
     
-    notification_data = {
-        "user_id": current_user["user_id"],
-        "event_id": event_id,
-        "notification_type": "event_registration",
-        "message": f"Вы зарегистрировались на мероприятие '{db_event.title}'"
-    }
+    # Без свободных мест пользователь встаёт в очередь ожидания вместо ошибки и повторных попыток
+    registration, promoted = crud.create_registration(db, db_event, current_user["user_id"])
+    if registration is None:
+        # Повторную регистрацию отклонила БД; существующая запись читается только в этом случае
+        existing_registration = crud.get_registration(db, event_id, current_user["user_id"])
+        if existing_registration is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if existing_registration.status == models.RegistrationStatus.WAITLISTED.value:
+            raise HTTPException(status_code=400, detail="Already on the waitlist for this event")
+        raise HTTPException(status_code=400, detail="Already registered for this event")
+    notify_promoted(background_tasks, db_event, [user_id for user_id in promoted if user_id != current_user["user_id"]])
+    if registration.status == models.RegistrationStatus.WAITLISTED.value:
+        return {
+            "message": "Event is full, added to the waitlist",
+            "registration": registration,
+            "waitlist_position": crud.get_waitlist_position(db, event_id, registration.id)
+        }
     
-    try:
-        requests.post(
-            "http://notification-service:8000/notifications/",
-            json=notification_data,
-            timeout=1
-        )
-    except:
-        logger.warning("Не удалось отправить уведомление о регистрации")
+    notifications.send_notification(
+        current_user["user_id"],
+        event_id,
+        "event_registration",
+        f"Вы зарегистрировались на мероприятие '{db_event.title}'"
+    )
     
     return {"message": "Successfully registered for the event", "registration": registration}
 
 @app.delete("/events/{event_id}/unregister", tags=["Регистрации"])
 def unregister_from_event(
     event_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: dict = Depends(verify_token)
 ):
-    """Отмена регистрации на мероприятие"""
-    registration = crud.get_registration(db, event_id, current_user["user_id"])
-    if not registration:
+    """Отмена регистрации или выход из очереди ожидания"""
+    promoted = crud.delete_registration(db, event_id, current_user["user_id"])
+    if promoted is None:
         raise HTTPException(status_code=404, detail="Registration not found")
-    
-    crud.delete_registration(db, registration.id)
-    
-    crud.update_event_participants(db, event_id, increment=False)
+    if promoted:
+        # Мероприятие могли удалить параллельно: регистрация уже отменена, уведомлять не о чем
+        db_event = crud.get_event(db, event_id)
+        if db_event is not None:
+            notify_promoted(background_tasks, db_event, promoted)
     
     return {"message": "Successfully unregistered from the event"}
 
@@ -216,48 +417,165 @@ def get_event_participants(
     event_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение списка участников мероприятия"""
     participants = crud.get_event_participants(db, event_id, skip, limit)
     return participants
 
+@app.get("/events/{event_id}/stats", response_model=schemas.EventStats, tags=["Статистика"])
+def get_event_stats(
+    event_id: int,
+    days: int = Query(30, ge=1, le=366),
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Регистрации и отмены по дням или неделям и заполненность мероприятия"""
+    db_event = crud.get_event(db, event_id=event_id)
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if db_event.organizer_id != current_user["user_id"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view stats of this event")
+    
+    return stats.get_event_stats(db, db_event, days, bucket)
+
+@app.get("/users/me/events/stats", response_model=schemas.OrganizerStats, tags=["Статистика"])
+def get_user_events_stats(
+    days: int = Query(30, ge=1, le=366),
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Сводная статистика по всем мероприятиям организатора"""
+    return stats.get_organizer_stats(db, current_user["user_id"], days, bucket)
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+@app.get("/events/{event_id}/participants/export", tags=["Регистрации"])
+def export_event_participants(
+    event_id: int,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Потоковая выгрузка всех участников мероприятия (CSV или NDJSON)"""
+    db_event = crud.get_event(db, event_id=event_id)
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    if db_event.organizer_id != current_user["user_id"]:
+        raise HTTPException(status_code=403, detail="Not authorized to export participants")
+    
+    return exports.export_response(
+        crud.participants_export_query(event_id),
+        crud.PARTICIPANT_EXPORT_COLUMNS,
+        format,
+        f"event-{event_id}-participants",
+        gzip=accepts_gzip(request),
+        session_factory=crud.participants_export_session(event_id)
+    )
+
+@app.get("/users/me/events/export", tags=["Пользователь"])
+def export_user_events(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    scope: str = Query("organized", pattern="^(organized|registered)$"),
+    current_user: dict = Depends(verify_token)
+):
+    """Потоковая выгрузка созданных мероприятий или мероприятий с регистрацией"""
+    if scope == "organized":
+        statement = crud.organized_events_export_query(current_user["user_id"])
+    else:
+        statement = crud.registered_events_export_query(current_user["user_id"])
+    
+    return exports.export_response(
+        statement,
+        crud.EVENT_EXPORT_COLUMNS,
+        format,
+        f"{scope}-events",
+        gzip=accepts_gzip(request)
+    )
+
 @app.get("/users/me/events", response_model=List[schemas.Event], tags=["Пользователь"])
 def get_user_events(
-    db: Session = Depends(get_db),
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(verify_token)
 ):
     """Получение мероприятий текущего пользователя"""
-    events = crud.get_events_by_organizer(db, current_user["user_id"])
-    return events
+    events = crud.get_events_by_organizer(db, current_user["user_id"], skip, limit)
+    return http_cache.page_response(request, rows_response(events))
 
 @app.get("/users/me/registered-events", response_model=List[schemas.Event], tags=["Пользователь"])
 def get_user_registered_events(
-    db: Session = Depends(get_db),
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(verify_token)
 ):
     """Получение мероприятий, на которые зарегистрирован пользователь"""
-    events = crud.get_registered_events(db, current_user["user_id"])
-    return events
+    events = crud.get_registered_events(db, current_user["user_id"], skip, limit)
+    return http_cache.page_response(request, rows_response(events))
+
+@app.get("/users/me/events/summary", response_model=schemas.EventSummaryPage, tags=["Пользователь"])
+def get_user_events_summary(
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Краткий постраничный список мероприятий текущего пользователя"""
+    return crud.get_organized_events_summary(db, current_user["user_id"], page, size)
+
+@app.get("/users/me/registered-events/summary", response_model=schemas.EventSummaryPage, tags=["Пользователь"])
+def get_user_registered_events_summary(
+    page: int = Query(1, ge=1),
+    size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Краткий постраничный список мероприятий, на которые зарегистрирован пользователь"""
+    return crud.get_registered_events_summary(db, current_user["user_id"], page, size)
+
+@app.get("/users/me/dashboard", response_model=schemas.Dashboard, tags=["Пользователь"])
+def get_user_dashboard(
+    size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(verify_token)
+):
+    """Первые страницы обоих списков и число непрочитанных уведомлений за один запрос"""
+    return {
+        "organized": crud.get_organized_events_summary(db, current_user["user_id"], 1, size),
+        "registered": crud.get_registered_events_summary(db, current_user["user_id"], 1, size),
+        "unread_count": notifications.get_unread_count(current_user["user_id"])
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Система"])
+def metrics():
+    """Метрики SQL-запросов по обработчикам и очереди логов (формат Prometheus)"""
+    return instrumentation.render_metrics() + logging_config.render_metrics()
 
 @app.get("/health", tags=["Система"])
 def health_check():
-    """Проверка здоровья сервиса"""
-    try:
-        # Проверяем подключение к БД
-        db = database.SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
-        return {
-            "status": "healthy",
-            "service": "event-service",
-            "database": "connected"
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Service unhealthy: {str(e)}"
-        )
+    """Проверка живости процесса (без обращения к БД)"""
+    return {"status": "healthy", "service": "event-service"}
+
+@app.get("/ready", tags=["Система"])
+async def readiness_check():
+    """Готовность принимать трафик: старт завершён и БД отвечает"""
+    if not lifecycle.state.ready:
+        raise HTTPException(status_code=503, detail="Service is starting")
+    error = await lifecycle.check_db(database.engine)
+    if error:
+        raise HTTPException(status_code=503, detail=f"Service not ready: {error}")
+    return {"status": "ready", "service": "event-service", "database": "connected"}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,56 @@
+from sqlalchemy import text
+import logging
+
+logger = logging.getLogger(__name__)
+
+# create_all не меняет существующие таблицы, поэтому новые колонки и ограничения
+# добавляются здесь идемпотентными DDL-командами
+POSTGRES_MIGRATIONS = [
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS is_cancelled BOOLEAN NOT NULL DEFAULT false",
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS cancelled_at TIMESTAMP WITH TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_registrations_event_id ON registrations (event_id)",
+    "CREATE INDEX IF NOT EXISTS ix_registrations_user_id ON registrations (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_events_organizer_id ON events (organizer_id)",
+    "CREATE INDEX IF NOT EXISTS ix_registrations_event_status_id ON registrations (event_id, status, id)",
+    "CREATE INDEX IF NOT EXISTS ix_events_start_date_id ON events (start_date, id)",
+    # Внешний ключ пересоздаётся с ON DELETE CASCADE, только если он ещё без каскада
+    """
+    DO $$
+    DECLARE fk_name text;
+    BEGIN
+        SELECT conname INTO fk_name FROM pg_constraint
+        WHERE conrelid = 'registrations'::regclass AND contype = 'f' AND confdeltype <> 'c'
+        LIMIT 1;
+        IF fk_name IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE registrations DROP CONSTRAINT %I', fk_name);
+            ALTER TABLE registrations ADD CONSTRAINT registrations_event_id_fkey
+                FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE CASCADE;
+        END IF;
+    END $$
+    """,
+]
+
+# Таблица registrations есть и в основной БД, и в шардах регистраций. Индекс не
+# создастся, если в таблице уже есть повторные записи пользователя: их нужно убрать вручную
+REGISTRATION_MIGRATIONS = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_registrations_event_user ON registrations (event_id, user_id)",
+]
+
+
+def run_migrations(engine):
+    """Доведение схемы существующей БД до текущих моделей"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for statement in POSTGRES_MIGRATIONS + REGISTRATION_MIGRATIONS:
+            conn.execute(text(statement))
+    logger.info("Миграции схемы применены")
+
+
+def run_registration_migrations(engine):
+    """Миграции таблицы registrations в шарде"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for statement in REGISTRATION_MIGRATIONS:
+            conn.execute(text(statement))
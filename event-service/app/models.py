@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, Enum, JSON, Float, Index, LargeBinary
+from sqlalchemy.sql import func, false
 from sqlalchemy.orm import relationship
 import enum
 from .database import Base
@@ -13,8 +13,19 @@ class EventCategory(str, enum.Enum):
     SPORTS = "sports"
     OTHER = "other"
 
+class RegistrationStatus(str, enum.Enum):
+    CONFIRMED = "confirmed"
+    # Очередь ожидания: место выдаётся по порядку id, когда оно освобождается
+    WAITLISTED = "waitlisted"
+
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # Поиск мероприятий, входящих в окно напоминания, по возрастанию (start_date, id)
+        Index("ix_events_start_date_id", "start_date", "id"),
+    )
+    # Серверные значения по умолчанию возвращаются через RETURNING, без повторного SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
@@ -23,20 +34,99 @@ class Event(Base):
     location = Column(String)
     start_date = Column(DateTime(timezone=True), nullable=False)
     end_date = Column(DateTime(timezone=True))
-    organizer_id = Column(Integer, nullable=False)
+    organizer_id = Column(Integer, nullable=False, index=True)
     max_participants = Column(Integer)
     current_participants = Column(Integer, default=0)
     is_published = Column(Boolean, default=True)
+    is_cancelled = Column(Boolean, default=False, server_default=false(), nullable=False)
+    cancelled_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 class Registration(Base):
     __tablename__ = "registrations"
+    __table_args__ = (
+        # Голова очереди ожидания мероприятия и число подтверждённых участников
+        Index("ix_registrations_event_status_id", "event_id", "status", "id"),
+        # Одна запись пользователя на мероприятие: повторную регистрацию отклоняет БД, без SELECT перед вставкой
+        Index("ux_registrations_event_user", "event_id", "user_id", unique=True),
+    )
+    # Серверные значения по умолчанию возвращаются через RETURNING, без повторного SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
-    user_id = Column(Integer, nullable=False)
+    # Регистрации удаляются вместе с мероприятием на стороне БД
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
     registered_at = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(String, default="confirmed")
+    status = Column(String, default=RegistrationStatus.CONFIRMED.value)
+    
+    event = relationship("Event", passive_deletes=True)
+
+class ReminderWatermark(Base):
+    """Отметка планировщика напоминаний: мероприятия до (start_date, event_id) в этом окне обработаны"""
+    __tablename__ = "reminder_watermarks"
+    
+    # Окно напоминания: за сколько минут до начала
+    window_minutes = Column(Integer, primary_key=True)
+    start_date = Column(DateTime(timezone=True), nullable=False)
+    event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class EventChangeOutbox(Base):
+    """Накопленные изменения мероприятия, ожидающие рассылки участникам"""
+    __tablename__ = "event_change_outbox"
+    
+    event_id = Column(Integer, primary_key=True)
+    # Исходные значения изменённых полей на момент первой правки в окне
+    changes = Column(JSON, nullable=False)
+    due_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EventFeed(Base):
+    """Материализованная лента ближайших опубликованных мероприятий с рейтингом популярности"""
+    __tablename__ = "event_feed"
+    __table_args__ = (
+        Index("ix_event_feed_start_date", "start_date"),
+        Index("ix_event_feed_category_start_date", "category", "start_date"),
+        Index("ix_event_feed_score", "score"),
+        Index("ix_event_feed_category_score", "category", "score"),
+    )
+    
+    # Совпадает с events.id
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    category = Column(Enum(EventCategory))
+    location = Column(String)
+    start_date = Column(DateTime(timezone=True), nullable=False)
+    current_participants = Column(Integer, nullable=False, default=0)
+    max_participants = Column(Integer)
+    fill_ratio = Column(Float, nullable=False, default=0)
+    # Регистрации за последние FEED_VELOCITY_HOURS часов
+    registrations_recent = Column(Integer, nullable=False, default=0)
+    score = Column(Float, nullable=False, default=0)
+    refreshed_at = Column(DateTime(timezone=True))
+
+class EventStatsDaily(Base):
+    """Дневные счётчики регистраций и отмен по мероприятию, обновляются инкрементально"""
+    __tablename__ = "event_stats_daily"
+    
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    # День в UTC
+    day = Column(Date, primary_key=True)
+    registrations = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    """Сохранённый ответ на POST с заголовком Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
     
-    event = relationship("Event")
\ No newline at end of file
+    # sha256 от ключа, метода, пути и заголовка Authorization
+    key_hash = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False)
+    status_code = Column(Integer)
+    content_type = Column(String)
+    body = Column(LargeBinary)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
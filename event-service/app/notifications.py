@@ -0,0 +1,90 @@
+from typing import Iterable, List, Optional
+import logging
+import os
+
+import requests
+
+from .logging_config import outgoing_headers
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://notification-service:8000")
+# Размер пачки получателей в одном запросе к notification-service
+NOTIFICATION_CHUNK_SIZE = int(os.getenv("NOTIFICATION_CHUNK_SIZE", 1000))
+
+# Общая сессия: соединения с notification-service переиспользуются
+_session = requests.Session()
+
+
+def send_notification(user_id: int, event_id: Optional[int], notification_type: str, message: str) -> bool:
+    """Отправка одного уведомления; ошибки не прерывают основной запрос"""
+    try:
+        _session.post(
+            f"{NOTIFICATION_SERVICE_URL}/notifications/",
+            json={
+                "user_id": user_id,
+                "event_id": event_id,
+                "notification_type": notification_type,
+                "message": message
+            },
+            headers=outgoing_headers(),
+            timeout=1
+        )
+        return True
+    except requests.exceptions.RequestException:
+        logger.warning("Не удалось отправить уведомление %s пользователю %s", notification_type, user_id)
+        return False
+
+
+def get_unread_count(user_id: int) -> Optional[int]:
+    """Число непрочитанных уведомлений; None, если notification-service недоступен"""
+    try:
+        response = _session.get(
+            f"{NOTIFICATION_SERVICE_URL}/users/{user_id}/unread-count", headers=outgoing_headers(), timeout=1
+        )
+        response.raise_for_status()
+        return response.json()["unread_count"]
+    except requests.exceptions.RequestException:
+        logger.warning("Не удалось получить число непрочитанных уведомлений пользователя %s", user_id)
+        return None
+
+
+def chunked(items: List[int], size: int) -> Iterable[List[int]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def send_bulk_notifications(
+    user_ids: List[int],
+    event_id: Optional[int],
+    notification_type: str,
+    message: str,
+    chunk_size: int = NOTIFICATION_CHUNK_SIZE,
+    dedupe_key: Optional[str] = None
+) -> int:
+    """Рассылка одного уведомления многим пользователям пачками; возвращает число доставленных.
+
+    С dedupe_key notification-service пропускает пользователей, уже получивших
+    уведомление с этим ключом, поэтому пачку можно безопасно отправить повторно.
+    """
+    delivered = 0
+    for chunk in chunked(user_ids, chunk_size):
+        try:
+            response = _session.post(
+                f"{NOTIFICATION_SERVICE_URL}/notifications/bulk",
+                json={
+                    "user_ids": chunk,
+                    "event_id": event_id,
+                    "notification_type": notification_type,
+                    "message": message,
+                    "dedupe_key": dedupe_key
+                },
+                headers=outgoing_headers(),
+                timeout=30
+            )
+            response.raise_for_status()
+            delivered += len(chunk)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Не удалось отправить пачку уведомлений %s (%s шт.): %s", notification_type, len(chunk), e)
+    logger.info("Рассылка %s по мероприятию %s: %s/%s", notification_type, event_id, delivered, len(user_ids))
+    return delivered
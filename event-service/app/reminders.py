@@ -0,0 +1,154 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import heapq
+import logging
+import os
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models, notifications
+from .database import SessionLocal, registration_shards
+
+logger = logging.getLogger(__name__)
+
+# Окна напоминаний: за сколько минут до начала мероприятия (через запятую)
+REMINDER_WINDOWS = [int(value) for value in os.getenv("REMINDER_WINDOWS", "1440,60").split(",") if value.strip()]
+# Как часто проверяется голова очереди напоминаний
+REMINDER_TICK_INTERVAL = float(os.getenv("REMINDER_TICK_INTERVAL", 5))
+# Как часто очередь перечитывается из БД; загружаются напоминания на два таких интервала вперёд
+REMINDER_REFRESH_INTERVAL = float(os.getenv("REMINDER_REFRESH_INTERVAL", 60))
+
+
+def _utc(value: datetime) -> datetime:
+    """SQLite возвращает время без часового пояса; хранится оно в UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@dataclass(order=True, frozen=True)
+class Reminder:
+    due_at: datetime
+    start_date: datetime
+    event_id: int
+    window: int
+    title: str = field(compare=False)
+    location: Optional[str] = field(compare=False)
+
+    @property
+    def dedupe_key(self) -> str:
+        return f"reminder:{self.event_id}:{self.window}"
+
+    def message(self) -> str:
+        message = f"Напоминание: мероприятие '{self.title}' начнётся {self.start_date.strftime('%d.%m.%Y %H:%M')}"
+        return f"{message}, место: {self.location}" if self.location else message
+
+
+def _watermark(db: Session, window: int, now: datetime) -> models.ReminderWatermark:
+    mark = db.get(models.ReminderWatermark, window)
+    if mark is None:
+        # Новое окно: напоминания, время которых уже прошло, задним числом не рассылаются
+        mark = models.ReminderWatermark(window_minutes=window, start_date=now + timedelta(minutes=window), event_id=0)
+        db.add(mark)
+        db.flush()
+    return mark
+
+
+def _send(db: Session, reminder: Reminder) -> bool:
+    """Рассылка напоминания подтверждённым участникам; False, если не все пачки доставлены"""
+    # Участники читаются из шарда мероприятия серверным курсором пачками, без загрузки всего списка в память
+    with registration_shards.session_for(db, reminder.event_id) as shard:
+        result = shard.execute(
+            select(models.Registration.user_id)
+            .where(
+                models.Registration.event_id == reminder.event_id,
+                models.Registration.status == models.RegistrationStatus.CONFIRMED.value
+            )
+            .execution_options(yield_per=notifications.NOTIFICATION_CHUNK_SIZE)
+        )
+        for partition in result.scalars().partitions():
+            user_ids = list(partition)
+            delivered = notifications.send_bulk_notifications(
+                user_ids, reminder.event_id, "event_reminder", reminder.message(), dedupe_key=reminder.dedupe_key
+            )
+            if delivered < len(user_ids):
+                return False
+    return True
+
+
+class ReminderScheduler:
+    """Очередь напоминаний в памяти воркера — куча по времени отправки.
+
+    Источник истины — БД: для каждого окна хранится отметка (start_date, id)
+    последнего обработанного мероприятия, и очередь перечитывается диапазонным
+    запросом по индексу ix_events_start_date_id от этой отметки. После перезапуска
+    рассылка продолжается с места остановки, а напоминание, повторённое после сбоя
+    между рассылкой и сдвигом отметки, отбрасывает notification-service по dedupe_key.
+    """
+
+    def __init__(self, windows: List[int]):
+        self.windows = windows
+        self._heap: List[Reminder] = []
+        self._refreshed_at: Optional[datetime] = None
+
+    def _load(self, db: Session, now: datetime) -> List[Reminder]:
+        horizon = now + timedelta(seconds=2 * REMINDER_REFRESH_INTERVAL)
+        reminders = []
+        for window in self.windows:
+            offset = timedelta(minutes=window)
+            mark = _watermark(db, window, now)
+            rows = db.execute(
+                select(models.Event.id, models.Event.title, models.Event.location, models.Event.start_date)
+                .where(
+                    tuple_(models.Event.start_date, models.Event.id) > tuple_(mark.start_date, mark.event_id),
+                    models.Event.start_date <= horizon + offset,
+                    models.Event.is_cancelled == False
+                )
+                .order_by(models.Event.start_date, models.Event.id)
+            ).all()
+            for row in rows:
+                start_date = _utc(row.start_date)
+                reminders.append(Reminder(start_date - offset, start_date, row.id, window, row.title, row.location))
+        db.commit()
+        return reminders
+
+    def _advance(self, db: Session, reminder: Reminder):
+        mark = db.get(models.ReminderWatermark, reminder.window)
+        mark.start_date = reminder.start_date
+        mark.event_id = reminder.event_id
+        db.commit()
+
+    def run_due(self):
+        """Рассылка наступивших напоминаний; в каждый момент её выполняет один воркер (exclusive)"""
+        now = datetime.now(timezone.utc)
+        stale = self._refreshed_at is None or now - self._refreshed_at >= timedelta(seconds=REMINDER_REFRESH_INTERVAL)
+        if not stale and not (self._heap and self._heap[0].due_at <= now):
+            return
+
+        db = SessionLocal()
+        try:
+            # Перед рассылкой очередь перечитывается: новые, перенесённые и отменённые мероприятия,
+            # а также напоминания, уже разосланные другим воркером, учитываются по БД
+            self._heap = self._load(db, now)
+            heapq.heapify(self._heap)
+            self._refreshed_at = now
+
+            sent = 0
+            while self._heap and self._heap[0].due_at <= now:
+                reminder = self._heap[0]
+                # Уже начавшимся мероприятиям напоминание не нужно, отметка просто сдвигается
+                if reminder.start_date > now:
+                    if not _send(db, reminder):
+                        # Остаётся в голове очереди и повторяется на следующем проходе
+                        logger.warning("Напоминание за %s мин о мероприятии %s будет повторено", reminder.window, reminder.event_id)
+                        break
+                    sent += 1
+                heapq.heappop(self._heap)
+                self._advance(db, reminder)
+            if sent:
+                logger.info("Разосланы напоминания о мероприятиях: %s", sent)
+        finally:
+            db.close()
+
+
+scheduler = ReminderScheduler(REMINDER_WINDOWS)
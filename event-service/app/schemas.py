@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 import enum
 
@@ -39,12 +39,88 @@ class Event(EventBase):
     organizer_id: int
     current_participants: int
     is_published: bool
+    is_cancelled: bool = False
+    cancelled_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+class EventSummary(BaseModel):
+    """Облегчённое представление мероприятия для списков, без описания"""
+    id: int
+    title: str
+    category: EventCategory
+    location: Optional[str] = None
+    start_date: datetime
+    current_participants: int
+    max_participants: Optional[int] = None
+    is_published: bool
+    is_cancelled: bool = False
+    
+    class Config:
+        from_attributes = True
+
+class EventSummaryPage(BaseModel):
+    items: List[EventSummary]
+    total: int
+    page: int
+    size: int
+    pages: int
+
+class FeedItem(BaseModel):
+    id: int
+    title: str
+    category: EventCategory
+    location: Optional[str] = None
+    start_date: datetime
+    current_participants: int
+    max_participants: Optional[int] = None
+    fill_ratio: float
+    registrations_recent: int
+    score: float
+    refreshed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class StatsBucket(BaseModel):
+    # Начало интервала: день или понедельник недели
+    period: date
+    registrations: int
+    cancellations: int
+    net: int
+
+class EventStats(BaseModel):
+    event_id: int
+    current_participants: int
+    max_participants: Optional[int] = None
+    fill_rate: Optional[float] = None
+    registrations: int
+    cancellations: int
+    buckets: List[StatsBucket]
+
+class OrganizerEventStats(BaseModel):
+    event_id: int
+    title: str
+    current_participants: int
+    max_participants: Optional[int] = None
+    fill_rate: Optional[float] = None
+    registrations: int
+    cancellations: int
+
+class OrganizerStats(BaseModel):
+    registrations: int
+    cancellations: int
+    events: List[OrganizerEventStats]
+    buckets: List[StatsBucket]
+
+class Dashboard(BaseModel):
+    organized: EventSummaryPage
+    registered: EventSummaryPage
+    unread_count: Optional[int] = None
+
 class RegistrationBase(BaseModel):
     event_id: int
     user_id: int
@@ -67,6 +143,23 @@ class Participant(BaseModel):
     full_name: Optional[str]
     registered_at: datetime
 
+class DetailParticipant(BaseModel):
+    user_id: int
+    username: Optional[str] = None
+    full_name: Optional[str] = None
+    registered_at: datetime
+
+class EventDetail(BaseModel):
+    """Карточка мероприятия: всё для страницы мероприятия одним запросом"""
+    event: Event
+    participant_count: int
+    waitlist_count: int
+    # Первая страница подтверждённых участников
+    participants: List[DetailParticipant]
+    # Статус регистрации текущего пользователя: confirmed, waitlisted или None
+    registration_status: Optional[str] = None
+    is_registered: bool = False
+
 class PaginatedResponse(BaseModel):
     items: List[Event]
     total: int
@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+import logging
+import zlib
+
+from sqlalchemy import Column, Index, MetaData, Table, text
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# SQLite-шарды (локальная проверка): id шарда k начинаются с k * SQLITE_ID_RANGE + 1
+SQLITE_ID_RANGE = 10 ** 12
+
+
+def shard_urls(value: Optional[str]) -> List[str]:
+    """Список URL шардов из переменной окружения (через запятую)"""
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+
+def _without_foreign_keys(table: Table, metadata: MetaData) -> Table:
+    """Копия таблицы без внешних ключей: таблиц, на которые они ссылаются, в шарде нет"""
+    copy = Table(table.name, metadata, *(
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+            default=column.default.arg if column.default is not None else None,
+            server_default=column.server_default.arg if column.server_default is not None else None
+        )
+        for column in table.columns
+    ), sqlite_autoincrement=True)
+    for index in table.indexes:
+        Index(index.name, *(copy.c[column.name] for column in index.columns), unique=index.unique)
+    return copy
+
+
+class ShardRouter:
+    """Хеш-партиционирование строк одной таблицы по ключу между несколькими БД.
+
+    Без списка шардов единственный шард — основная БД: запросы выполняются
+    в сессии вызывающего и в той же транзакции, что и остальные изменения.
+    """
+
+    def __init__(self, urls: List[str], primary_engine, create_engine: Callable[[str], object]):
+        self.sharded = bool(urls)
+        self.engines = [create_engine(url) for url in urls] if urls else [primary_engine]
+        # На Postgres id чередуются между шардами (interleave_ids) и сами указывают на шард
+        self.interleaved = all(engine.dialect.name == "postgresql" for engine in self.engines)
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+            for engine in self.engines
+        ]
+        # Запросы scatter-gather выполняются на всех шардах параллельно
+        self._executor = ThreadPoolExecutor(len(self.engines), thread_name_prefix="shard") if self.sharded else None
+
+    @property
+    def count(self) -> int:
+        return len(self.engines)
+
+    def shard_of(self, key: int) -> int:
+        """Номер шарда для ключа; crc32, в отличие от hash(), одинаков во всех процессах"""
+        return zlib.crc32(str(key).encode()) % self.count
+
+    def shard_of_id(self, row_id: int) -> Optional[int]:
+        """Номер шарда по первичному ключу: id в шарде k равны k+1, k+1+N, ... (interleave_ids);
+        None, если id не чередуются"""
+        if self.sharded and not self.interleaved:
+            return None
+        return (row_id - 1) % self.count
+
+    @contextmanager
+    def session(self, db: Session, shard: int) -> Iterator[Session]:
+        """Сессия шарда; без шардирования — сессия вызывающего"""
+        if not self.sharded:
+            yield db
+            return
+        session = self.sessionmakers[shard]()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def session_for(self, db: Session, key: int):
+        return self.session(db, self.shard_of(key))
+
+    def sessionmaker_for(self, key: int, default: Callable[[], Session]) -> Callable[[], Session]:
+        """Фабрика сессий шарда ключа (для потоковых выгрузок); без шардирования — default"""
+        return self.sessionmakers[self.shard_of(key)] if self.sharded else default
+
+    def scatter(self, db: Session, func: Callable[[Session], T]) -> List[T]:
+        """Выполнение func на всех шардах; результаты в порядке шардов"""
+        if not self.sharded:
+            return [func(db)]
+
+        def run(maker) -> T:
+            with maker() as session:
+                return func(session)
+
+        return list(self._executor.map(run, self.sessionmakers))
+
+    def by_id(self, db: Session, row_id: int, func: Callable[[Session], Optional[T]]) -> Optional[T]:
+        """func в шарде строки; если шард по id не определить — на всех шардах, первый найденный результат"""
+        shard = self.shard_of_id(row_id)
+        if shard is not None:
+            with self.session(db, shard) as session:
+                return func(session)
+        return next((result for result in self.scatter(db, func) if result is not None), None)
+
+    def group(self, keys: Iterable[int]) -> Dict[int, List[int]]:
+        """Ключи, разложенные по шардам"""
+        groups: Dict[int, List[int]] = {}
+        for key in keys:
+            groups.setdefault(self.shard_of(key), []).append(key)
+        return groups
+
+    def create_tables(self, tables: List[Table]):
+        """Создание шардируемых таблиц во всех шардах"""
+        if not self.sharded:
+            return
+        metadata = MetaData()
+        for table in tables:
+            _without_foreign_keys(table, metadata)
+        for engine in self.engines:
+            metadata.create_all(bind=engine)
+        logger.info("Таблицы %s созданы в %s шардах", ', '.join(table.name for table in tables), self.count)
+
+    def interleave_ids(self, table_name: str):
+        """Id, уникальные между шардами: на Postgres последовательность шарда k выдаёт
+        k+1, k+1+N, ...; на SQLite у каждого шарда свой диапазон id"""
+        if not self.sharded:
+            return
+        for shard, engine in enumerate(self.engines):
+            with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    # Вставки ждут конца транзакции: max(id) не устареет до перезапуска последовательности
+                    conn.execute(text(f"LOCK TABLE {table_name} IN SHARE ROW EXCLUSIVE MODE"))
+                max_id = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table_name}")).scalar()
+                if engine.dialect.name == "postgresql":
+                    sequence = conn.execute(
+                        text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table_name}
+                    ).scalar()
+                    increment = conn.execute(
+                        text("SELECT seqincrement FROM pg_sequence WHERE seqrelid = CAST(:sequence AS regclass)"),
+                        {"sequence": sequence}
+                    ).scalar()
+                    last_value, is_called = conn.execute(text(f"SELECT last_value, is_called FROM {sequence}")).one()
+                    next_id = last_value + increment if is_called else last_value
+                    # Повторный запуск миграций: последовательность уже чередуется и впереди данных
+                    if increment == self.count and next_id > max_id and (next_id - 1) % self.count == shard:
+                        continue
+                    # Наименьший id больше существующих и уже выданных, попадающий в этот шард
+                    floor = max(max_id, next_id - 1)
+                    start = floor + 1 + (shard - floor) % self.count
+                    conn.execute(text(f"ALTER SEQUENCE {sequence} INCREMENT BY {self.count} RESTART WITH {start}"))
+                elif engine.dialect.name == "sqlite":
+                    # Счётчик AUTOINCREMENT (таблица создана create_tables) переносится в диапазон шарда,
+                    # но не назад: повторный запуск не выдаёт id заново
+                    seq = conn.execute(
+                        text("SELECT seq FROM sqlite_sequence WHERE name = :table"), {"table": table_name}
+                    ).scalar()
+                    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :table"), {"table": table_name})
+                    conn.execute(
+                        text("INSERT INTO sqlite_sequence (name, seq) VALUES (:table, :seq)"),
+                        {"table": table_name, "seq": max(seq or 0, max_id, shard * SQLITE_ID_RANGE)}
+                    )
+                else:
+                    logger.warning("Шард %s: id %s не разведены между шардами", shard, table_name)
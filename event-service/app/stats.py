@@ -0,0 +1,143 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import logging
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+def upsert(db: Session):
+    return dialect_insert(models.EventStatsDaily)
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def record(db: Session, event_id: int, registrations: int = 0, cancellations: int = 0):
+    """Инкремент дневных счётчиков в транзакции вызывающего, одним INSERT ... ON CONFLICT"""
+    statement = upsert(db).values(
+        event_id=event_id,
+        day=today(),
+        registrations=registrations,
+        cancellations=cancellations
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["event_id", "day"],
+        set_={
+            "registrations": models.EventStatsDaily.registrations + statement.excluded.registrations,
+            "cancellations": models.EventStatsDaily.cancellations + statement.excluded.cancellations,
+        }
+    ))
+
+
+def _window(days: int):
+    end = today()
+    return end - timedelta(days=days - 1), end
+
+
+def _buckets(rows, start: date, end: date, bucket: str) -> List[dict]:
+    """Дневные строки по порядку, с нулями для пустых дней; для bucket=week сумма по неделям"""
+    by_day: Dict[date, tuple] = {row.day: (row.registrations or 0, row.cancellations or 0) for row in rows}
+    buckets: List[dict] = []
+    day = start
+    while day <= end:
+        registrations, cancellations = by_day.get(day, (0, 0))
+        period = day - timedelta(days=day.weekday()) if bucket == "week" else day
+        if buckets and buckets[-1]["period"] == period:
+            buckets[-1]["registrations"] += registrations
+            buckets[-1]["cancellations"] += cancellations
+        else:
+            buckets.append({"period": period, "registrations": registrations, "cancellations": cancellations})
+        day += timedelta(days=1)
+    for item in buckets:
+        item["net"] = item["registrations"] - item["cancellations"]
+    return buckets
+
+
+def _fill_rate(current: Optional[int], maximum: Optional[int]) -> Optional[float]:
+    if not maximum:
+        return None
+    return (current or 0) / maximum
+
+
+def get_event_stats(db: Session, db_event: models.Event, days: int = 30, bucket: str = "day") -> dict:
+    """Статистика одного мероприятия из дневных агрегатов"""
+    start, end = _window(days)
+    rows = db.execute(
+        select(
+            models.EventStatsDaily.day,
+            models.EventStatsDaily.registrations,
+            models.EventStatsDaily.cancellations
+        ).where(
+            models.EventStatsDaily.event_id == db_event.id,
+            models.EventStatsDaily.day >= start
+        )
+    ).all()
+    buckets = _buckets(rows, start, end, bucket)
+    return {
+        "event_id": db_event.id,
+        "current_participants": db_event.current_participants,
+        "max_participants": db_event.max_participants,
+        "fill_rate": _fill_rate(db_event.current_participants, db_event.max_participants),
+        "registrations": sum(item["registrations"] for item in buckets),
+        "cancellations": sum(item["cancellations"] for item in buckets),
+        "buckets": buckets,
+    }
+
+
+def get_organizer_stats(db: Session, organizer_id: int, days: int = 30, bucket: str = "day") -> dict:
+    """Статистика всех мероприятий организатора: итоги по мероприятиям и общие интервалы"""
+    start, end = _window(days)
+    window = models.EventStatsDaily.day >= start
+
+    per_event = db.execute(
+        select(
+            models.Event.id,
+            models.Event.title,
+            models.Event.current_participants,
+            models.Event.max_participants,
+            func.coalesce(func.sum(models.EventStatsDaily.registrations), 0).label("registrations"),
+            func.coalesce(func.sum(models.EventStatsDaily.cancellations), 0).label("cancellations")
+        )
+        .outerjoin(models.EventStatsDaily, (models.EventStatsDaily.event_id == models.Event.id) & window)
+        .where(models.Event.organizer_id == organizer_id)
+        .group_by(models.Event.id)
+        .order_by(desc("registrations"), models.Event.id)
+    ).all()
+
+    daily = db.execute(
+        select(
+            models.EventStatsDaily.day,
+            func.sum(models.EventStatsDaily.registrations).label("registrations"),
+            func.sum(models.EventStatsDaily.cancellations).label("cancellations")
+        )
+        .join(models.Event, models.Event.id == models.EventStatsDaily.event_id)
+        .where(models.Event.organizer_id == organizer_id, window)
+        .group_by(models.EventStatsDaily.day)
+    ).all()
+
+    events = [
+        {
+            "event_id": row.id,
+            "title": row.title,
+            "current_participants": row.current_participants,
+            "max_participants": row.max_participants,
+            "fill_rate": _fill_rate(row.current_participants, row.max_participants),
+            "registrations": row.registrations,
+            "cancellations": row.cancellations,
+        }
+        for row in per_event
+    ]
+    buckets = _buckets(daily, start, end, bucket)
+    return {
+        "registrations": sum(item["registrations"] for item in buckets),
+        "cancellations": sum(item["cancellations"] for item in buckets),
+        "events": events,
+        "buckets": buckets,
+    }
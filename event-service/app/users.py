@@ -0,0 +1,29 @@
+from typing import Dict, List, Optional
+import logging
+
+import requests
+
+from .dependencies import AUTH_SERVICE_URL
+from .logging_config import outgoing_headers
+
+logger = logging.getLogger(__name__)
+
+# Общая сессия: соединения с auth-service переиспользуются
+_session = requests.Session()
+
+
+def get_profiles(user_ids: List[int], authorization: str) -> Optional[Dict[int, dict]]:
+    """Профили пользователей одним запросом к auth-service с токеном текущего пользователя;
+    None, если auth-service недоступен или отказал"""
+    if not user_ids:
+        return {}
+    try:
+        response = _session.get(
+            f"{AUTH_SERVICE_URL}/users/batch", params={"ids": user_ids},
+            headers=outgoing_headers({"Authorization": authorization}), timeout=1
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        logger.warning("Не удалось получить профили %s пользователей", len(user_ids))
+        return None
+    return {profile["id"]: profile for profile in response.json()}
@@ -0,0 +1,78 @@
+"""Фикстуры тестов event-service: приложение в этом процессе на временной SQLite.
+
+    cd event-service && python -m pytest tests
+
+Другая БД задаётся через TEST_DATABASE_URL. Токены проверяются без
+auth-service: Bearer <имя> из USERS.
+"""
+import os
+import sys
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="event-service-tests-")
+os.environ.update({
+    "DATABASE_URL": os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_directory, 'event')}.db"),
+    "MIGRATE_ON_STARTUP": "true",
+    "RATE_LIMIT_ENABLED": "false",
+    # Реплики нет; чтения после записи идут через кэш, как у других клиентов
+    "READ_YOUR_WRITES_SECONDS": "0",
+    # Уведомления в тестах не доставляются
+    "NOTIFICATION_SERVICE_URL": "http://127.0.0.1:1",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.testclient import TestClient
+
+from app import database, main
+
+USERS = {"organizer": 900001, "attendee": 900002, "waiting": 900003}
+
+_security = HTTPBearer()
+_optional_security = HTTPBearer(auto_error=False)
+
+
+def _resolve(credentials: HTTPAuthorizationCredentials = Depends(_security)):
+    if credentials.credentials not in USERS:
+        raise HTTPException(status_code=401)
+    name = credentials.credentials
+    return {"email": f"{name}@example.com", "user_id": USERS[name], "username": name}
+
+
+def _resolve_optional(credentials: HTTPAuthorizationCredentials = Depends(_optional_security)):
+    return _resolve(credentials) if credentials is not None else None
+
+
+def auth(name: str) -> dict:
+    return {"Authorization": f"Bearer {name}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    main.app.dependency_overrides[main.verify_token] = _resolve
+    main.app.dependency_overrides[main.optional_user] = _resolve_optional
+    # Периодические задачи не запускаются: их запросы попадали бы в бюджеты запросов тестов
+    for task in (main.event_changes_task, main.feed_task, main.idempotency_task, main.reminders_task):
+        task.start = lambda: None
+    with TestClient(main.app) as client:
+        yield client
+    main.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def event_id(client):
+    """Новое опубликованное мероприятие на одно место"""
+    response = client.post("/events/", json={
+        "title": "Тест", "start_date": "2030-01-01T10:00:00", "max_participants": 1
+    }, headers=auth("organizer"))
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
@@ -0,0 +1,57 @@
+from sqlalchemy import select, update
+
+from app import backfill_stats, models, stats
+
+from conftest import auth
+
+
+def stats_rows(db, event_id):
+    rows = db.execute(
+        select(models.EventStatsDaily.day, models.EventStatsDaily.registrations, models.EventStatsDaily.cancellations)
+        .where(models.EventStatsDaily.event_id == event_id)
+    ).all()
+    return sorted(tuple(row) for row in rows)
+
+
+def register_two(client, event_id):
+    # Мест одно: второй пользователь попадает в очередь ожидания
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+    assert client.post(f"/events/{event_id}/register", headers=auth("waiting")).status_code == 200
+
+
+def test_fills_missing_days_from_confirmed_registrations(client, db, event_id):
+    register_two(client, event_id)
+    db.query(models.EventStatsDaily).filter(models.EventStatsDaily.event_id == event_id).delete()
+    db.commit()
+
+    backfill_stats.backfill(event_id)
+
+    assert stats_rows(db, event_id) == [(stats.today(), 1, 0)]
+
+
+def test_keeps_incremental_counters(client, db, event_id):
+    register_two(client, event_id)
+    # В счётчиках учтены и регистрации, отменённые позже: по строкам registrations их не восстановить
+    db.execute(
+        update(models.EventStatsDaily)
+        .where(models.EventStatsDaily.event_id == event_id)
+        .values(registrations=5, cancellations=4)
+    )
+    db.commit()
+
+    backfill_stats.backfill(event_id)
+
+    assert stats_rows(db, event_id) == [(stats.today(), 5, 4)]
+
+
+def test_second_run_is_noop(client, db, event_id):
+    register_two(client, event_id)
+    db.query(models.EventStatsDaily).filter(models.EventStatsDaily.event_id == event_id).delete()
+    db.commit()
+
+    backfill_stats.backfill()
+    first = stats_rows(db, event_id)
+    backfill_stats.backfill()
+
+    db.expire_all()
+    assert stats_rows(db, event_id) == first == [(stats.today(), 1, 0)]
@@ -0,0 +1,68 @@
+import threading
+
+from app.detail_cache import VersionedCache
+
+
+def test_misses_and_invalidations_leave_no_state():
+    cache = VersionedCache(ttl=60, max_entries=10)
+
+    # Несуществующие ключи и некэшируемые значения
+    for key in range(100):
+        assert cache.get(key, lambda key: (None, True)) is None
+        assert cache.get(key + 100, lambda key: (key, False)) == key + 100
+    for key in range(1000):
+        cache.invalidate(key)
+
+    assert not cache._entries and not cache._loading
+
+
+def test_eviction_bounds_entries():
+    cache = VersionedCache(ttl=60, max_entries=10)
+    for key in range(100):
+        cache.get(key, lambda key: (key, True))
+
+    assert list(cache._entries) == list(range(90, 100))
+    assert not cache._loading
+
+
+def test_load_started_before_invalidation_is_not_cached():
+    cache = VersionedCache(ttl=60, max_entries=10)
+    loading, invalidated = threading.Event(), threading.Event()
+
+    def stale_load(key):
+        loading.set()
+        invalidated.wait(5)
+        return "stale", True
+
+    reader = threading.Thread(target=cache.get, args=(1, stale_load))
+    reader.start()
+    loading.wait(5)
+    cache.invalidate(1)
+    invalidated.set()
+    reader.join(5)
+
+    assert cache.get(1, lambda key: ("fresh", True)) == "fresh"
+    assert not cache._loading
+
+
+def test_concurrent_misses_share_one_load():
+    cache = VersionedCache(ttl=60, max_entries=10)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_load(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return "value", True
+
+    readers = [threading.Thread(target=cache.get, args=(1, slow_load)) for _ in range(5)]
+    for reader in readers:
+        reader.start()
+    started.wait(5)
+    release.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert calls == [1]
+    assert not cache._loading
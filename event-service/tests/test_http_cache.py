@@ -0,0 +1,53 @@
+from app import event_detail, instrumentation
+
+from conftest import auth
+
+
+def test_detail_not_modified_skips_rendering(client, event_id, monkeypatch):
+    first = client.get(f"/events/{event_id}/detail", headers=auth("attendee"))
+    etag = first.headers["ETag"]
+
+    def fail(*args):
+        raise AssertionError("ответ собирается при совпавшем ETag")
+
+    monkeypatch.setattr(event_detail, "render", fail)
+    with instrumentation.assert_query_budget(0):
+        response = client.get(f"/events/{event_id}/detail", headers={**auth("attendee"), "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_detail_reloaded_without_changes_keeps_etag(client, event_id):
+    etag = client.get(f"/events/{event_id}/detail", headers=auth("attendee")).headers["ETag"]
+
+    # Чтение мимо кэша (после своей записи) перечитывает карточку, но её содержимое то же
+    response = client.get(
+        f"/events/{event_id}/detail",
+        headers={**auth("attendee"), "If-None-Match": etag, "X-Consistency": "strong"}
+    )
+
+    assert response.status_code == 304
+
+
+def test_detail_etag_changes_with_registration(client, event_id):
+    etag = client.get(f"/events/{event_id}/detail", headers=auth("attendee")).headers["ETag"]
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+
+    response = client.get(f"/events/{event_id}/detail", headers={**auth("attendee"), "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json()["is_registered"] is True
+
+
+def test_detail_etag_depends_on_viewer(client, event_id):
+    etag = client.get(f"/events/{event_id}/detail", headers=auth("attendee")).headers["ETag"]
+
+    response = client.get(f"/events/{event_id}/detail", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+def test_feed_not_modified(client, event_id):
+    etag = client.get("/events/feed").headers["ETag"]
+
+    assert client.get("/events/feed", headers={"If-None-Match": etag}).status_code == 304
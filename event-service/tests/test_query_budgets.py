@@ -0,0 +1,63 @@
+"""Бюджет SQL-запросов пишущих эндпоинтов (instrumentation.assert_query_budget).
+
+Кроме строки регистрации или мероприятия запись обновляет в той же
+транзакции счётчик участников, строку ленты и дневную статистику — это
+отдельные таблицы, поэтому у таких эндпоинтов несколько запросов.
+"""
+from app import instrumentation
+
+from conftest import auth
+
+EVENT = {"title": "Бюджет", "start_date": "2030-01-01T10:00:00", "max_participants": 10}
+
+
+def within_budget(budget, call, expected=200):
+    with instrumentation.assert_query_budget(budget):
+        response = call()
+    assert response.status_code == expected, response.text
+    return response
+
+
+def create_event(client):
+    return client.post("/events/", json=EVENT, headers=auth("organizer")).json()["id"]
+
+
+def test_create_event(client):
+    # INSERT мероприятия и строки ленты (INSERT ... SELECT)
+    within_budget(2, lambda: client.post("/events/", json=EVENT, headers=auth("organizer")))
+
+
+def test_update_event(client):
+    event_id = create_event(client)
+    within_budget(2, lambda: client.put(f"/events/{event_id}", json={"description": "Бюджет"}, headers=auth("organizer")))
+
+
+def test_update_visible_field(client):
+    event_id = create_event(client)
+    # Изменение видимого поля пишет строку в outbox рассылки и пересчитывает строку ленты
+    within_budget(6, lambda: client.put(f"/events/{event_id}", json={"title": "Бюджет 2"}, headers=auth("organizer")))
+
+
+def test_register(client):
+    event_id = create_event(client)
+    # Мероприятие, место, лента, статистика, регистрация; повторную регистрацию отклоняет уникальный индекс
+    within_budget(5, lambda: client.post(f"/events/{event_id}/register", headers=auth("attendee")))
+
+
+def test_unregister(client):
+    event_id = create_event(client)
+    client.post(f"/events/{event_id}/register", headers=auth("attendee"))
+    # Освободившееся место в той же транзакции предлагается голове очереди ожидания
+    within_budget(5, lambda: client.delete(f"/events/{event_id}/unregister", headers=auth("attendee")))
+
+
+def test_cancel_event(client):
+    event_id = create_event(client)
+    # Бюджеты отмены и удаления включают фоновую рассылку и очистку, выполняемые TestClient
+    within_budget(5, lambda: client.post(f"/events/{event_id}/cancel", headers=auth("organizer")))
+
+
+def test_delete_event(client):
+    event_id = create_event(client)
+    client.post(f"/events/{event_id}/register", headers=auth("attendee"))
+    within_budget(6, lambda: client.delete(f"/events/{event_id}", headers=auth("organizer")))
@@ -0,0 +1,54 @@
+from app import crud
+
+from conftest import auth
+
+
+def test_unregister_promotes_waitlist(client, event_id):
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+    assert client.post(f"/events/{event_id}/register", headers=auth("waiting")).status_code == 200
+
+    response = client.delete(f"/events/{event_id}/unregister", headers=auth("attendee"))
+
+    assert response.status_code == 200
+    participants = client.get(f"/events/{event_id}/participants").json()
+    assert [row["user_id"] for row in participants] == [900003]
+
+
+def test_unregister_when_event_deleted_concurrently(client, event_id, monkeypatch):
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+    assert client.post(f"/events/{event_id}/register", headers=auth("waiting")).status_code == 200
+    # Мероприятие исчезает между отменой регистрации и рассылкой о переводе из очереди
+    monkeypatch.setattr(crud, "get_event", lambda db, event_id: None)
+
+    response = client.delete(f"/events/{event_id}/unregister", headers=auth("attendee"))
+
+    assert response.status_code == 200
+
+
+def test_registrant_ids_are_streamed_in_batches(client, db, event_id):
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+    assert client.post(f"/events/{event_id}/register", headers=auth("waiting")).status_code == 200
+
+    batches = list(crud.iter_registrant_ids(db, event_id, batch_size=1))
+
+    assert sorted(batches) == [[900002], [900003]]
+
+
+def test_repeated_registration_is_rejected_without_taking_a_seat(client, event_id):
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+
+    response = client.post(f"/events/{event_id}/register", headers=auth("attendee"))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Already registered for this event"
+    assert client.get(f"/events/{event_id}", headers={"X-Consistency": "strong"}).json()["current_participants"] == 1
+
+
+def test_repeated_waitlist_entry_is_rejected(client, event_id):
+    assert client.post(f"/events/{event_id}/register", headers=auth("attendee")).status_code == 200
+    assert client.post(f"/events/{event_id}/register", headers=auth("waiting")).status_code == 200
+
+    response = client.post(f"/events/{event_id}/register", headers=auth("waiting"))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Already on the waitlist for this event"
@@ -1,18 +1,65 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, delete, update, insert, func
 from typing import Optional, List
+import heapq
 
 from . import models, schemas
+from .database import notification_shards, dialect_insert
+from .fastjson import columns_for
+
+# Колонки для списков: строки сериализуются напрямую, без ORM-объектов
+NOTIFICATION_COLUMNS = columns_for(models.Notification, schemas.Notification)
 
 def create_notification(db: Session, notification: schemas.NotificationCreate):
     db_notification = models.Notification(**notification.model_dump())
-    db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    with notification_shards.session_for(db, notification.user_id) as shard:
+        shard.add(db_notification)
+        shard.commit()
     return db_notification
 
+def create_notifications_bulk(db: Session, bulk: schemas.NotificationBulkCreate):
+    """Одно уведомление многим пользователям: по одному INSERT ... RETURNING на шард.
+
+    С dedupe_key уже созданные уведомления пропускаются (ON CONFLICT DO NOTHING)
+    и в результат не попадают.
+    """
+    db_notifications = []
+    for shard_index, user_ids in notification_shards.group(bulk.user_ids).items():
+        rows = [
+            {
+                "user_id": user_id,
+                "event_id": bulk.event_id,
+                "notification_type": bulk.notification_type,
+                "message": bulk.message,
+                "dedupe_key": f"{bulk.dedupe_key}:{user_id}" if bulk.dedupe_key else None
+            }
+            for user_id in user_ids
+        ]
+        with notification_shards.session(db, shard_index) as shard:
+            if bulk.dedupe_key:
+                statement = dialect_insert(models.Notification, shard.get_bind())\
+                    .on_conflict_do_nothing(index_elements=["dedupe_key"])
+            else:
+                statement = insert(models.Notification)
+            db_notifications.extend(shard.scalars(statement.returning(models.Notification), rows))
+            shard.commit()
+    return db_notifications
+
 def get_notification(db: Session, notification_id: int):
-    return db.query(models.Notification).filter(models.Notification.id == notification_id).first()
+    return notification_shards.by_id(
+        db,
+        notification_id,
+        lambda shard: shard.query(models.Notification).filter(models.Notification.id == notification_id).first()
+    )
+
+def _filter_notifications(query, user_id: Optional[int] = None, is_read: Optional[bool] = None):
+    if user_id is not None:
+        query = query.filter(models.Notification.user_id == user_id)
+    
+    if is_read is not None:
+        query = query.filter(models.Notification.is_read == is_read)
+    
+    return query
 
 def get_notifications(
     db: Session, 
@@ -21,43 +68,62 @@ def get_notifications(
     skip: int = 0, 
     limit: int = 100
 ):
-    query = db.query(models.Notification)
+    def page(shard: Session, skip: int, limit: int):
+        query = _filter_notifications(shard.query(*NOTIFICATION_COLUMNS), user_id, is_read)
+        return query.order_by(desc(models.Notification.created_at))\
+            .offset(skip).limit(limit).all()
     
-    if user_id is not None:
-        query = query.filter(models.Notification.user_id == user_id)
-    
-    if is_read is not None:
-        query = query.filter(models.Notification.is_read == is_read)
+    if user_id is not None or not notification_shards.sharded:
+        with notification_shards.session_for(db, user_id or 0) as shard:
+            return page(shard, skip, limit)
     
-    return query.order_by(desc(models.Notification.created_at))\
-        .offset(skip).limit(limit).all()
+    # Без пользователя — scatter-gather: первые skip + limit строк каждого шарда сливаются по created_at
+    pages = notification_shards.scatter(db, lambda shard: page(shard, 0, skip + limit))
+    merged = heapq.merge(*pages, key=lambda row: row.created_at, reverse=True)
+    return list(merged)[skip:skip + limit]
 
-def update_notification(db: Session, notification_id: int, notification_update: schemas.NotificationUpdate):
-    db_notification = get_notification(db, notification_id)
-    if not db_notification:
-        return None
-    
+def update_notification(db: Session, db_notification: models.Notification, notification_update: schemas.NotificationUpdate):
     update_data = notification_update.model_dump(exclude_unset=True)
     
     for field, value in update_data.items():
         setattr(db_notification, field, value)
     
-    db.commit()
-    db.refresh(db_notification)
+    with notification_shards.session_for(db, db_notification.user_id) as shard:
+        db_notification = shard.merge(db_notification)
+        shard.commit()
     return db_notification
 
+def mark_as_read(db: Session, notification_id: int):
+    """Отметка о прочтении одним UPDATE ... RETURNING; None, если уведомления нет"""
+    def run(shard: Session):
+        db_notification = shard.execute(
+            update(models.Notification)
+            .where(models.Notification.id == notification_id)
+            .values(is_read=True, read_at=func.now())
+            .returning(models.Notification)
+        ).scalar_one_or_none()
+        shard.commit()
+        return db_notification
+    
+    return notification_shards.by_id(db, notification_id, run)
+
 def delete_notification(db: Session, notification_id: int):
-    db_notification = get_notification(db, notification_id)
-    if not db_notification:
-        return None
+    """Удаление одним DELETE ... RETURNING; False, если уведомления нет"""
+    def run(shard: Session):
+        deleted_id = shard.execute(
+            delete(models.Notification)
+            .where(models.Notification.id == notification_id)
+            .returning(models.Notification.id)
+        ).scalar()
+        shard.commit()
+        return deleted_id
     
-    db.delete(db_notification)
-    db.commit()
-    return db_notification
+    return notification_shards.by_id(db, notification_id, run) is not None
 
 def get_unread_count(db: Session, user_id: int):
-    return db.query(models.Notification)\
-        .filter(
-            models.Notification.user_id == user_id,
-            models.Notification.is_read == False
-        ).count()
\ No newline at end of file
+    with notification_shards.session_for(db, user_id) as shard:
+        return shard.query(models.Notification)\
+            .filter(
+                models.Notification.user_id == user_id,
+                models.Notification.is_read == False
+            ).count()
\ No newline at end of file
@@ -1,8 +1,19 @@
-from .database import SessionLocal
+from fastapi import Request
+
+from .database import SessionLocal, read_session
+from .read_routing import wants_primary
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db(request: Request):
+    """Сессия для обработчиков только на чтение: реплика, кроме чтения после своей записи"""
+    db = SessionLocal() if wants_primary(request.scope) else read_session()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Iterable, List, Optional
+
+from . import email_service
+from .templates import registry, PreparedEmail, prepare_batch
+
+logger = logging.getLogger(__name__)
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 4))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", 10000))
+# Сколько при остановке ждать отправки уже принятых писем; меньше graceful_timeout gunicorn
+EMAIL_DRAIN_TIMEOUT = float(os.getenv("EMAIL_DRAIN_TIMEOUT", 10))
+
+# Сколько последних доставок учитывается в перцентилях задержки
+LATENCY_WINDOW = 10000
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class EmailDispatcher:
+    """Очередь исходящих писем с пулом asyncio-воркеров.
+
+    Письма рендерятся при постановке в очередь, а отправляются в фоне,
+    поэтому обработчик запроса не ждёт SMTP-сервер.
+    """
+
+    def __init__(self, workers: int = EMAIL_WORKERS, maxsize: int = EMAIL_QUEUE_SIZE):
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.in_flight = 0
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._tasks: List[asyncio.Task] = []
+        self._submissions = set()
+
+    async def start(self):
+        # Очередь создаётся в цикле событий сервиса
+        self.queue = asyncio.Queue(maxsize=self.queue.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("Очередь email запущена, воркеров: %s", self.workers)
+
+    async def stop(self, timeout: float = EMAIL_DRAIN_TIMEOUT):
+        """Остановка с дожиданием отправки уже поставленных писем"""
+        try:
+            if self._submissions:
+                await asyncio.wait_for(asyncio.gather(*self._submissions, return_exceptions=True), timeout)
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Очередь email не опустела за %s с, осталось %s", timeout, self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, notification, recipient_email: str = None, locale: Optional[str] = None):
+        prepared = PreparedEmail(registry.render(notification, locale))
+        recipient_email = recipient_email or email_service.default_recipient(notification)
+        await self._put(prepared, recipient_email)
+
+    async def enqueue_many(self, notifications: Iterable, locale: Optional[str] = None):
+        notifications = list(notifications)
+        prepared = prepare_batch(registry.render_batch(notifications, locale))
+        for notification, email in zip(notifications, prepared):
+            await self._put(email, email_service.default_recipient(notification))
+
+    def submit_many(self, notifications: Iterable, locale: Optional[str] = None) -> asyncio.Task:
+        """Постановка пачки писем в фоне: ответ на массовую рассылку не ждёт освобождения очереди"""
+        task = asyncio.create_task(self.enqueue_many(notifications, locale))
+        self._submissions.add(task)
+        task.add_done_callback(self._submissions.discard)
+        return task
+
+    async def _put(self, prepared: PreparedEmail, recipient_email: str):
+        # При переполнении очереди обработчик ждёт (backpressure), а не теряет письма
+        await self.queue.put((prepared, recipient_email, time.monotonic()))
+        self.enqueued += 1
+
+    async def _worker(self):
+        while True:
+            prepared, recipient_email, enqueued_at = await self.queue.get()
+            self.in_flight += 1
+            try:
+                if await email_service.deliver(prepared, recipient_email):
+                    self.sent += 1
+                    self.latencies.append(time.monotonic() - enqueued_at)
+                else:
+                    self.failed += 1
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "latency_ms": {
+                name: (value * 1000 if value is not None else None)
+                for name, value in (
+                    ("p50", percentile(latencies, 50)),
+                    ("p95", percentile(latencies, 95)),
+                    ("p99", percentile(latencies, 99)),
+                )
+            },
+        }
+
+
+dispatcher = EmailDispatcher()
@@ -1,9 +1,9 @@
 import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 import logging
+from typing import List, Optional
 from . import schemas
+from .templates import registry, PreparedEmail, prepare_batch
 
 logger = logging.getLogger(__name__)
 
@@ -13,74 +13,62 @@ EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USERNAME = os.getenv("EMAIL_USERNAME", "your-email@gmail.com")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "your-app-password")
 EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@events.com")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() == "true"
+
+# Типы уведомлений, которые дублируются письмом
+EMAIL_NOTIFICATION_TYPES = {"event_created", "event_registration", "event_updated", "event_cancelled", "event_reminder"}
+
+def default_recipient(notification: schemas.Notification) -> str:
+    return f"user{notification.user_id}@example.com"
 
 async def send_email_notification(
     notification: schemas.Notification,
-    recipient_email: str = None
+    recipient_email: str = None,
+    locale: Optional[str] = None
 ):
     """Отправка email уведомления"""
-    
+
     if not recipient_email:
-        recipient_email = f"user{notification.user_id}@example.com"
-    
-    # Создание сообщения
-    message = MIMEMultipart("alternative")
-    message["Subject"] = get_email_subject(notification.notification_type)
-    message["From"] = EMAIL_FROM
-    message["To"] = recipient_email
-    
-    text = f"""
-    Уведомление от Event Management Platform
-    
-    {notification.message}
-    
-    Тип: {notification.notification_type}
-    Дата: {notification.created_at}
-    
-    ---
-    Это автоматическое сообщение, пожалуйста, не отвечайте на него.
-    """
-    
-    html = f"""
-    <html>
-      <body>
-        <h2>Уведомление от Event Management Platform</h2>
-        <p>{notification.message}</p>
-        <p><strong>Тип:</strong> {notification.notification_type}</p>
-        <p><strong>Дата:</strong> {notification.created_at}</p>
-        <hr>
-        <p><em>Это автоматическое сообщение, пожалуйста, не отвечайте на него.</em></p>
-      </body>
-    </html>
-    """
-    
-    part1 = MIMEText(text, "plain")
-    part2 = MIMEText(html, "html")
-    message.attach(part1)
-    message.attach(part2)
-    
+        recipient_email = default_recipient(notification)
+
+    # Создание сообщения из скомпилированного шаблона
+    prepared = PreparedEmail(registry.render(notification, locale))
+
+    return await deliver(prepared, recipient_email)
+
+async def send_bulk_email_notifications(
+    notifications: List[schemas.Notification],
+    locale: Optional[str] = None
+) -> int:
+    """Пакетная отправка email уведомлений (дайджесты, рассылки)"""
+    # Одинаковые письма рассылки рендерятся и сериализуются один раз
+    prepared = prepare_batch(registry.render_batch(notifications, locale))
+
+    sent = 0
+    for notification, email in zip(notifications, prepared):
+        if await deliver(email, default_recipient(notification)):
+            sent += 1
+    return sent
+
+async def deliver(prepared: PreparedEmail, recipient_email: str) -> bool:
+    """Отправка подготовленного письма одному адресату"""
     try:
         await aiosmtplib.send(
-            message,
+            prepared.for_recipient(EMAIL_FROM, recipient_email),
+            sender=EMAIL_FROM,
+            recipients=[recipient_email],
             hostname=EMAIL_HOST,
             port=EMAIL_PORT,
-            username=EMAIL_USERNAME,
-            password=EMAIL_PASSWORD,
-            start_tls=True
+            username=EMAIL_USERNAME or None,
+            password=EMAIL_PASSWORD or None,
+            start_tls=EMAIL_USE_TLS
         )
-        logger.info(f"Email отправлен на {recipient_email}")
+        logger.info("Email отправлен на %s", recipient_email)
         return True
     except Exception as e:
-        logger.error(f"Ошибка отправки email: {str(e)}")
+        logger.error("Ошибка отправки email: %s", e)
         return False
 
-def get_email_subject(notification_type: str) -> str:
+def get_email_subject(notification_type: str, locale: Optional[str] = None) -> str:
     """Получение темы письма в зависимости от типа уведомления"""
-    subjects = {
-        "event_created": "Ваше мероприятие создано",
-        "event_registration": "Регистрация на мероприятие",
-        "event_updated": "Мероприятие обновлено",
-        "event_cancelled": "Мероприятие отменено",
-        "test": "Тестовое уведомление"
-    }
-    return subjects.get(notification_type, "Уведомление от Event Management Platform")
\ No newline at end of file
+    return registry.get(notification_type, locale).subject
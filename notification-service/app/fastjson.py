@@ -0,0 +1,19 @@
+from typing import Iterable, List, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def columns_for(model, schema: Type[BaseModel]) -> List:
+    """Колонки таблицы ровно под поля схемы ответа, в том же порядке"""
+    return [model.__table__.c[name] for name in schema.model_fields]
+
+
+def rows_response(rows: Iterable) -> ORJSONResponse:
+    """Ответ из кортежей колонок без построчной валидации Pydantic.
+
+    Обработчик сохраняет response_model для OpenAPI, но возвращает готовый
+    Response, поэтому FastAPI не прогоняет строки через from_attributes и
+    jsonable_encoder; datetime и Enum кодирует orjson.
+    """
+    return ORJSONResponse([row._asdict() for row in rows])
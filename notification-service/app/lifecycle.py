@@ -0,0 +1,64 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждать БД при старте, прежде чем процесс завершится с ошибкой
+DB_WAIT_TIMEOUT = float(os.getenv("DB_WAIT_TIMEOUT", 60))
+# Первая пауза между попытками; дальше она удваивается до DB_RETRY_MAX_DELAY
+DB_RETRY_INITIAL_DELAY = float(os.getenv("DB_RETRY_INITIAL_DELAY", 0.05))
+DB_RETRY_MAX_DELAY = float(os.getenv("DB_RETRY_MAX_DELAY", 2))
+# Время ответа БД, после которого /ready считает сервис неготовым
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", 2))
+# Схема и начальные данные при старте процесса, только для запуска одним процессом:
+# воркеры gunicorn выполняли бы миграции одновременно. Обычно их выполняет
+# отдельный шаг до старта сервиса (python -m app.migrate)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
+
+
+class State:
+    """Готовность процесса принимать трафик"""
+    ready = False
+
+
+state = State()
+
+
+def ping(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def wait_for_db(engine, timeout: float = DB_WAIT_TIMEOUT):
+    """Ожидание БД с экспоненциальной паузой, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = DB_RETRY_INITIAL_DELAY
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await asyncio.to_thread(ping, engine)
+            logger.info("База данных готова (попытка %s)", attempt)
+            return
+        except Exception as e:
+            if loop.time() + delay > deadline:
+                raise RuntimeError(f"База данных недоступна после {attempt} попыток: {e}") from e
+            logger.warning("Попытка %s: БД не готова, повтор через %.2f с. Ошибка: %s", attempt, delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, DB_RETRY_MAX_DELAY)
+
+
+async def check_db(engine) -> Optional[str]:
+    """None, если БД отвечает, иначе описание ошибки"""
+    try:
+        await asyncio.wait_for(asyncio.to_thread(ping, engine), READY_DB_TIMEOUT)
+        return None
+    except asyncio.TimeoutError:
+        return "database timeout"
+    except Exception as e:
+        return str(e)
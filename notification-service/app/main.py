@@ -1,25 +1,48 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from . import models, schemas, crud, database
-from .dependencies import get_db
-from .email_service import send_email_notification
+from . import models, schemas, crud, database, instrumentation, http_cache, rate_limit, lifecycle, migrate, read_routing, logging_config, profiling
+from .dependencies import get_db, get_read_db
+from .email_service import send_email_notification, EMAIL_NOTIFICATION_TYPES
+from .email_queue import dispatcher
+from .fastjson import rows_response
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования: JSON через очередь и фоновый поток записи
+# Уведомление создаётся на каждую регистрацию: в лог попадает 10% записей о создании
+logging_config.setup("notification-service", sample_rates={"create_notification": 0.1})
 logger = logging.getLogger(__name__)
 
+# Старт: ожидание БД без блокировки event loop; схема — только с MIGRATE_ON_STARTUP
+# (запуск одним процессом), иначе её создаёт отдельный шаг python -m app.migrate
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await lifecycle.wait_for_db(database.engine)
+    if database.notification_shards.sharded:
+        for shard_engine in database.notification_shards.engines:
+            await lifecycle.wait_for_db(shard_engine)
+    if lifecycle.MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate.migrate)
+    await dispatcher.start()
+    lifecycle.state.ready = True
+    yield
+    lifecycle.state.ready = False
+    await dispatcher.stop()
+
 app = FastAPI(
     title="Notification Service API",
     description="API для управления уведомлениями",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan
 )
 
 # Корневой эндпоинт
@@ -32,47 +55,102 @@ def read_root():
         "health": "/health"
     }
 
-# Настройка CORS
+# Подсчёт SQL-запросов на каждый HTTP-запрос
+instrumentation.install(database.engine)
+if database.replica_engine is not None:
+    instrumentation.install(database.replica_engine)
+if database.notification_shards.sharded:
+    for shard_engine in database.notification_shards.engines:
+        instrumentation.install(shard_engine)
+app.add_middleware(instrumentation.QueryCountMiddleware)
+
+# После своей записи клиент некоторое время читает из primary, а не из реплики
+app.add_middleware(read_routing.ReadYourWritesMiddleware)
+
+# Сжатие ответов gzip/brotli
+app.add_middleware(http_cache.CompressionMiddleware)
+
+# Ограничение частоты запросов и перегрузки: лишние запросы сразу получают 429/503
+app.add_middleware(
+    rate_limit.RateLimitMiddleware,
+    service="notification",
+    rules=[
+        # Внутренние вызовы event-service идут с одного адреса и без лимита частоты,
+        # их сдерживает только общий предел одновременных запросов
+        rate_limit.Rule("internal", "POST", r"^/notifications/(bulk)?$", rate=None),
+        rate_limit.Rule("unread-count", "GET", r"^/users/\d+/unread-count$", rate=None),
+    ]
+)
+
+# Профиль запроса по X-Profile и журнал медленных запросов; без PROFILING_TOKEN
+# и SLOW_REQUEST_THRESHOLD_MS middleware не подключается и запросы не замедляет
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Сэмплер стеков для администратора: /debug/profiling/*
+app.include_router(profiling.router)
+
+# Сквозной X-Request-ID: принимается от клиента или соседнего сервиса, попадает в логи и ответ
+app.add_middleware(logging_config.RequestIdMiddleware)
+
+# Настройка CORS. Добавляется последним, т.е. снаружи остальных middleware:
+# отказы 429/503/409 без CORS-заголовков браузер не покажет клиенту
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Без этого браузер не отдаёт скрипту ETag для перепроверки кэша клиента
+    expose_headers=["ETag", "X-Request-ID"],
 )
 
-# Создание таблиц при запуске
-@app.on_event("startup")
-async def startup():
-    models.Base.metadata.create_all(bind=database.engine)
-    logger.info("Таблицы базы данных созданы")
-
 @app.post("/notifications/", response_model=schemas.Notification)
 async def create_notification(
     notification: schemas.NotificationCreate,
     db: Session = Depends(get_db)
 ):
     """Создание нового уведомления"""
-    logger.info(f"Создание уведомления для пользователя {notification.user_id}")
+    logger.info("Создание уведомления для пользователя %s", notification.user_id)
     
     try:
         db_notification = crud.create_notification(db=db, notification=notification)
         
-        if notification.notification_type in ["event_created", "event_registration"]:
-            await send_email_notification(db_notification)
+        if notification.notification_type in EMAIL_NOTIFICATION_TYPES:
+            await dispatcher.enqueue(db_notification)
         
         return db_notification
     except Exception as e:
-        logger.error(f"Ошибка при создании уведомления: {str(e)}")
+        logger.error("Ошибка при создании уведомления: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/notifications/bulk")
+async def create_notifications_bulk(
+    bulk: schemas.NotificationBulkCreate,
+    db: Session = Depends(get_db)
+):
+    """Массовое создание одного уведомления для списка пользователей"""
+    logger.info("Массовое создание уведомлений %s: %s получателей", bulk.notification_type, len(bulk.user_ids))
+    
+    try:
+        db_notifications = crud.create_notifications_bulk(db=db, bulk=bulk)
+    except Exception as e:
+        logger.error("Ошибка при массовом создании уведомлений: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
+    
+    if bulk.notification_type in EMAIL_NOTIFICATION_TYPES:
+        dispatcher.submit_many(db_notifications)
+    
+    return {"created": len(db_notifications)}
 
 @app.get("/notifications/", response_model=List[schemas.Notification])
 def read_notifications(
+    request: Request,
     user_id: Optional[int] = None,
     is_read: Optional[bool] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение списка уведомлений с фильтрацией"""
     notifications = crud.get_notifications(
@@ -82,42 +160,40 @@ def read_notifications(
         skip=skip, 
         limit=limit
     )
-    return notifications
+    return http_cache.page_response(request, rows_response(notifications))
 
 @app.get("/notifications/{notification_id}", response_model=schemas.Notification)
-def read_notification(notification_id: int, db: Session = Depends(get_db)):
+def read_notification(notification_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """Получение конкретного уведомления"""
     db_notification = crud.get_notification(db, notification_id=notification_id)
     if db_notification is None:
         raise HTTPException(status_code=404, detail="Notification not found")
+    
+    last_modified = db_notification.read_at or db_notification.created_at
+    etag = http_cache.make_etag(db_notification.id, db_notification.is_read, last_modified)
+    if http_cache.is_not_modified(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified)
+    http_cache.set_validators(response, etag, last_modified)
     return db_notification
 
 @app.put("/notifications/{notification_id}/read")
 def mark_as_read(notification_id: int, db: Session = Depends(get_db)):
     """Отметить уведомление как прочитанное"""
-    db_notification = crud.get_notification(db, notification_id=notification_id)
+    db_notification = crud.mark_as_read(db, notification_id=notification_id)
     if db_notification is None:
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    db_notification.is_read = True
-    db_notification.read_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_notification)
-    
     return {"message": "Notification marked as read", "notification": db_notification}
 
 @app.delete("/notifications/{notification_id}")
 def delete_notification(notification_id: int, db: Session = Depends(get_db)):
     """Удаление уведомления"""
-    db_notification = crud.get_notification(db, notification_id=notification_id)
-    if db_notification is None:
+    if not crud.delete_notification(db=db, notification_id=notification_id):
         raise HTTPException(status_code=404, detail="Notification not found")
-    
-    crud.delete_notification(db=db, notification_id=notification_id)
     return {"message": "Notification deleted successfully"}
 
 @app.get("/users/{user_id}/unread-count")
-def get_unread_count(user_id: int, db: Session = Depends(get_db)):
+def get_unread_count(user_id: int, db: Session = Depends(get_read_db)):
     """Получение количества непрочитанных уведомлений пользователя"""
     count = crud.get_unread_count(db, user_id)
     return {"user_id": user_id, "unread_count": count}
@@ -141,11 +217,31 @@ async def send_test_email(email: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/email-queue/stats")
+def email_queue_stats():
+    """Состояние очереди исходящих писем"""
+    return dispatcher.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Метрики SQL-запросов по обработчикам и очереди логов (формат Prometheus)"""
+    return instrumentation.render_metrics() + logging_config.render_metrics()
+
 @app.get("/health")
 def health_check():
-    """Проверка здоровья сервиса"""
+    """Проверка живости процесса (без обращения к БД)"""
     return {"status": "healthy", "service": "notification-service"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: старт завершён и БД отвечает"""
+    if not lifecycle.state.ready:
+        raise HTTPException(status_code=503, detail="Service is starting")
+    error = await lifecycle.check_db(database.engine)
+    if error:
+        raise HTTPException(status_code=503, detail=f"Service not ready: {error}")
+    return {"status": "ready", "service": "notification-service", "database": "connected"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
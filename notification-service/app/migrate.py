@@ -0,0 +1,36 @@
+"""Одноразовая подготовка БД: схема и миграции.
+
+Выполняется отдельным шагом перед запуском воркеров, а не при старте
+каждого процесса:
+
+    python -m app.migrate
+"""
+import asyncio
+import logging
+
+from . import models, migrations
+from .database import engine, notification_shards
+from .lifecycle import wait_for_db
+
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    models.Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    notification_shards.create_tables([models.Notification.__table__])
+    if notification_shards.sharded:
+        for shard_engine in notification_shards.engines:
+            migrations.run_migrations(shard_engine)
+    notification_shards.interleave_ids(models.Notification.__table__.name)
+    logger.info("Таблицы базы данных созданы")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(wait_for_db(engine))
+    migrate()
+
+
+if __name__ == "__main__":
+    main()
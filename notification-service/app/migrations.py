@@ -0,0 +1,21 @@
+from sqlalchemy import text
+import logging
+
+logger = logging.getLogger(__name__)
+
+# create_all не меняет существующие таблицы, поэтому новые колонки и индексы
+# добавляются здесь идемпотентными DDL-командами (в основной БД и в каждом шарде)
+POSTGRES_MIGRATIONS = [
+    "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS dedupe_key VARCHAR",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_notifications_dedupe_key ON notifications (dedupe_key)",
+]
+
+
+def run_migrations(engine):
+    """Доведение схемы существующей БД до текущих моделей"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for statement in POSTGRES_MIGRATIONS:
+            conn.execute(text(statement))
+    logger.info("Миграции схемы применены")
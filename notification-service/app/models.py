@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index
 from sqlalchemy.sql import func
 from .database import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Повторная доставка с тем же ключом (напоминания, повтор рассылки) не создаёт дубликат
+        Index("ix_notifications_dedupe_key", "dedupe_key", unique=True),
+    )
+    # Серверные значения по умолчанию возвращаются через RETURNING, без повторного SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
@@ -12,4 +18,6 @@ class Notification(Base):
     message = Column(Text, nullable=False)
     is_read = Column(Boolean, default=False)
     read_at = Column(DateTime(timezone=True), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Ключ идемпотентности уведомления; NULL — без дедупликации
+    dedupe_key = Column(String, nullable=True)
\ No newline at end of file
@@ -0,0 +1,241 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import math
+import os
+import re
+import time
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # общее состояние в Redis необязательно, без него лимиты считаются в процессе
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Лимит по умолчанию на пользователя или IP: запросов в секунду и размер всплеска
+RATE_LIMIT_DEFAULT_RATE = float(os.getenv("RATE_LIMIT_DEFAULT_RATE", 20))
+RATE_LIMIT_DEFAULT_BURST = int(os.getenv("RATE_LIMIT_DEFAULT_BURST", 40))
+# Сколько запросов процесс обрабатывает одновременно; сверх этого сразу 503
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", 64))
+# Брать адрес клиента из X-Forwarded-For (за доверенным прокси)
+TRUST_PROXY = os.getenv("TRUST_PROXY", "false").lower() == "true"
+REDIS_URL = os.getenv("REDIS_URL")
+# Без Redis у каждого воркера свои корзины: лимит сервиса делится между воркерами
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+# Верхняя граница числа корзин в памяти; простаивающие корзины вытесняются
+MAX_BUCKETS = 100000
+
+EXEMPT_PATHS = {"/health", "/ready", "/metrics", "/docs", "/redoc", "/openapi.json"}
+
+
+@dataclass
+class Rule:
+    """Лимит для группы маршрутов; rate=None отключает token bucket для маршрута"""
+    name: str
+    method: str
+    pattern: str
+    rate: Optional[float] = RATE_LIMIT_DEFAULT_RATE
+    burst: int = RATE_LIMIT_DEFAULT_BURST
+    # Отдельный предел одновременных запросов маршрута (например, bcrypt в /token)
+    concurrency: Optional[int] = None
+    # "user" — по пользователю из JWT, если сервис проверяет его подпись (verify_subject),
+    # иначе и для недействительных токенов — по IP; "ip" — всегда по адресу клиента
+    key: str = "user"
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method == "*" or self.method == method) and self.regex.match(path) is not None
+
+
+DEFAULT_RULE = Rule("default", "*", ".*")
+
+
+class LocalBuckets:
+    """Token bucket в памяти процесса; workers — на сколько процессов делится лимит"""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS, workers: int = 1):
+        self.max_buckets = max_buckets
+        self.workers = max(1, workers)
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """0, если запрос разрешён, иначе через сколько секунд появится токен"""
+        rate, burst = rate / self.workers, max(1, burst / self.workers)
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > self.max_buckets:
+                self._evict(now)
+            return 0.0
+        self.buckets[key] = (tokens, now)
+        return (1 - tokens) / rate
+
+    def _evict(self, now: float):
+        # Сначала самые давно не использованные корзины: к этому времени они уже полные
+        for key, _ in sorted(self.buckets.items(), key=lambda item: item[1][1])[:len(self.buckets) // 10 or 1]:
+            del self.buckets[key]
+
+
+_REDIS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Token bucket в Redis: лимит общий для всех процессов и реплик сервиса"""
+
+    def __init__(self, url: str, prefix: str, fallback: LocalBuckets):
+        self.client = aioredis.from_url(url)
+        self.script = self.client.register_script(_REDIS_SCRIPT)
+        self.prefix = prefix
+        self.fallback = fallback
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(await self.script(keys=[f"{self.prefix}:{key}"], args=[rate, burst]))
+        except Exception as e:
+            # Недоступный Redis не должен останавливать сервис: лимит считается локально
+            logger.warning("Redis недоступен для rate limit, используется локальный счётчик: %s", e)
+            return await self.fallback.acquire(key, rate, burst)
+
+
+def _bearer_token(authorization: str) -> Optional[str]:
+    scheme, _, token = authorization.partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+def _client_ip(scope, headers: Dict[bytes, bytes]) -> str:
+    if TRUST_PROXY and b"x-forwarded-for" in headers:
+        return headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """ASGI-middleware: token bucket на пользователя/IP и маршрут плюс предел одновременных запросов.
+
+    Сверх лимита запрос сразу получает 429 (или 503 при перегрузке процесса)
+    с Retry-After, не занимая пул потоков и соединения с БД.
+
+    verify_subject(token) -> sub или None проверяет подпись JWT. Без него sub
+    токена ключом не служит: поддельными токенами клиент получал бы новую
+    корзину на каждый запрос или расходовал бы чужую.
+    """
+
+    def __init__(
+        self,
+        app,
+        rules: List[Rule] = (),
+        service: str = "service",
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        enabled: bool = RATE_LIMIT_ENABLED,
+        verify_subject: Optional[Callable[[str], Optional[str]]] = None
+    ):
+        self.app = app
+        self.verify_subject = verify_subject
+        self.rules = list(rules)
+        self.max_concurrent = max_concurrent
+        self.enabled = enabled
+        self.in_flight = 0
+        self.route_in_flight: Dict[str, int] = {}
+        self.rejected = 0
+        self.shed = 0
+        if REDIS_URL and aioredis is not None:
+            # Запасные локальные корзины на время недоступности Redis: лимит делится между воркерами
+            self.buckets = RedisBuckets(REDIS_URL, f"ratelimit:{service}", LocalBuckets(workers=WEB_CONCURRENCY))
+        else:
+            if REDIS_URL:
+                logger.warning("REDIS_URL задан, но пакет redis не установлен: лимиты считаются в процессе")
+            self.buckets = LocalBuckets(workers=WEB_CONCURRENCY)
+
+    def _rule(self, method: str, path: str) -> Rule:
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return DEFAULT_RULE
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.enabled
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        rule = self._rule(scope["method"], scope["path"])
+        headers = dict(scope["headers"])
+
+        if rule.rate is not None:
+            subject = None
+            if rule.key == "user" and self.verify_subject is not None:
+                token = _bearer_token(headers.get(b"authorization", b"").decode("latin-1"))
+                subject = self.verify_subject(token) if token else None
+            key = f"{rule.name}:user:{subject}" if subject else f"{rule.name}:ip:{_client_ip(scope, headers)}"
+            wait = await self.buckets.acquire(key, rule.rate, rule.burst)
+            if wait > 0:
+                self.rejected += 1
+                await _reject(send, 429, "Too many requests", wait)
+                return
+
+        # Перегруженный процесс отказывает сразу, а не ставит запрос в очередь пула потоков
+        route_in_flight = self.route_in_flight.get(rule.name, 0)
+        if self.in_flight >= self.max_concurrent or (rule.concurrency is not None and route_in_flight >= rule.concurrency):
+            self.shed += 1
+            await _reject(send, 503, "Service overloaded", 1)
+            return
+
+        self.in_flight += 1
+        self.route_in_flight[rule.name] = route_in_flight + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self.route_in_flight[rule.name] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "rejected": self.rejected,
+            "shed": self.shed,
+        }
@@ -0,0 +1,65 @@
+from typing import Dict
+import hashlib
+import os
+import time
+
+# Сколько после своего изменения клиент читает из primary: больше обычного отставания реплики
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+# Верхняя граница числа запомненных клиентов в процессе
+MAX_RECENT_WRITERS = 100000
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Клиент, знающий о своей недавней записи, может потребовать чтение из primary явно:
+# это работает и при нескольких воркерах, где запомненная в процессе запись не видна
+CONSISTENCY_HEADER = b"x-consistency"
+STRONG = b"strong"
+
+_recent_writers: Dict[str, float] = {}
+
+
+def _client_key(scope) -> str:
+    """Пользователь по заголовку Authorization, без него — адрес клиента"""
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization")
+    if authorization:
+        return hashlib.sha1(authorization).hexdigest()
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "unknown"
+
+
+def mark_write(scope):
+    now = time.monotonic()
+    if len(_recent_writers) >= MAX_RECENT_WRITERS:
+        for key in [key for key, until in _recent_writers.items() if until <= now]:
+            del _recent_writers[key]
+        if len(_recent_writers) >= MAX_RECENT_WRITERS:
+            _recent_writers.clear()
+    _recent_writers[_client_key(scope)] = now + READ_YOUR_WRITES_SECONDS
+
+
+def wants_primary(scope) -> bool:
+    """Чтение должно видеть собственные изменения клиента"""
+    if dict(scope["headers"]).get(CONSISTENCY_HEADER, b"").lower() == STRONG:
+        return True
+    until = _recent_writers.get(_client_key(scope))
+    return until is not None and until > time.monotonic()
+
+
+class ReadYourWritesMiddleware:
+    """ASGI-middleware: успешный изменяющий запрос на время переводит чтения клиента на primary"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                mark_write(scope)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 class NotificationBase(BaseModel):
     user_id: int
@@ -11,6 +11,14 @@ class NotificationBase(BaseModel):
 class NotificationCreate(NotificationBase):
     pass
 
+class NotificationBulkCreate(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=10000)
+    event_id: Optional[int] = None
+    notification_type: str
+    message: str
+    # Уведомление получает ключ "{dedupe_key}:{user_id}"; повтор с тем же ключом пропускается
+    dedupe_key: Optional[str] = Field(None, max_length=200)
+
 class NotificationUpdate(BaseModel):
     is_read: Optional[bool] = None
 
@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSink:
+    """Локальный SMTP-сервер-приёмник для тестов и нагрузочных прогонов.
+
+    Принимает письма без доставки, с настраиваемой задержкой ответа на DATA
+    и долей искусственных отказов.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 1025,
+        latency_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        keep_messages: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.messages = deque(maxlen=keep_messages or None) if keep_messages else None
+        self.received = 0
+        self.failed = 0
+        self.bytes_received = 0
+        self.connections = 0
+        self.started_at = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # При port=0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started_at = time.monotonic()
+        logger.info(
+            "SMTP sink слушает %s:%s (задержка %s мс, отказы %.0f%%)",
+            self.host, self.port, self.latency_ms, self.failure_rate * 100
+        )
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            "received": self.received,
+            "failed": self.failed,
+            "bytes_received": self.bytes_received,
+            "connections": self.connections,
+            "messages_per_second": self.received / elapsed if elapsed else 0.0,
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        mail_from, recipients = None, []
+        try:
+            await reply("220 smtp-sink ESMTP ready")
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                verb = line.split(" ", 1)[0].upper()
+
+                if verb in ("EHLO", "HELO"):
+                    writer.write(
+                        b"250-smtp-sink\r\n250-8BITMIME\r\n250-SIZE 33554432\r\n250 AUTH PLAIN LOGIN\r\n"
+                    )
+                    await writer.drain()
+                elif verb == "AUTH":
+                    await self._auth(line, reader, reply)
+                elif verb == "MAIL":
+                    mail_from, recipients = line[10:].strip(), []
+                    await reply("250 2.1.0 OK")
+                elif verb == "RCPT":
+                    recipients.append(line[8:].strip())
+                    await reply("250 2.1.5 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = await self._read_data(reader)
+                    await self._accept(mail_from, recipients, data, reply)
+                    mail_from, recipients = None, []
+                elif verb == "RSET":
+                    mail_from, recipients = None, []
+                    await reply("250 2.0.0 OK")
+                elif verb == "NOOP":
+                    await reply("250 2.0.0 OK")
+                elif verb == "QUIT":
+                    await reply("221 2.0.0 Bye")
+                    break
+                else:
+                    await reply("502 5.5.2 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _auth(self, line: str, reader: asyncio.StreamReader, reply):
+        parts = line.split()
+        mechanism = parts[1].upper() if len(parts) > 1 else ""
+        if mechanism == "PLAIN" and len(parts) < 3:
+            await reply("334 ")
+            await reader.readline()
+        elif mechanism == "LOGIN":
+            for prompt in ("Username:", "Password:"):
+                await reply("334 " + base64.b64encode(prompt.encode()).decode())
+                await reader.readline()
+        elif mechanism != "PLAIN":
+            await reply("504 5.5.4 Unrecognized authentication type")
+            return
+        # Любые учётные данные принимаются
+        await reply("235 2.7.0 Authentication successful")
+
+    async def _read_data(self, reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            raw = await reader.readline()
+            if not raw or raw in (b".\r\n", b".\n"):
+                break
+            # Снятие dot-stuffing (RFC 5321, 4.5.2)
+            if raw.startswith(b".."):
+                raw = raw[1:]
+            chunks.append(raw)
+        return b"".join(chunks)
+
+    async def _accept(self, mail_from, recipients, data: bytes, reply):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.failed += 1
+            await reply("451 4.3.0 Simulated temporary failure")
+            return
+        self.received += 1
+        self.bytes_received += len(data)
+        if self.messages is not None:
+            self.messages.append((mail_from, recipients, data))
+        await reply("250 2.0.0 OK: queued")
+
+
+async def _serve(args):
+    sink = SMTPSink(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        failure_rate=args.failure_rate,
+    )
+    await sink.start()
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            logger.info("SMTP sink: %s", sink.stats())
+    finally:
+        await sink.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный SMTP sink для тестов и нагрузочных прогонов")
+    parser.add_argument("--host", default=os.getenv("SINK_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SINK_PORT", 1025)))
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("SINK_LATENCY_MS", 0)))
+    parser.add_argument("--failure-rate", type=float, default=float(os.getenv("SINK_FAILURE_RATE", 0)))
+    parser.add_argument("--report-interval", type=float, default=30.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
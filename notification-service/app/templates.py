@@ -0,0 +1,234 @@
+from dataclasses import dataclass
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from html import escape
+from string import Template
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCALE = os.getenv("EMAIL_DEFAULT_LOCALE", "ru")
+TEMPLATES_DIR = os.getenv("EMAIL_TEMPLATES_DIR")
+
+# Ключ шаблона по умолчанию (используется для неизвестных типов уведомлений)
+DEFAULT_TYPE = "*"
+
+# Статические части писем для каждой локали
+LAYOUT_STRINGS = {
+    "ru": {
+        "title": "Уведомление от Event Management Platform",
+        "type_label": "Тип",
+        "date_label": "Дата",
+        "footer": "Это автоматическое сообщение, пожалуйста, не отвечайте на него.",
+    },
+    "en": {
+        "title": "Notification from Event Management Platform",
+        "type_label": "Type",
+        "date_label": "Date",
+        "footer": "This is an automated message, please do not reply.",
+    },
+}
+
+SUBJECTS = {
+    "ru": {
+        "event_created": "Ваше мероприятие создано",
+        "event_registration": "Регистрация на мероприятие",
+        "event_updated": "Мероприятие обновлено",
+        "event_cancelled": "Мероприятие отменено",
+        "event_reminder": "Напоминание о мероприятии",
+        "test": "Тестовое уведомление",
+        DEFAULT_TYPE: "Уведомление от Event Management Platform",
+    },
+    "en": {
+        "event_created": "Your event has been created",
+        "event_registration": "Event registration",
+        "event_updated": "Event updated",
+        "event_cancelled": "Event cancelled",
+        "event_reminder": "Event reminder",
+        "test": "Test notification",
+        DEFAULT_TYPE: "Notification from Event Management Platform",
+    },
+}
+
+TEXT_LAYOUT = """
+    $title
+
+    $message
+
+    $type_label: $notification_type
+    $date_label: $created_at
+
+    ---
+    $footer
+    """
+
+HTML_LAYOUT = """
+    <html>
+      <body>
+        <h2>$title</h2>
+        <p>$message</p>
+        <p><strong>$type_label:</strong> $notification_type</p>
+        <p><strong>$date_label:</strong> $created_at</p>
+        <hr>
+        <p><em>$footer</em></p>
+      </body>
+    </html>
+    """
+
+
+@dataclass(frozen=True)
+class RenderedEmail:
+    subject: str
+    text: str
+    html: str
+
+
+class CompiledTemplate:
+    """Шаблон письма с заранее подставленными статическими частями"""
+
+    def __init__(self, subject: str, text: str, html: str, static: Dict[str, str]):
+        self.subject = subject
+        # Статические части подставляются один раз, в шаблоне остаются только
+        # динамические поля ($message, $notification_type, $created_at)
+        self.text = Template(Template(text).safe_substitute(
+            {key: value.replace("$", "$$") for key, value in static.items()}
+        ))
+        self.html = Template(Template(html).safe_substitute(
+            {key: escape(value).replace("$", "$$") for key, value in static.items()}
+        ))
+
+    def render(self, message: str, notification_type: str, created_at) -> RenderedEmail:
+        created_at = str(created_at)
+        return RenderedEmail(
+            subject=self.subject,
+            text=self.text.substitute(
+                message=message,
+                notification_type=notification_type,
+                created_at=created_at,
+            ),
+            html=self.html.substitute(
+                message=escape(message),
+                notification_type=escape(notification_type),
+                created_at=escape(created_at),
+            ),
+        )
+
+
+class TemplateRegistry:
+    """Реестр скомпилированных шаблонов по типу уведомления и локали"""
+
+    def __init__(self, default_locale: str = DEFAULT_LOCALE):
+        self.default_locale = default_locale
+        self._templates: Dict[Tuple[str, str], CompiledTemplate] = {}
+
+    def register(
+        self,
+        notification_type: str,
+        locale: str,
+        subject: str,
+        text: str = TEXT_LAYOUT,
+        html: str = HTML_LAYOUT,
+    ):
+        static = LAYOUT_STRINGS.get(locale, LAYOUT_STRINGS["ru"])
+        self._templates[(notification_type, locale)] = CompiledTemplate(subject, text, html, static)
+
+    def get(self, notification_type: str, locale: Optional[str] = None) -> CompiledTemplate:
+        locale = locale or self.default_locale
+        for key in (
+            (notification_type, locale),
+            (DEFAULT_TYPE, locale),
+            (notification_type, self.default_locale),
+            (DEFAULT_TYPE, self.default_locale),
+        ):
+            template = self._templates.get(key)
+            if template is not None:
+                return template
+        raise KeyError(f"Шаблон для {notification_type}/{locale} не найден")
+
+    def render(self, notification, locale: Optional[str] = None) -> RenderedEmail:
+        template = self.get(notification.notification_type, locale)
+        return template.render(
+            notification.message, notification.notification_type, notification.created_at
+        )
+
+    def render_batch(self, notifications: Iterable, locale: Optional[str] = None) -> List[RenderedEmail]:
+        """Пакетный рендеринг: одинаковые уведомления (рассылки) рендерятся один раз"""
+        rendered: Dict[tuple, RenderedEmail] = {}
+        result = []
+        for notification in notifications:
+            key = (
+                notification.notification_type,
+                notification.message,
+                str(notification.created_at),
+            )
+            email = rendered.get(key)
+            if email is None:
+                email = rendered[key] = self.render(notification, locale)
+            result.append(email)
+        return result
+
+    def load_builtin(self):
+        for locale, subjects in SUBJECTS.items():
+            for notification_type, subject in subjects.items():
+                self.register(notification_type, locale, subject)
+
+    def load_directory(self, path: str):
+        """Загрузка шаблонов из файлов вида <type>.<locale>.subject|txt|html"""
+        loaded = 0
+        for filename in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(filename)
+            if ext != ".subject" or "." not in name:
+                continue
+            notification_type, locale = name.rsplit(".", 1)
+            parts = {}
+            for part, default in (("subject", None), ("txt", TEXT_LAYOUT), ("html", HTML_LAYOUT)):
+                part_path = os.path.join(path, f"{name}.{part}")
+                if os.path.exists(part_path):
+                    with open(part_path, encoding="utf-8") as f:
+                        parts[part] = f.read()
+                else:
+                    parts[part] = default
+            self.register(notification_type, locale, parts["subject"].strip(), parts["txt"], parts["html"])
+            loaded += 1
+        logger.info("Загружено шаблонов писем из %s: %s", path, loaded)
+
+
+class PreparedEmail:
+    """Письмо с однократно сериализованным MIME-телом; заголовки адресата добавляются при отправке"""
+
+    def __init__(self, email: RenderedEmail):
+        self.email = email
+        message = MIMEMultipart("alternative")
+        message["Subject"] = email.subject
+        message.attach(MIMEText(email.text, "plain"))
+        message.attach(MIMEText(email.html, "html"))
+        self._serialized = message.as_string()
+
+    def for_recipient(self, sender: str, recipient: str) -> str:
+        return f"From: {sender}\nTo: {recipient}\n{self._serialized}"
+
+
+def prepare_batch(emails: Iterable[RenderedEmail]) -> List[PreparedEmail]:
+    """Сериализация пакета писем: одинаковые письма сериализуются один раз"""
+    prepared: Dict[int, PreparedEmail] = {}
+    result = []
+    for email in emails:
+        item = prepared.get(id(email))
+        if item is None:
+            item = prepared[id(email)] = PreparedEmail(email)
+        result.append(item)
+    return result
+
+
+def load_templates() -> TemplateRegistry:
+    new_registry = TemplateRegistry()
+    new_registry.load_builtin()
+    if TEMPLATES_DIR and os.path.isdir(TEMPLATES_DIR):
+        new_registry.load_directory(TEMPLATES_DIR)
+    return new_registry
+
+
+# Шаблоны компилируются один раз при старте сервиса
+registry = load_templates()
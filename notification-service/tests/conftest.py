@@ -0,0 +1,35 @@
+"""Фикстуры тестов notification-service: приложение в этом процессе на временной SQLite.
+
+    cd notification-service && python -m pytest tests
+
+Другая БД задаётся через TEST_DATABASE_URL.
+"""
+import os
+import sys
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="notification-service-tests-")
+os.environ.update({
+    "DATABASE_URL": os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(_directory, 'notification')}.db"),
+    "MIGRATE_ON_STARTUP": "true",
+    "RATE_LIMIT_ENABLED": "false",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def notification_id(client):
+    response = client.post("/notifications/", json={"user_id": 900001, "notification_type": "test", "message": "Тест"})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
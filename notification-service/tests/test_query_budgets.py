@@ -0,0 +1,22 @@
+"""Бюджет SQL-запросов пишущих эндпоинтов (instrumentation.assert_query_budget)."""
+from app import instrumentation
+
+
+def within_budget(budget, call, expected=200):
+    with instrumentation.assert_query_budget(budget):
+        response = call()
+    assert response.status_code == expected, response.text
+    return response
+
+
+def test_create_notification(client):
+    notification = {"user_id": 900001, "notification_type": "test", "message": "Бюджет"}
+    within_budget(1, lambda: client.post("/notifications/", json=notification))
+
+
+def test_mark_as_read(client, notification_id):
+    within_budget(1, lambda: client.put(f"/notifications/{notification_id}/read"))
+
+
+def test_delete_notification(client, notification_id):
+    within_budget(1, lambda: client.delete(f"/notifications/{notification_id}"))